@@ -0,0 +1,36 @@
+"""Headless TIFF and PDF metadata extraction."""
+
+from .core import (
+    ANALYSIS_COLUMNS,
+    DEFAULT_OPTIONS,
+    ERROR_STATUSES,
+    EXTRACTOR_VERSION,
+    ExtractOptions,
+    FILE_EXTENSIONS,
+    MIXED_COLUMNS,
+    MIXED_EXPORT_COLUMNS,
+    PDF_COLUMNS,
+    PDF_EXPORT_COLUMNS,
+    PDF_IMAGE_COLUMNS,
+    RESOURCE_LIMIT_STATUS,
+    TIMEOUT_STATUS,
+    TIFF_COLUMNS,
+    TIFF_EXPORT_COLUMNS,
+    check_filename_convention,
+    check_pdf_filename_convention,
+    check_tiff_filename_convention,
+    detect_file_type,
+    display_columns,
+    error_row,
+    export_columns,
+    extract_file,
+    get_pdf_metadata,
+    get_tiff_metadata,
+    is_error_row,
+)
+from . import timing
+from .parallel import extract_all, iter_extract
+from .rules import BUILTIN_RULES, RULE_COLUMNS, RuleError, RuleSet, load_rules
+from .store import ResultStore
+
+__version__ = EXTRACTOR_VERSION
@@ -0,0 +1,200 @@
+"""Pixel statistics for the optional content analysis mode.
+
+Declared metadata says how an image was stored, not what it contains: a
+"24-bit Color" scan of a black and white page, or a blank separator
+sheet, look the same as any other page in the metadata columns. This
+module decodes the pixels and reports what is actually there:
+
+- Effective Color: "Bilevel" when only black and white occur, "Grayscale"
+  when every pixel's channels agree, otherwise "Color".
+- Unique Colors: the number of distinct pixel values.
+- Blank: "Yes" when almost every pixel is within a small distance of the
+  most common value, "Near blank" when a little more varies (specks,
+  scanner noise, a page number), otherwise "No".
+
+Large images are measured on a regular grid of at most MAX_SAMPLE_PIXELS
+pixels, and JPEG data is decoded at reduced scale where the codec allows,
+so the cost per image is bounded. The statistics accumulate band by band
+(PixelStats), so TIFFs read strip by strip by the raster module never
+need their whole raster in memory. NumPy is imported on first use.
+"""
+
+import io
+
+# Largest number of pixels measured per image
+MAX_SAMPLE_PIXELS = 1 << 22
+# Channels differing by no more than this still count as gray; absorbs
+# JPEG chroma noise in grayscale scans
+GRAY_TOLERANCE = 6
+# Distance from the dominant value that still counts as background
+BLANK_TOLERANCE = 24
+# Share of background pixels for a page to be blank or near blank
+BLANK_FRACTION = 0.999
+NEAR_BLANK_FRACTION = 0.99
+
+# Values of the analysis columns when there was nothing to measure
+NO_IMAGE = "No image"
+UNSUPPORTED = "Unsupported"
+
+
+def not_analysed(reason):
+    """Analysis result for an image that could not be measured"""
+    return {"Effective Color": reason, "Unique Colors": reason, "Blank": reason}
+
+
+def analyze_image(img):
+    """Measure the current frame of a Pillow image"""
+    return analyze_pixels(image_to_array(img))
+
+
+def image_to_array(img):
+    """Return the pixels of a Pillow image as an H x W or H x W x 3 uint8 array
+
+    Images with more pixels than MAX_SAMPLE_PIXELS are decoded at a
+    reduced size where the codec supports it.
+    """
+    import numpy as np
+
+    width, height = img.size
+    if width * height > MAX_SAMPLE_PIXELS and img.format == "JPEG":
+        scale = (width * height / MAX_SAMPLE_PIXELS) ** 0.5
+        img.draft(img.mode, (int(width / scale), int(height / scale)))
+
+    mode = img.mode
+    if mode == "1":
+        return np.asarray(img, dtype=np.uint8) * 255
+    if mode in ("L", "RGB"):
+        return np.asarray(img)
+    if mode.startswith("I;16"):
+        return (np.asarray(img).astype(np.uint32) >> 8).astype(np.uint8)
+    if mode in ("I", "F"):
+        values = np.asarray(img).astype(np.float64)
+        low, high = values.min(), values.max()
+        if high <= low:
+            return np.zeros(values.shape, dtype=np.uint8)
+        return ((values - low) * (255 / (high - low))).astype(np.uint8)
+    if mode in ("LA", "La"):
+        return np.asarray(img.convert("L"))
+    return np.asarray(img.convert("RGB"))
+
+
+def analyze_pixels(pixels):
+    """Measure an H x W (gray) or H x W x 3 (RGB) uint8 array"""
+    return analyze_chunks([subsample(pixels)])
+
+
+def analyze_chunks(chunks):
+    """Measure an image delivered as successive bands of rows"""
+    stats = PixelStats()
+    for chunk in chunks:
+        stats.add(chunk)
+    return stats.result()
+
+
+class PixelStats:
+    """Statistics of one image, accumulated band by band
+
+    Every statistic is a count or a histogram, so an image read in bands
+    gives the same result as the whole image at once while only one band
+    is in memory.
+    """
+
+    def __init__(self):
+        import numpy as np
+
+        self.pixels = 0
+        self.off_gray = 0
+        # Lightness histogram, and the gray levels or RGB colors seen
+        self.luminance = np.zeros(256, dtype=np.int64)
+        self.levels = np.zeros(256, dtype=bool)
+        self.colors = None
+
+    def add(self, pixels):
+        import numpy as np
+
+        if pixels.ndim == 3:
+            channels = pixels.astype(np.int16)
+            spread = channels.max(axis=2) - channels.min(axis=2)
+            self.off_gray += np.count_nonzero(spread > GRAY_TOLERANCE)
+            packed = ((pixels[..., 0].astype(np.uint32) << 16)
+                      | (pixels[..., 1].astype(np.uint32) << 8) | pixels[..., 2])
+            if self.colors is None:
+                # One flag per 24-bit color: 16 MB, however large the image
+                self.colors = np.zeros(1 << 24, dtype=bool)
+            self.colors[packed] = True
+            # Blankness is judged on lightness, so a tinted sheet is still blank
+            luminance = (channels.sum(axis=2) // 3).astype(np.uint8)
+        else:
+            luminance = pixels
+            self.levels[pixels] = True
+        self.luminance += np.bincount(luminance.ravel(), minlength=256)
+        self.pixels += luminance.size
+
+    def result(self):
+        import numpy as np
+
+        if self.colors is None:
+            unique_colors = int(np.count_nonzero(self.levels))
+        else:
+            gray = np.flatnonzero(self.levels).astype(np.uint32)
+            self.colors[(gray << 16) | (gray << 8) | gray] = True
+            unique_colors = int(np.count_nonzero(self.colors))
+
+        # A handful of off-gray pixels does not make a scan color
+        if self.off_gray > self.pixels // 10000:
+            effective = "Color"
+        elif unique_colors <= 2 and not self.luminance[1:255].any():
+            effective = "Bilevel"
+        else:
+            effective = "Grayscale"
+
+        return {"Effective Color": effective, "Unique Colors": unique_colors,
+                "Blank": blank_status(self.luminance)}
+
+
+def sample_step(width, height):
+    """Return the row and column stride that keeps at most MAX_SAMPLE_PIXELS"""
+    step = 1
+    while (height // step) * (width // step) > MAX_SAMPLE_PIXELS:
+        step += 1
+    return step
+
+
+def subsample(pixels):
+    """Take every n-th row and column so at most MAX_SAMPLE_PIXELS remain"""
+    height, width = pixels.shape[:2]
+    step = sample_step(width, height)
+    return pixels[::step, ::step] if step > 1 else pixels
+
+
+def blank_status(histogram):
+    """Classify a page from the histogram of its pixels' lightness"""
+    total = histogram.sum()
+    if not total:
+        return "Yes"
+    dominant = int(histogram.argmax())
+    background = histogram[max(0, dominant - BLANK_TOLERANCE):dominant + BLANK_TOLERANCE + 1].sum()
+    share = background / total
+    if share >= BLANK_FRACTION:
+        return "Yes"
+    if share >= NEAR_BLANK_FRACTION:
+        return "Near blank"
+    return "No"
+
+
+def open_pdf_image(data, encoding, width, height, bits, color_space):
+    """Build a Pillow image from a PDF image XObject's data
+
+    encoding is "jpeg" for DCTDecode data and "raw" for decoded samples.
+    Returns None for layouts this module does not decode.
+    """
+    from PIL import Image
+
+    if encoding == "jpeg":
+        return Image.open(io.BytesIO(data))
+    modes = {("/DeviceGray", 1): "1", ("/DeviceGray", 8): "L",
+             ("/DeviceRGB", 8): "RGB", ("/DeviceCMYK", 8): "CMYK"}
+    mode = modes.get((color_space, bits))
+    if mode is None or not width or not height:
+        return None
+    return Image.frombytes(mode, (width, height), data)
@@ -0,0 +1,222 @@
+"""Benchmark harness for the extraction paths.
+
+Each scenario runs in a fresh process over a synthetic corpus, timing
+file discovery, extraction and export separately and recording the
+process's peak resident memory. Cold start of the command line tool is
+timed in fresh interpreters and checked against a budget, along with
+the heavy libraries it loads before doing any work. Results can be saved
+as a baseline and later runs compared against it to flag regressions.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+from .core import EXTRACTOR_VERSION, ExtractOptions, extract_file
+from .crawl import iter_files
+from .export import RowWriter
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is then not reported
+    resource = None
+
+# name: (file type, options)
+SCENARIOS = {
+    "tiff": ("tiff", ExtractOptions()),
+    "pdf-pypdf2": ("pdf", ExtractOptions()),
+    "pdf-stream": ("pdf", ExtractOptions(pdf_engine="stream")),
+    "pdf-stream-placed": ("pdf", ExtractOptions(pdf_engine="stream", dpi_mode="placed",
+                                                pdf_images="all")),
+    "mixed": ("auto", ExtractOptions(pdf_engine="stream")),
+    "analyze": ("auto", ExtractOptions(pdf_engine="stream", analyze=True)),
+}
+
+# Relative slowdown or memory growth tolerated before flagging a regression
+DEFAULT_TOLERANCE = 0.15
+
+# Seconds the CLI may add to a bare interpreter's start, and the modules
+# that must only be imported once a run needs them
+STARTUP_BUDGET = 0.1
+HEAVY_MODULES = ("PIL", "PyPDF2", "pandas", "numpy", "openpyxl", "pyarrow", "asyncio",
+                 "multiprocessing", "concurrent.futures")
+# Startup changes smaller than this are noise, whatever the tolerance
+STARTUP_NOISE = 0.005
+
+
+def peak_rss_mb():
+    """Return this process's peak resident set size in MB, or None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario(corpus_dir, name, repeat=3):
+    """Run one scenario in this process and return its measurements
+
+    Every phase is repeated and the fastest time kept, which filters out
+    noise from other activity on the machine.
+    """
+    import tempfile
+
+    file_type, options = SCENARIOS[name]
+    phases = {"discover": [], "extract": [], "export": []}
+    with tempfile.TemporaryDirectory() as scratch:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            # A mixed batch covers the whole corpus
+            root = corpus_dir if file_type == "auto" else os.path.join(corpus_dir, file_type)
+            files = list(iter_files([root], file_type))
+            phases["discover"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            rows = []
+            for file_path in files:
+                rows.extend(extract_file(file_path, file_type, options))
+            phases["extract"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            with RowWriter(os.path.join(scratch, "out.csv"), file_type, options) as writer:
+                writer.write_rows(rows)
+            phases["export"].append(time.perf_counter() - started)
+
+    best = {phase: min(times) for phase, times in phases.items()}
+    pages = len({(row["Full Path"], row["Page"]) for row in rows})
+    extract_seconds = best["extract"] or 1e-9
+    return {
+        "files": len(files),
+        "pages": pages,
+        "rows": len(rows),
+        "files_per_sec": len(files) / extract_seconds,
+        "pages_per_sec": pages / extract_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "phases": best,
+    }
+
+
+def run_benchmarks(corpus_dir, names=None, repeat=3):
+    """Run scenarios, each in its own fresh process so peak memory is its own"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in names or SCENARIOS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[name] = pool.submit(run_scenario, corpus_dir, name, repeat).result()
+    return results
+
+
+def measure_startup(corpus_dir, repeat=5):
+    """Time cold starts of the CLI in fresh interpreters
+
+    Returns the best of repeat runs of a bare interpreter, of importing
+    the CLI and of extracting a single TIFF end to end, the import's
+    overhead over the bare interpreter, and the heavy modules that
+    importing the CLI loaded.
+    """
+    import tempfile
+
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sample = sorted(os.listdir(os.path.join(corpus_dir, "tiff")))[0]
+
+    def best(args):
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            subprocess.run([sys.executable] + args, cwd=package_root, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            times.append(time.perf_counter() - started)
+        return min(times)
+
+    interpreter = best(["-c", "pass"])
+    cli_import = best(["-c", "import extractor.cli"])
+    with tempfile.TemporaryDirectory() as scratch:
+        one_file = best(["-m", "extractor", "extract", "-o", os.path.join(scratch, "out.csv"),
+                         os.path.join(os.path.abspath(corpus_dir), "tiff", sample)])
+    probe = subprocess.run(
+        [sys.executable, "-c", "import sys, extractor.cli; "
+                               f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"],
+        cwd=package_root, check=True, capture_output=True, text=True)
+    return {
+        "interpreter": interpreter,
+        "cli_import": cli_import,
+        "one_file": one_file,
+        "overhead": cli_import - interpreter,
+        "heavy_modules": probe.stdout.split(),
+    }
+
+
+def save_baseline(path, results, corpus, startup=None):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"version": EXTRACTOR_VERSION, "corpus": corpus, "results": results,
+                   "startup": startup}, file, indent=2)
+
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def find_startup_regressions(startup, baseline=None, tolerance=DEFAULT_TOLERANCE):
+    """Describe startup over budget, heavy imports, and slowdowns against a baseline"""
+    regressions = []
+    if startup["overhead"] > STARTUP_BUDGET:
+        regressions.append(f"startup: importing the CLI takes {startup['overhead'] * 1000:.0f} ms "
+                           f"over a bare interpreter (budget {STARTUP_BUDGET * 1000:.0f} ms)")
+    if startup["heavy_modules"]:
+        regressions.append(f"startup: importing the CLI loads {', '.join(startup['heavy_modules'])}")
+    previous = (baseline or {}).get("startup")
+    if previous:
+        for metric in ("overhead", "one_file"):
+            if startup[metric] > previous[metric] * (1 + tolerance) + STARTUP_NOISE:
+                regressions.append(f"startup: {metric} grew from {previous[metric] * 1000:.1f} ms "
+                                   f"to {startup[metric] * 1000:.1f} ms")
+    return regressions
+
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Describe every scenario that got slower or bigger than the baseline allows"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        for metric in ("files_per_sec", "pages_per_sec"):
+            if result[metric] < previous[metric] * (1 - tolerance):
+                regressions.append(f"{name}: {metric} fell from {previous[metric]:.1f} "
+                                   f"to {result[metric]:.1f}")
+        if result["peak_rss_mb"] and previous.get("peak_rss_mb"):
+            if result["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + tolerance):
+                regressions.append(f"{name}: peak RSS grew from {previous['peak_rss_mb']:.1f} MB "
+                                   f"to {result['peak_rss_mb']:.1f} MB")
+    return regressions
+
+
+def format_results(results):
+    """Render results as a fixed-width table"""
+    lines = [f"{'scenario':<18} {'files':>6} {'pages':>6} {'files/s':>9} {'pages/s':>9} "
+             f"{'peak MB':>8} {'discover':>9} {'extract':>9} {'export':>9}"]
+    for name, result in results.items():
+        rss = result["peak_rss_mb"]
+        phases = result["phases"]
+        lines.append(
+            f"{name:<18} {result['files']:>6} {result['pages']:>6} "
+            f"{result['files_per_sec']:>9.1f} {result['pages_per_sec']:>9.1f} "
+            f"{(f'{rss:.1f}' if rss else '-'):>8} {phases['discover']:>8.3f}s "
+            f"{phases['extract']:>8.3f}s {phases['export']:>8.3f}s")
+    return "\n".join(lines)
+
+
+def format_startup(startup):
+    """Render startup timings as one line"""
+    heavy = ", ".join(startup["heavy_modules"]) or "none"
+    return (f"startup: interpreter {startup['interpreter'] * 1000:.1f} ms, CLI import "
+            f"{startup['cli_import'] * 1000:.1f} ms (+{startup['overhead'] * 1000:.1f} ms, budget "
+            f"{STARTUP_BUDGET * 1000:.0f} ms), one TIFF {startup['one_file'] * 1000:.1f} ms; "
+            f"heavy modules loaded: {heavy}")
@@ -0,0 +1,152 @@
+"""Persistent SQLite cache of extracted rows.
+
+Entries are keyed on the file path, the file type and the extraction
+options, and are only reused while the file's size and modification
+time are unchanged. With verify_hash the file content is hashed as well,
+so a rewrite that keeps size and mtime is caught and a file that was
+merely touched is still a hit. The cache is emptied whenever the
+extractor version changes, and the least recently used entries are
+evicted once max_entries is exceeded.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+
+from .core import EXTRACTOR_VERSION
+
+# Pending writes are committed in batches of this size
+COMMIT_INTERVAL = 500
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(file_path):
+    """Return the BLAKE2b digest of a file's content"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Cache of per-file metadata rows stored in an SQLite database"""
+
+    def __init__(self, db_path, max_entries=1000000, verify_hash=False):
+        self.max_entries = max_entries
+        self.verify_hash = verify_hash
+        self.hits = 0
+        self.misses = 0
+        self.pending_writes = 0
+
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " path TEXT, file_type TEXT, options TEXT,"
+            " size INTEGER, mtime_ns INTEGER, digest TEXT,"
+            " rows TEXT, last_used INTEGER,"
+            " PRIMARY KEY (path, file_type, options))")
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+
+        # Results from an older extractor may differ, so start over
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != EXTRACTOR_VERSION:
+            self.db.execute("DELETE FROM entries")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (EXTRACTOR_VERSION,))
+        self.db.commit()
+
+        row = self.db.execute("SELECT MAX(last_used) FROM entries").fetchone()
+        self.clock = row[0] or 0
+
+    def tick(self):
+        self.clock += 1
+        return self.clock
+
+    def lookup(self, file_path, file_type, options):
+        """Return cached rows for an unchanged file, or None"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+
+        # Key on the absolute path so a relative path means the same file
+        # whatever directory the run starts in
+        key = (os.path.abspath(file_path), file_type, options.cache_key())
+        entry = self.db.execute(
+            "SELECT size, mtime_ns, digest, rows FROM entries"
+            " WHERE path = ? AND file_type = ? AND options = ?", key).fetchone()
+        if entry is None:
+            self.misses += 1
+            return None
+
+        size, mtime_ns, digest, rows = entry
+        same_stat = size == stat.st_size and mtime_ns == stat.st_mtime_ns
+        if self.verify_hash and digest:
+            if size != stat.st_size or file_digest(file_path) != digest:
+                self.misses += 1
+                return None
+        elif not same_stat:
+            self.misses += 1
+            return None
+
+        self.db.execute(
+            "UPDATE entries SET size = ?, mtime_ns = ?, last_used = ?"
+            " WHERE path = ? AND file_type = ? AND options = ?",
+            (stat.st_size, stat.st_mtime_ns, self.tick()) + key)
+        self.wrote()
+        self.hits += 1
+        rows = json.loads(rows)
+        # Report the path as given, as an uncached run would
+        for row in rows:
+            if "Full Path" in row:
+                row["Full Path"] = str(file_path)
+        return rows
+
+    def store(self, file_path, file_type, options, rows):
+        """Remember the rows extracted from a file"""
+        try:
+            stat = os.stat(file_path)
+            digest = file_digest(file_path) if self.verify_hash else None
+        except OSError:
+            return
+
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (os.path.abspath(file_path), file_type, options.cache_key(), stat.st_size,
+             stat.st_mtime_ns, digest, json.dumps(rows), self.tick()))
+        self.wrote()
+
+    def wrote(self):
+        self.pending_writes += 1
+        if self.pending_writes >= COMMIT_INTERVAL:
+            self.flush()
+
+    def evict(self):
+        """Drop the least recently used entries beyond max_entries"""
+        if not self.max_entries:
+            return
+        count = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if count > self.max_entries:
+            self.db.execute(
+                "DELETE FROM entries WHERE rowid IN"
+                " (SELECT rowid FROM entries ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,))
+
+    def flush(self):
+        self.evict()
+        self.db.commit()
+        self.pending_writes = 0
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
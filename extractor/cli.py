@@ -0,0 +1,490 @@
+"""Command-line entry point for headless batch extraction."""
+
+import argparse
+import importlib.util
+import os
+import signal
+import sys
+from collections import Counter
+
+from . import timing
+from .benchmark import (DEFAULT_TOLERANCE, SCENARIOS, find_regressions, find_startup_regressions,
+                        format_results, format_startup, load_baseline, measure_startup,
+                        run_benchmarks, save_baseline)
+from .core import (ERROR_STATUSES, FILE_EXTENSIONS, RESOURCE_LIMIT_STATUS, TIMEOUT_STATUS,
+                   ExtractOptions, export_columns, is_error_row)
+from .crawl import iter_files
+from .export import RowWriter
+from .prefetch import iter_prefetched
+from .parallel import iter_extract, resolve_workers
+from .watch import DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE, DEFAULT_STATUS_PORT
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m extractor",
+        description="Extract TIFF and PDF metadata without the GUI.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    extract = subparsers.add_parser("extract", help="extract metadata from files, directories or globs")
+    extract.add_argument("inputs", nargs="+", help="files, directories or glob patterns")
+    extract.add_argument("-o", "--output", required=True,
+                         help="output file; .csv writes CSV, .jsonl JSON Lines, "
+                              ".parquet Parquet (needs pyarrow), anything else Excel")
+    add_extraction_arguments(extract)
+    extract.add_argument("--max-in-flight", type=int, default=None,
+                         help="maximum files queued or awaiting output (default: 4 per worker)")
+    extract.add_argument("--follow-symlinks", action="store_true",
+                         help="descend into symlinked directories (each directory is read once)")
+    extract.add_argument("--valid-names-only", action="store_true",
+                         help="skip files whose names do not match the ISBN naming convention")
+    extract.add_argument("--prefetch", action="store_true",
+                         help="read file headers (and PDF trailers) ahead of extraction with "
+                              "many concurrent requests; helps on NFS/SMB mounts")
+    extract.add_argument("--prefetch-concurrency", type=int, default=16,
+                         help="maximum concurrent prefetch reads (default: 16)")
+    extract.add_argument("--read-ahead", type=int, default=64,
+                         help="maximum files prefetched ahead of extraction (default: 64)")
+    extract.add_argument("--simulate-latency", type=float, default=0.0, metavar="MS",
+                         help="add MS milliseconds to every storage read, for benchmarking")
+    extract.add_argument("--profile", action="store_true",
+                         help="time each extraction and export stage and print percentiles "
+                              "and the slowest files")
+    extract.add_argument("--trace", metavar="FILE",
+                         help="write the stage timings as a Chrome trace (implies --profile)")
+    extract.set_defaults(func=run_extract)
+
+    watch = subparsers.add_parser("watch", help="extract files as they arrive in hot folders")
+    watch.add_argument("directories", nargs="+", help="directories to watch, with their subdirectories")
+    watch.add_argument("-o", "--output", required=True,
+                       help="CSV or JSON Lines file that rows are appended to")
+    add_extraction_arguments(watch)
+    watch.add_argument("--max-in-flight", type=int, default=None,
+                       help="maximum files being extracted at once (default: 4 per worker)")
+    watch.add_argument("--settle", type=float, default=DEFAULT_SETTLE, metavar="SECONDS",
+                       help="extract a file once its size and modification time have not "
+                            "changed for this long (default: 2)")
+    watch.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                       metavar="SECONDS",
+                       help="seconds between directory scans when polling (default: 1)")
+    watch.add_argument("--polling", action="store_true",
+                       help="poll the directories instead of using inotify, e.g. on network "
+                            "mounts whose changes inotify does not see")
+    watch.add_argument("--ignore-existing", action="store_true",
+                       help="only extract files that arrive or change after startup")
+    watch.add_argument("--status-port", type=int, default=DEFAULT_STATUS_PORT,
+                       help="serve JSON status on this localhost port; 0 turns it off "
+                            "(default: 8765)")
+    watch.set_defaults(func=run_watch)
+
+    manifest = subparsers.add_parser("manifest",
+                                     help="list the files of a sharded run in a manifest")
+    manifest.add_argument("inputs", nargs="+", help="files, directories or glob patterns")
+    manifest.add_argument("-t", "--type", dest="file_type", choices=sorted(FILE_EXTENSIONS),
+                          default="tiff", help="file type to list (default: tiff)")
+    manifest.add_argument("-o", "--output", required=True, help="manifest file, one path per line")
+    manifest.add_argument("--follow-symlinks", action="store_true",
+                          help="descend into symlinked directories (each directory is read once)")
+    manifest.add_argument("--valid-names-only", action="store_true",
+                          help="skip files whose names do not match the ISBN naming convention")
+    manifest.set_defaults(func=run_manifest)
+
+    shard = subparsers.add_parser("shard", help="extract one shard of a manifest, resumably")
+    shard.add_argument("manifest", help="manifest written by the manifest command")
+    shard.add_argument("--run-dir", required=True,
+                       help="directory for the run's checkpoints; every shard of a run uses "
+                            "the same settings")
+    shard.add_argument("--shards", type=int, required=True, help="number of shards in the run")
+    shard.add_argument("--shard", type=int, default=None, metavar="K",
+                       help="shard to extract, from 0 to N-1; without it every shard runs "
+                            "as a local process")
+    add_extraction_arguments(shard)
+    shard.add_argument("--max-in-flight", type=int, default=None,
+                       help="maximum files queued or awaiting output (default: 4 per worker)")
+    shard.set_defaults(func=run_shard_command)
+
+    merge = subparsers.add_parser("merge", help="merge the shards of a run into one export")
+    merge.add_argument("run_dirs", nargs="+",
+                       help="run directories holding the shards, e.g. one per node")
+    merge.add_argument("-o", "--output", required=True,
+                       help="output file; .csv writes CSV, .jsonl JSON Lines, "
+                            ".parquet Parquet (needs pyarrow), anything else Excel")
+    merge.add_argument("--partial", action="store_true",
+                       help="merge what has been extracted so far even if shards are unfinished")
+    merge.set_defaults(func=run_merge)
+
+    bench = subparsers.add_parser("bench", help="benchmark the extraction paths on a synthetic corpus")
+    bench.add_argument("--corpus", default="bench-corpus",
+                       help="corpus directory; missing files are generated (default: bench-corpus)")
+    bench.add_argument("--tiff-count", type=int, default=200, help="TIFFs in the corpus (default: 200)")
+    bench.add_argument("--pdf-count", type=int, default=50, help="PDFs in the corpus (default: 50)")
+    bench.add_argument("--seed", type=int, default=1, help="corpus generator seed (default: 1)")
+    bench.add_argument("--scenario", action="append", choices=sorted(SCENARIOS) + ["startup"],
+                       help="scenario to run; repeat for several; startup times cold starts "
+                            "of the CLI (default: all)")
+    bench.add_argument("--repeat", type=int, default=3,
+                       help="runs per scenario; the fastest is reported (default: 3)")
+    bench.add_argument("--baseline", help="JSON baseline to compare against; exits 1 on regressions")
+    bench.add_argument("--save-baseline", metavar="FILE", help="write the results as a baseline")
+    bench.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                       help="relative slowdown or memory growth allowed (default: 0.15)")
+    bench.set_defaults(func=run_bench)
+
+    return parser
+
+
+def positive_int(text):
+    """argparse type for counts that must be at least 1"""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+
+def add_extraction_arguments(parser):
+    """Add the options shared by every command that extracts files"""
+    parser.add_argument("-t", "--type", dest="file_type", choices=sorted(FILE_EXTENSIONS),
+                        default="tiff", help="file type to process; auto takes TIFFs and PDFs "
+                                            "together, detecting each from its content "
+                                            "(default: tiff)")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="worker processes; 0 uses every CPU (default: 1)")
+    parser.add_argument("--timeout", type=float, default=None, metavar="SECONDS",
+                        help="stop working on a file after this long and report it as Timeout")
+    parser.add_argument("--memory-limit", type=int, default=None, metavar="MB",
+                        help="cap each worker's memory; files that need more are reported "
+                             "as Resource limit")
+    parser.add_argument("--max-files-per-worker", type=int, default=None, metavar="N",
+                        help="replace each worker process after N files to bound leaks")
+    parser.add_argument("--max-pages", type=positive_int, default=None, metavar="N",
+                        help="only read the first N pages of each file, for quick sampling")
+    parser.add_argument("--pdf-engine", choices=("pypdf2", "stream"), default="pypdf2",
+                        help="stream memory-maps PDFs and reads only page and image "
+                             "dictionaries, falling back to pypdf2 when needed")
+    parser.add_argument("--dpi-mode", choices=("declared", "placed"), default="declared",
+                        help="placed computes PDF image DPI from the page content "
+                             "transforms instead of assuming the image fills the page")
+    parser.add_argument("--pdf-images", choices=("first", "all", "summary"), default="first",
+                        help="all writes a row per PDF image, including images inside forms; "
+                             "summary writes a row per page for its lowest resolution image")
+    parser.add_argument("--analyze", action="store_true",
+                        help="decode each page image and report its effective color, unique "
+                             "colors and whether it is blank (needs NumPy)")
+    parser.add_argument("--rules", metavar="FILE",
+                        help="JSON QA rules file; adds Rules (Pass/Fail) and Rule Failures "
+                             "columns")
+    parser.add_argument("--cache", metavar="DB",
+                        help="SQLite result cache; unchanged files are not parsed again")
+    parser.add_argument("--cache-verify-hash", action="store_true",
+                        help="also compare file content hashes before trusting the cache")
+    parser.add_argument("--cache-max-entries", type=int, default=1000000,
+                        help="evict least recently used cache entries beyond this count")
+
+
+class UsageError(Exception):
+    """A problem with the command line, reported without a traceback"""
+
+
+def build_options(args, io_latency=0.0, profile=False):
+    """Return the ExtractOptions the shared extraction arguments ask for"""
+    options = ExtractOptions(max_pages=args.max_pages, pdf_engine=args.pdf_engine,
+                             dpi_mode=args.dpi_mode, pdf_images=args.pdf_images,
+                             io_latency=io_latency, profile=profile, analyze=args.analyze)
+    if options.analyze and importlib.util.find_spec("numpy") is None:
+        raise UsageError("Content analysis requires numpy (pip install numpy)")
+    return options
+
+
+def load_rule_set(args, options):
+    """Return the RuleSet named by --rules, or None"""
+    if not args.rules:
+        return None
+    from .rules import RuleError, load_rules
+    try:
+        rules = load_rules(args.rules)
+    except (OSError, RuleError) as e:
+        raise UsageError(f"Cannot load rules: {e}") from None
+    missing = rules.missing_columns(export_columns(args.file_type, options))
+    if missing:
+        print(f"Warning: the rules test columns this run does not produce: "
+              f"{', '.join(missing)}", file=sys.stderr)
+    return rules
+
+
+def open_writer(args, options, with_rules, append=False):
+    """Open the RowWriter for --output, with the rule columns if with_rules"""
+    extra_columns = ()
+    if with_rules:
+        from .rules import RULE_COLUMNS
+        extra_columns = RULE_COLUMNS
+    try:
+        return RowWriter(args.output, args.file_type, options, extra_columns, append)
+    except (ImportError, ValueError) as e:
+        raise UsageError(str(e)) from None
+
+
+def open_cache(args):
+    """Warn about unsupported limits and return the ResultCache named by --cache, or None"""
+    if args.memory_limit:
+        from .workers import MEMORY_LIMIT_SUPPORTED
+        if not MEMORY_LIMIT_SUPPORTED:
+            print("Warning: --memory-limit is not supported on this platform", file=sys.stderr)
+    if not args.cache:
+        return None
+    from .cache import ResultCache
+    return ResultCache(args.cache, args.cache_max_entries, args.cache_verify_hash)
+
+
+def run_extract(args):
+    options = build_options(args, args.simulate_latency / 1000, args.profile or bool(args.trace))
+    rules = load_rule_set(args, options)
+    writer = open_writer(args, options, rules is not None)
+    cache = open_cache(args)
+
+    # Files are extracted while the directories are still being walked, and
+    # rows are written as each file finishes, so memory does not grow with
+    # the size of the batch
+    counts = Counter()
+    files = iter_files(args.inputs, args.file_type, args.follow_symlinks,
+                       args.valid_names_only, counts)
+    if args.prefetch:
+        files = iter_prefetched(files, args.file_type, args.prefetch_concurrency, args.read_ahead,
+                                latency=options.io_latency)
+    stats = Counter()
+    profile = None
+    if options.profile:
+        timing.enabled = True
+        profile = timing.Profile(keep_spans=bool(args.trace))
+    errors = Counter()
+    failed_rows = 0
+    try:
+        with writer:
+            for _, rows in iter_extract(files, args.file_type, args.workers, args.max_in_flight,
+                                        ordered=True, options=options, cache=cache, stats=stats,
+                                        profile=profile, timeout=args.timeout,
+                                        memory_limit=(args.memory_limit or 0) * 1024 * 1024,
+                                        max_files_per_worker=args.max_files_per_worker):
+                if rules is not None:
+                    with timing.stage("rules"):
+                        rules.apply(rows)
+                    failed_rows += sum(row["Rules"] == "Fail" for row in rows)
+                with timing.stage("export.write"):
+                    writer.write_rows(rows)
+                errors.update(row["DPI"] for row in rows if is_error_row(row))
+    finally:
+        if cache is not None:
+            cache.close()
+            print(f"Cache: {cache.hits} hits, {cache.misses} misses", file=sys.stderr)
+
+    if counts["skipped_names"]:
+        print(f"Skipped {counts['skipped_names']} files not matching the naming convention",
+              file=sys.stderr)
+    if not counts["files"]:
+        print("No files found", file=sys.stderr)
+        return 2
+
+    failures = f"{errors['Error']} errors"
+    if errors[TIMEOUT_STATUS]:
+        failures += f", {errors[TIMEOUT_STATUS]} timed out"
+    if errors[RESOURCE_LIMIT_STATUS]:
+        failures += f", {errors[RESOURCE_LIMIT_STATUS]} over the memory limit"
+    print(f"Extracted metadata from {writer.rows_written} items in {counts['files']} files "
+          f"({failures}) to {args.output}", file=sys.stderr)
+    if rules is not None:
+        print(f"Rules: {failed_rows} of {writer.rows_written} items failed", file=sys.stderr)
+    report_stats(stats)
+    if profile is not None:
+        profile.add(timing.take_spans())
+        print(profile.format_summary(), file=sys.stderr)
+        if args.trace:
+            profile.write_trace(args.trace)
+            print(f"Trace written to {args.trace}", file=sys.stderr)
+    return 0
+
+
+def run_watch(args):
+    from .watch import JOURNAL_SUFFIX, HotFolder, serve_status
+
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            raise UsageError(f"{directory} is not a directory")
+    options = build_options(args)
+    rules = load_rule_set(args, options)
+    writer = open_writer(args, options, rules is not None, append=True)
+    cache = open_cache(args)
+    hot_folder = HotFolder(args.directories, writer, args.file_type, resolve_workers(args.workers),
+                           options, cache, rules, args.settle, args.poll_interval, args.polling,
+                           args.ignore_existing, args.timeout,
+                           (args.memory_limit or 0) * 1024 * 1024, args.max_files_per_worker,
+                           args.max_in_flight, args.output + JOURNAL_SUFFIX)
+    server = None
+    if args.status_port:
+        try:
+            server = serve_status(hot_folder, args.status_port)
+        except OSError as e:
+            writer.close()
+            raise UsageError(f"Cannot serve status on port {args.status_port}: {e.strerror}") from None
+        print(f"Status at http://127.0.0.1:{args.status_port}/status", file=sys.stderr)
+
+    # Ctrl+C and service managers stop the daemon the same way: files
+    # already being extracted are finished and written
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: hot_folder.stop())
+    try:
+        with writer:
+            hot_folder.run()
+    finally:
+        if server is not None:
+            server.shutdown()
+        if cache is not None:
+            cache.close()
+
+    status = hot_folder.status()
+    errors = sum(status["errors"].values())
+    print(f"Stopped: appended {status['rows_written']} items from {status['files_done']} files "
+          f"({errors} failed) to {args.output}; {status['queue_depth']} files were still "
+          f"waiting", file=sys.stderr)
+    return 0
+
+
+def run_manifest(args):
+    from .shard import write_manifest
+
+    counts = Counter()
+    files = iter_files(args.inputs, args.file_type, args.follow_symlinks, args.valid_names_only,
+                       counts)
+    written = write_manifest(files, args.output)
+    if counts["skipped_names"]:
+        print(f"Skipped {counts['skipped_names']} files not matching the naming convention",
+              file=sys.stderr)
+    if not written:
+        print("No files found", file=sys.stderr)
+        return 2
+    print(f"Listed {written} files in {args.output}", file=sys.stderr)
+    return 0
+
+
+def run_shard_command(args):
+    from .shard import ShardError, describe_run, open_run, run_shard
+
+    if args.shards < 1:
+        raise UsageError("--shards must be at least 1")
+    options = build_options(args)
+    rules = load_rule_set(args, options)
+    try:
+        run = describe_run(args.manifest, args.shards, args.file_type, options, args.rules)
+        open_run(args.run_dir, run)
+    except (OSError, ShardError) as e:
+        raise UsageError(f"Cannot start the run: {e}") from None
+    if args.shard is None:
+        return run_local_shards(args.argv, args.shards)
+
+    cache = open_cache(args)
+    try:
+        counts = run_shard(args.manifest, args.run_dir, args.shard, args.shards, args.file_type,
+                           options, args.workers, cache, rules, args.timeout,
+                           (args.memory_limit or 0) * 1024 * 1024, args.max_files_per_worker,
+                           args.max_in_flight)
+    except ShardError as e:
+        raise UsageError(str(e)) from None
+    except KeyboardInterrupt:
+        print(f"Shard {args.shard} interrupted; run the same command again to resume",
+              file=sys.stderr)
+        return 1
+    finally:
+        if cache is not None:
+            cache.close()
+
+    failed = sum(counts[status] for status in ERROR_STATUSES)
+    print(f"Shard {args.shard} of {args.shards} finished: {counts['rows']} items from "
+          f"{counts['files']} files ({failed} failed, {counts['retried']} retried), "
+          f"{counts['resumed']} files done earlier", file=sys.stderr)
+    return 0
+
+
+def run_local_shards(argv, shards):
+    """Run the shard command argv once per shard, each in its own process, and wait for them"""
+    import subprocess
+
+    command = [sys.executable, "-m", "extractor"] + argv
+    processes = [subprocess.Popen(command + ["--shard", str(shard)]) for shard in range(shards)]
+    try:
+        codes = [process.wait() for process in processes]
+    except KeyboardInterrupt:
+        # The shards got the interrupt too; let them save their checkpoints
+        codes = [process.wait() for process in processes]
+    return max(codes)
+
+
+def run_merge(args):
+    from .shard import ShardError, check_runs, merge_shards, missing_shards, run_options
+
+    try:
+        run = check_runs(args.run_dirs)
+    except (OSError, ShardError) as e:
+        raise UsageError(f"Cannot merge: {e}") from None
+    missing = missing_shards(args.run_dirs, run["shards"])
+    if missing and not args.partial:
+        raise UsageError(f"Cannot merge: shards {', '.join(map(str, missing))} have not "
+                         f"finished (use --partial to merge anyway)")
+    args.file_type = run["file_type"]
+    writer = open_writer(args, run_options(run), bool(run["rules"]))
+    with writer:
+        counts = merge_shards(args.run_dirs, writer)
+
+    failed = sum(counts[status] for status in ERROR_STATUSES)
+    print(f"Merged {counts['rows']} items from {counts['files']} of {run['manifest']['files']} "
+          f"files ({failed} failed) to {args.output}", file=sys.stderr)
+    return 0
+
+
+def run_bench(args):
+    from .synthetic import make_corpus
+
+    corpus = make_corpus(args.corpus, args.tiff_count, args.pdf_count, args.seed)
+    print(f"Corpus {args.corpus}: {corpus['tiff_files']} TIFFs ({corpus['tiff_pages']} pages), "
+          f"{corpus['pdf_files']} PDFs ({corpus['pdf_pages']} pages)", file=sys.stderr)
+
+    names = [name for name in args.scenario or SCENARIOS if name != "startup"]
+    results = run_benchmarks(args.corpus, names, args.repeat) if names else {}
+    if results:
+        print(format_results(results))
+    startup = None
+    if not args.scenario or "startup" in args.scenario:
+        startup = measure_startup(args.corpus, max(5, args.repeat))
+        print(format_startup(startup))
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results, corpus, startup)
+    baseline = None
+    if args.baseline:
+        baseline = load_baseline(args.baseline)
+        if baseline.get("corpus") != corpus:
+            print("Warning: the baseline was recorded on a different corpus", file=sys.stderr)
+    # The startup budget applies with or without a baseline
+    regressions = find_startup_regressions(startup, baseline, args.tolerance) if startup else []
+    if baseline is not None:
+        regressions += find_regressions(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def report_stats(stats):
+    """Print the extraction counters gathered from the workers"""
+    analysed = stats["pdf_image_misses"]
+    reused = stats["pdf_image_hits"]
+    if analysed or reused:
+        rate = 100.0 * reused / (analysed + reused)
+        print(f"PDF images: {analysed} analysed, {reused} reused from shared objects "
+              f"({rate:.1f}% hit rate)", file=sys.stderr)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.argv = sys.argv[1:] if argv is None else list(argv)
+    try:
+        return args.func(args)
+    except UsageError as e:
+        print(e, file=sys.stderr)
+        return 2
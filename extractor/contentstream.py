@@ -0,0 +1,113 @@
+"""Minimal content stream scanner for finding where images are placed.
+
+Only the graphics state needed for placement is tracked: q/Q save and
+restore the current transformation matrix (CTM), cm concatenates a
+matrix and Do paints an XObject into the unit square of the current
+CTM. One compiled regular expression jumps straight to those operators
+(and to strings and inline image data, which must be skipped), so the
+scanner never builds tokens for path, text or color operators and stays
+fast on content streams tens of megabytes long.
+"""
+
+import math
+import re
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+# Bytes that end a PDF token
+_DELIM = rb"\x00\t\n\f\r ()<>\[\]{}/%"
+_NUMBER = rb"[+-]?(?:\d+\.?\d*|\.\d+)"
+
+SCAN_RE = re.compile(
+    rb"(?P<cm>(?:" + _NUMBER + rb"[\x00\t\n\f\r ]+){6})cm(?![^" + _DELIM + rb"])"
+    rb"|(?P<do>/[^" + _DELIM + rb"]+)[\x00\t\n\f\r ]*Do(?![^" + _DELIM + rb"])"
+    rb"|/[^" + _DELIM + rb"]*"
+    rb"|(?<![^" + _DELIM + rb"])(?P<op>q|Q|ID)(?![^" + _DELIM + rb"])"
+    rb"|(?P<string>\()"
+    rb"|%[^\r\n]*"
+    rb"|[A-Za-z'\"*]+"
+)
+STRING_CHUNK_RE = re.compile(rb"[^()\\]*")
+NAME_ESCAPE_RE = re.compile(rb"#([0-9A-Fa-f]{2})")
+INLINE_END_RE = re.compile(rb"[\x00\t\n\f\r ]EI(?![^" + _DELIM + rb"])")
+
+
+def multiply(m, n):
+    """Return the matrix product m x n (PDF row-vector convention)"""
+    a, b, c, d, e, f = m
+    na, nb, nc, nd, ne, nf = n
+    return (a * na + b * nc, a * nb + b * nd,
+            c * na + d * nc, c * nb + d * nd,
+            e * na + f * nc + ne, e * nb + f * nd + nf)
+
+
+def skip_string(data, pos):
+    """Return the position just past a literal string opened before pos"""
+    depth = 1
+    end = len(data)
+    while pos < end:
+        pos = STRING_CHUNK_RE.match(data, pos).end()
+        if pos >= end:
+            break
+        char = data[pos]
+        if char == 0x5C:  # backslash escapes the next byte
+            pos += 2
+        elif char == 0x28:  # (
+            depth += 1
+            pos += 1
+        else:
+            depth -= 1
+            pos += 1
+            if depth == 0:
+                break
+    return pos
+
+
+def iter_placements(data, ctm=IDENTITY):
+    """Yield (XObject name with its slash, CTM) for every Do operator"""
+    stack = []
+    pos = 0
+    search = SCAN_RE.search
+    while True:
+        match = search(data, pos)
+        if match is None:
+            return
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == "cm":
+            values = tuple(float(value) for value in match.group("cm").split())
+            ctm = multiply(values, ctm)
+        elif kind == "do":
+            name = match.group("do")
+            if b"#" in name:
+                name = NAME_ESCAPE_RE.sub(lambda m: bytes([int(m.group(1), 16)]), name)
+            yield name.decode("latin-1"), ctm
+        elif kind == "op":
+            op = match.group("op")
+            if op == b"q":
+                stack.append(ctm)
+            elif op == b"Q":
+                if stack:
+                    ctm = stack.pop()
+            else:
+                # Inline image data is binary; jump to its EI operator
+                end = INLINE_END_RE.search(data, pos + 1)
+                if end is None:
+                    return
+                pos = end.end()
+        elif kind == "string":
+            pos = skip_string(data, pos)
+
+
+def placed_size(ctm):
+    """Return the (width, height) in points of the unit square under ctm"""
+    a, b, c, d, _, _ = ctm
+    return math.hypot(a, b), math.hypot(c, d)
+
+
+def effective_dpi(width_px, height_px, ctm):
+    """Return the (x, y) resolution of an image painted with ctm, or None"""
+    width_pt, height_pt = placed_size(ctm)
+    if width_pt <= 0 or height_pt <= 0:
+        return None
+    return width_px / (width_pt / 72), height_px / (height_pt / 72)
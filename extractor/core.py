@@ -0,0 +1,1028 @@
+"""GUI-free metadata extraction core shared by the CLI and the Tkinter app.
+
+Pillow and PyPDF2 are imported on first use: most TIFFs never need
+Pillow, and a TIFF-only run never needs PyPDF2.
+"""
+
+import os
+import re
+from collections import Counter
+
+from .analysis import (NO_IMAGE, UNSUPPORTED, analyze_chunks, analyze_image, not_analysed,
+                       open_pdf_image, sample_step)
+from .contentstream import IDENTITY, effective_dpi, iter_placements, multiply
+from .pdf import PdfDocument, PdfFormatError
+from .prefetch import open_input
+from .raster import RasterFile
+from .sniff import SNIFF_SIZE, file_type_from_extension, sniff_file_type
+from .tiff import (COMPRESSION_NAMES, IMAGE_LENGTH, IMAGE_WIDTH, TiffFormatError, describe_color_depth,
+                   iter_tiff_ifds, summarize_ifd)
+from .timing import stage
+
+# Bump whenever extracted values change so cached results are discarded
+EXTRACTOR_VERSION = "1.1.0"
+
+# Columns shown in the results table
+TIFF_COLUMNS = ("Filename", "Page", "Format", "Extension", "DPI", "Compression", "Color Depth", "Filename Valid")
+PDF_COLUMNS = ("Filename", "Page", "Type", "Color Depth", "DPI", "Compression", "Filename Valid")
+
+# Columns written on export
+TIFF_EXPORT_COLUMNS = ["File Type", "Filename", "Page", "Format", "Extension", "DPI", "Compression",
+                       "Color Depth", "Filename Valid", "Full Path"]
+PDF_EXPORT_COLUMNS = ["File Type", "Filename", "Page", "Type", "Color Depth", "DPI",
+                      "Compression", "Filename Valid", "Full Path"]
+
+# Columns for batches mixing TIFFs and PDFs: those of both types, left
+# blank where they do not apply
+MIXED_COLUMNS = ("Filename", "File Type", "Page", "Format", "Type", "DPI", "Compression",
+                 "Color Depth", "Filename Valid")
+MIXED_EXPORT_COLUMNS = ["File Type", "Filename", "Page", "Format", "Type", "Extension",
+                        "Color Depth", "DPI", "Compression", "Filename Valid", "Full Path"]
+
+# Extra PDF columns for each way of reporting the images on a page; they
+# follow the Page column
+PDF_IMAGE_COLUMNS = {
+    "first": (),
+    "all": ("Image",),
+    "summary": ("Images", "Max DPI"),
+}
+
+# Columns added by content analysis; they follow the Color Depth column
+ANALYSIS_COLUMNS = ("Effective Color", "Unique Colors", "Blank")
+
+# Placeholder values written into every field of a row for a failed file:
+# a parse error, a file that ran past the time limit, or one that needed
+# more memory than a worker is allowed
+TIMEOUT_STATUS = "Timeout"
+RESOURCE_LIMIT_STATUS = "Resource limit"
+ERROR_STATUSES = ("Error", TIMEOUT_STATUS, RESOURCE_LIMIT_STATUS)
+
+# "auto" batches mix both types and detect each file's type from its content
+FILE_EXTENSIONS = {
+    "tiff": (".tif", ".tiff"),
+    "pdf": (".pdf",),
+    "auto": (".tif", ".tiff", ".pdf"),
+}
+
+# Naming conventions: ISBN13_#####.tif and ISBN13.pdf, and the same stems
+# with any other extension
+TIFF_NAME_RE = re.compile(r'^\d{13}_\d{5}\.tif$')
+TIFF_STEM_RE = re.compile(r'^\d{13}_\d{5}\.')
+PDF_NAME_RE = re.compile(r'^\d{13}\.pdf$')
+PDF_STEM_RE = re.compile(r'^\d{13}\.')
+
+
+# Per-process counters; the batch engine collects them after every file
+stats = Counter()
+
+
+def take_stats():
+    """Return the counters gathered since the last call and reset them"""
+    snapshot = Counter(stats)
+    stats.clear()
+    return snapshot
+
+
+class ExtractOptions:
+    """Settings that change what is extracted from each file"""
+
+    def __init__(self, max_pages=None, pdf_engine="pypdf2", dpi_mode="declared",
+                 pdf_images="first", io_latency=0.0, profile=False, analyze=False):
+        # Stop after this many pages per file (None reads every page)
+        self.max_pages = max_pages
+        # "pypdf2" parses whole documents; "stream" memory-maps the file and
+        # resolves only the page tree and image dictionaries
+        self.pdf_engine = pdf_engine
+        # "declared" estimates PDF image DPI from the image and page size;
+        # "placed" follows the content stream transforms to each image
+        self.dpi_mode = dpi_mode
+        # "first" reports the first image listed on each page, "all" one row
+        # per image including those inside forms, "summary" one row per page
+        # describing its lowest resolution image
+        self.pdf_images = pdf_images
+        # Seconds added to every storage read, to benchmark slow mounts; it
+        # does not change results so it is not part of the cache key
+        self.io_latency = io_latency
+        # Record per-stage timings in the workers; like io_latency it does
+        # not change results
+        self.profile = profile
+        # Decode the pixels of each page image and report its effective
+        # color, unique colors and whether it is blank
+        self.analyze = analyze
+
+    def cache_key(self):
+        """Stable text identifying these settings in the result cache"""
+        key = (f"max_pages={self.max_pages};pdf_engine={self.pdf_engine};dpi_mode={self.dpi_mode};"
+               f"pdf_images={self.pdf_images}")
+        # Only added when set, so results cached before analysis existed
+        # stay valid
+        if self.analyze:
+            key += ";analyze=True"
+        return key
+
+
+DEFAULT_OPTIONS = ExtractOptions()
+
+
+def display_columns(file_type, options=DEFAULT_OPTIONS):
+    """Return the results table columns for a file type"""
+    if file_type == "tiff":
+        columns = TIFF_COLUMNS
+    elif file_type == "auto":
+        columns = with_image_columns(MIXED_COLUMNS, options)
+    else:
+        columns = with_image_columns(PDF_COLUMNS, options)
+    return with_analysis_columns(columns, options)
+
+
+def export_columns(file_type, options=DEFAULT_OPTIONS):
+    """Return the export column order for a file type"""
+    if file_type == "tiff":
+        columns = tuple(TIFF_EXPORT_COLUMNS)
+    elif file_type == "auto":
+        columns = with_image_columns(tuple(MIXED_EXPORT_COLUMNS), options)
+    else:
+        columns = with_image_columns(tuple(PDF_EXPORT_COLUMNS), options)
+    return list(with_analysis_columns(columns, options))
+
+
+def with_image_columns(columns, options):
+    """Insert the columns added by options.pdf_images after Page"""
+    extra = PDF_IMAGE_COLUMNS[options.pdf_images]
+    at = columns.index("Page") + 1
+    return columns[:at] + extra + columns[at:]
+
+
+def with_analysis_columns(columns, options):
+    """Insert the content analysis columns after Color Depth when enabled"""
+    if not options.analyze:
+        return columns
+    at = columns.index("Color Depth") + 1
+    return columns[:at] + ANALYSIS_COLUMNS + columns[at:]
+
+
+def extract_file(file_path, file_type, options=DEFAULT_OPTIONS):
+    """Extract metadata rows for one file, isolating failures as an error row
+
+    With file_type "auto" the file's type is detected from its content,
+    while its name is checked by extension, as the crawler's name filter
+    does, so a misnamed file is judged by one rule throughout.
+    """
+    try:
+        with stage("file", file_path):
+            kind = file_type
+            if kind == "auto":
+                kind = detect_file_type(file_path, options.io_latency)
+            check_name = FILENAME_CHECKS[file_type]
+            if kind == "tiff":
+                return get_tiff_metadata(file_path, options.max_pages, options.io_latency,
+                                         options.analyze, check_name)
+            return get_pdf_metadata(file_path, options.max_pages, options.pdf_engine,
+                                    options.dpi_mode, options.pdf_images, options.io_latency,
+                                    options.analyze, check_name)
+    except MemoryError:
+        print(f"Resource limit processing {file_path}")
+        return [error_row(file_path, file_type, RESOURCE_LIMIT_STATUS, options)]
+    except Exception as e:
+        print(f"Error processing {file_path}: {str(e)}")
+        return [error_row(file_path, file_type, options=options)]
+
+
+def error_row(file_path, file_type, status="Error", options=DEFAULT_OPTIONS):
+    """Build the placeholder row reported for a file that could not be processed"""
+    row = {col: status for col in export_columns(file_type, options)}
+    if file_type == "auto":
+        # The content may be unreadable, so go by the name
+        file_type = file_type_from_extension(file_path)
+    row["File Type"] = "TIFF" if file_type == "tiff" else "PDF"
+    row["Filename"] = os.path.basename(file_path)
+    row["Full Path"] = str(file_path)
+    return row
+
+
+def detect_file_type(file_path, latency=0.0):
+    """Return "tiff" or "pdf" from a file's signature, or else its extension"""
+    with stage("detect"):
+        with open_input(file_path, latency) as file:
+            head = file.read(SNIFF_SIZE)
+    return sniff_file_type(head) or file_type_from_extension(file_path)
+
+
+def is_error_row(row):
+    """Return True if the row is a placeholder for a file that failed"""
+    return row.get("DPI") in ERROR_STATUSES
+
+
+def get_tiff_metadata(file_path, max_pages=None, latency=0.0, analyze=False, check_name=None):
+    filename = os.path.basename(file_path)
+
+    # Check filename convention
+    filename_valid = (check_name or check_tiff_filename_convention)(filename)
+
+    extension = os.path.splitext(file_path)[1].lower()
+
+    metadata_list = []
+    for page_num, info in enumerate(iter_tiff_page_info(file_path, max_pages, latency)):
+        img_format, dpi, compression, color_depth = info
+        metadata_list.append({
+            "File Type": "TIFF",
+            "Filename": filename,
+            "Page": page_num + 1,
+            "Format": img_format,
+            "Extension": extension,
+            "DPI": dpi,
+            "Compression": compression,
+            "Color Depth": color_depth,
+            "Filename Valid": filename_valid,
+            "Full Path": str(file_path)
+        })
+
+    if analyze:
+        for row, analysis in zip(metadata_list, analyze_tiff_pages(file_path, len(metadata_list))):
+            row.update(analysis)
+
+    return metadata_list
+
+
+def analyze_tiff_pages(file_path, pages):
+    """Measure the pixels of the first pages of a TIFF
+
+    Pages are read band by band from a memory map where the raster reader
+    supports their layout, so huge uncompressed or Deflate scans are
+    measured in bounded memory; other pages are decoded by Pillow.
+    """
+    results = [None] * pages
+    with stage("analyze"):
+        try:
+            with RasterFile(file_path) as raster:
+                for page, ifd in enumerate(raster.iter_ifds(pages)):
+                    try:
+                        step = sample_step(ifd.get(IMAGE_WIDTH, 0), ifd.get(IMAGE_LENGTH, 0))
+                        results[page] = analyze_chunks(raster.iter_bands(ifd, step))
+                    except (TiffFormatError, ValueError):
+                        pass
+        except (TiffFormatError, OSError, ValueError):
+            pass
+
+        missing = [page for page, result in enumerate(results) if result is None]
+        if missing:
+            for page, result in zip(missing, analyze_tiff_pages_pillow(file_path, missing)):
+                results[page] = result
+    return results
+
+
+def analyze_tiff_pages_pillow(file_path, pages):
+    """Measure the given pages of a TIFF with Pillow, which decodes each whole page"""
+    from PIL import Image
+
+    try:
+        img = Image.open(file_path)
+    except MemoryError:
+        raise
+    except Exception:
+        return [not_analysed("Unreadable")] * len(pages)
+    results = []
+    with img:
+        for page in pages:
+            try:
+                img.seek(page)
+                results.append(analyze_image(img))
+            except MemoryError:
+                raise
+            except Exception:
+                results.append(not_analysed("Unreadable"))
+    return results
+
+
+def iter_tiff_page_info(file_path, max_pages=None, latency=0.0):
+    """Yield (format, DPI, compression, color depth) per page, reading headers only where possible"""
+    page = 0
+    try:
+        # Walk the IFD chain one page at a time without decoding pixels
+        ifds = iter_tiff_ifds(file_path, max_pages, latency)
+        while True:
+            with stage("tiff.ifd"):
+                ifd = next(ifds, None)
+                if ifd is None:
+                    break
+                info = ("TIFF",) + summarize_ifd(ifd)
+            yield info
+            page += 1
+        return
+    except TiffFormatError:
+        pass
+
+    # Odd files go through Pillow from the first page the header reader could not handle
+    from PIL import Image
+    with stage("tiff.pillow_open"):
+        img = Image.open(str(file_path))
+    with img:
+        while max_pages is None or page < max_pages:
+            with stage("tiff.pillow_page"):
+                try:
+                    img.seek(page)
+                except EOFError:
+                    break
+                info = get_tiff_info_pillow(img)
+            yield info
+            page += 1
+
+
+def get_tiff_info_pillow(img):
+    """Read format, DPI, compression and color depth of the current Pillow frame"""
+    # Get basic info
+    img_format = img.format or "Unknown"
+
+    # Get DPI - extract exact values
+    dpi_x, dpi_y = img.info.get('dpi', (0, 0))
+    if dpi_x and dpi_y:
+        dpi = f"{dpi_x} x {dpi_y}"
+    else:
+        # Try to get resolution from EXIF data
+        dpi = get_tiff_resolution(img)
+
+    # Get compression - extract exact value
+    compression = get_tiff_compression(img)
+
+    # Get color depth - extract exact value
+    color_depth = get_tiff_color_depth(img)
+
+    return img_format, dpi, compression, color_depth
+
+
+def get_tiff_resolution(img):
+    """Extract exact resolution from TIFF metadata"""
+    try:
+        # Try to get resolution from EXIF data
+        with stage("tiff.exif"):
+            exif_data = img._getexif() if hasattr(img, '_getexif') else None
+        if exif_data:
+            # XResolution tag (282)
+            x_res = exif_data.get(282, (1, 1)) if exif_data else (1, 1)
+            # YResolution tag (283)
+            y_res = exif_data.get(283, (1, 1)) if exif_data else (1, 1)
+
+            if isinstance(x_res, tuple) and isinstance(y_res, tuple):
+                x_dpi = round(x_res[0] / x_res[1]) if x_res[1] != 0 else 0
+                y_dpi = round(y_res[0] / y_res[1]) if y_res[1] != 0 else 0
+                if x_dpi and y_dpi:
+                    return f"{x_dpi} x {y_dpi}"
+
+        # Try to get resolution from tag data
+        if hasattr(img, 'tag'):
+            tags = img.tag_v2
+            # XResolution tag (282)
+            if 282 in tags:
+                x_res = tags[282]
+                if isinstance(x_res, tuple) and len(x_res) == 2:
+                    x_dpi = round(x_res[0] / x_res[1]) if x_res[1] != 0 else 0
+                else:
+                    x_dpi = x_res if isinstance(x_res, (int, float)) else 0
+            else:
+                x_dpi = 0
+
+            # YResolution tag (283)
+            if 283 in tags:
+                y_res = tags[283]
+                if isinstance(y_res, tuple) and len(y_res) == 2:
+                    y_dpi = round(y_res[0] / y_res[1]) if y_res[1] != 0 else 0
+                else:
+                    y_dpi = y_res if isinstance(y_res, (int, float)) else 0
+            else:
+                y_dpi = 0
+
+            if x_dpi and y_dpi:
+                return f"{x_dpi} x {y_dpi}"
+
+        return "Not specified"
+    except:
+        return "Not specified"
+
+
+def get_tiff_compression(img):
+    """Extract exact compression from TIFF metadata"""
+    try:
+        compression = "Unknown"
+        if hasattr(img, 'tag'):
+            tags = img.tag_v2
+            if 259 in tags:  # Compression tag
+                compression_code = tags[259]
+                compression = COMPRESSION_NAMES.get(compression_code, f"Unknown ({compression_code})")
+        return compression
+    except:
+        return "Unknown"
+
+
+def get_tiff_color_depth(img):
+    """Extract exact color depth from TIFF metadata"""
+    try:
+        # Get bits per sample from metadata
+        bits_per_sample = 0
+        if hasattr(img, 'tag'):
+            tags = img.tag_v2
+            if 258 in tags:  # BitsPerSample tag
+                bits_data = tags[258]
+                if isinstance(bits_data, (list, tuple)):
+                    bits_per_sample = bits_data[0] if bits_data else 0
+                else:
+                    bits_per_sample = bits_data
+
+        # Get samples per pixel from metadata
+        samples_per_pixel = 1
+        if hasattr(img, 'tag'):
+            tags = img.tag_v2
+            if 277 in tags:  # SamplesPerPixel tag
+                samples_data = tags[277]
+                if isinstance(samples_data, (list, tuple)):
+                    samples_per_pixel = samples_data[0] if samples_data else 1
+                else:
+                    samples_per_pixel = samples_data
+
+        # Calculate total color depth
+        total_bits = bits_per_sample * samples_per_pixel
+
+        # Get color mode for additional info
+        return describe_color_depth(total_bits, img.mode)
+
+    except:
+        return "Unknown"
+
+
+def get_pdf_metadata(file_path, max_pages=None, engine="pypdf2", dpi_mode="declared",
+                     images="first", latency=0.0, analyze=False, check_name=None):
+    filename = os.path.basename(file_path)
+
+    # Check filename convention
+    filename_valid = (check_name or check_pdf_filename_convention)(filename)
+
+    if engine == "stream":
+        try:
+            with stage("pdf.open"):
+                doc = PdfDocument(file_path)
+            with doc:
+                return get_pdf_page_rows(doc.iter_pages(max_pages), filename, filename_valid,
+                                         str(file_path), dpi_mode, images, analyze)
+        except MemoryError:
+            # Hitting the memory cap must be reported, not retried with a hungrier reader
+            raise
+        except Exception:
+            # Anything the streaming reader cannot handle is retried with PyPDF2
+            pass
+
+    from PyPDF2 import PdfReader
+    with open_input(file_path, latency) as file:
+        with stage("pdf.open"):
+            pdf_reader = PdfReader(file)
+            num_pages = len(pdf_reader.pages)
+        if max_pages is not None:
+            num_pages = min(num_pages, max_pages)
+
+        pages = (pdf_reader.pages[page_num] for page_num in range(num_pages))
+        return get_pdf_page_rows(pages, filename, filename_valid, str(file_path), dpi_mode, images,
+                                 analyze)
+
+
+def get_pdf_page_rows(pages, filename, filename_valid, file_path, dpi_mode="declared",
+                      images="first", analyze=False):
+    """Build metadata rows from an iterable of page dictionaries
+
+    images selects the rows: "first" gives one row per page for the first
+    image it lists, "all" one row per image (following Form XObjects) and
+    "summary" one row per page for its lowest resolution image, with the
+    image count and highest resolution alongside. With analyze each image's
+    pixels are decoded and measured as well.
+    """
+    metadata_list = []
+
+    # Images shared across pages are analysed once per document, and the
+    # images inside shared forms are listed once per document
+    image_cache = {}
+    form_images = {}
+    form_placements = {}
+
+    for page_num, page in enumerate(pages):
+        row = {
+            "File Type": "PDF",
+            "Filename": filename,
+            "Page": page_num + 1,
+            "Type": "PDF",
+            "Color Depth": "Unknown",
+            "DPI": "Unknown",
+            "Compression": "Unknown",
+            "Filename Valid": filename_valid,
+            "Full Path": file_path
+        }
+        if analyze:
+            row.update(not_analysed(NO_IMAGE))
+
+        # Check if page contains images
+        with stage("pdf.xobjects"):
+            x_object = None
+            if '/XObject' in page['/Resources']:
+                x_object = page['/Resources']['/XObject']
+
+            if x_object is None:
+                page_images = []
+            elif images == "first":
+                page_images = first_pdf_image(x_object)
+            else:
+                page_images = list_pdf_images(x_object, form_images)
+
+        placements = None
+        found = []
+        for path, owner, name in page_images:
+            key = image_cache_key(owner, name, page)
+            if key is not None and key in image_cache:
+                color_depth, dpi, compression, size, analysis = image_cache[key]
+                stats["pdf_image_hits"] += 1
+            else:
+                with stage("pdf.image"):
+                    img = owner[name]
+
+                    # Extract color depth information
+                    color_depth = get_pdf_color_depth(img)
+
+                    # Extract DPI information
+                    dpi = get_pdf_dpi_info(img, page)
+
+                    # Extract compression information
+                    compression = get_pdf_compression_info(img)
+
+                    size = (img['/Width'] if '/Width' in img else None,
+                            img['/Height'] if '/Height' in img else None)
+
+                analysis = analyze_pdf_image(img, size) if analyze else {}
+                stats["pdf_image_misses"] += 1
+                if key is not None:
+                    image_cache[key] = (color_depth, dpi, compression, size, analysis)
+
+            if dpi_mode == "placed":
+                if placements is None:
+                    with stage("pdf.placements"):
+                        placements = get_pdf_page_placements(page, x_object, form_placements)
+                dpi = get_pdf_placed_dpi(placements.get(path, ()), size) or dpi
+
+            found.append((path, dict(row, Type="PDF Image", **analysis, **{
+                "Color Depth": color_depth, "DPI": dpi, "Compression": compression})))
+
+        if images == "all":
+            if found:
+                metadata_list.extend(dict(entry, Image=path) for path, entry in found)
+            else:
+                metadata_list.append(dict(row, Image="None"))
+        elif images == "summary":
+            metadata_list.append(summarize_pdf_images(row, found))
+        else:
+            metadata_list.append(found[0][1] if found else row)
+
+    return metadata_list
+
+
+def analyze_pdf_image(img, size):
+    """Decode a PDF image XObject and measure its pixels
+
+    JPEG images are decoded by Pillow and Flate or unfiltered samples in
+    the device color spaces are read directly; other encodings are
+    reported as unsupported.
+    """
+    with stage("analyze"):
+        try:
+            encoded = get_pdf_image_data(img)
+            if encoded is None:
+                return not_analysed(UNSUPPORTED)
+            data, encoding = encoded
+            bits = img['/BitsPerComponent'] if '/BitsPerComponent' in img else None
+            image = open_pdf_image(data, encoding, size[0], size[1], bits,
+                                   get_pdf_device_color_space(img))
+            if image is None:
+                return not_analysed(UNSUPPORTED)
+            return analyze_image(image)
+        except MemoryError:
+            raise
+        except Exception:
+            return not_analysed("Unreadable")
+
+
+def get_pdf_image_data(img):
+    """Return (data, "jpeg" or "raw") for an image XObject, or None if it cannot be decoded"""
+    if '/ImageMask' in img and img['/ImageMask']:
+        return None
+    filters = img['/Filter'] if '/Filter' in img else []
+    if not isinstance(filters, list):
+        filters = [filters]
+    filters = [str(name) for name in filters]
+
+    if filters and filters[-1] in ('/DCTDecode', '/DCT'):
+        encoding = "jpeg"
+    elif filters and filters[-1] in ('/JPXDecode', '/CCITTFaxDecode', '/CCF', '/JBIG2Decode'):
+        return None
+    else:
+        encoding = "raw"
+
+    try:
+        if not hasattr(img, "raw_data"):
+            # PyPDF2 applies every filter but DCTDecode, which it passes through
+            return img.get_data(), encoding
+        if encoding == "jpeg":
+            if len(filters) > 1:
+                return None
+            return img.raw_data(), encoding
+        return img.decoded_data(), encoding
+    except (PdfFormatError, NotImplementedError):
+        # A filter the engine does not implement
+        return None
+
+
+def get_pdf_device_color_space(img):
+    """Return the device color space an image's samples are in, or None
+
+    ICC based spaces are treated as the device space with the same number
+    of components.
+    """
+    if '/ColorSpace' not in img:
+        return None
+    color_space = img['/ColorSpace']
+    if isinstance(color_space, list):
+        if len(color_space) != 2 or str(color_space[0]) != '/ICCBased':
+            return None
+        profile = resolve_pdf_object(img, color_space[1])
+        components = profile['/N'] if '/N' in profile else None
+        return {1: '/DeviceGray', 3: '/DeviceRGB', 4: '/DeviceCMYK'}.get(components)
+    return str(color_space)
+
+
+def first_pdf_image(x_object):
+    """Return the first image a page lists, as the original QA did"""
+    for obj in x_object:
+        if x_object[obj]['/Subtype'] == '/Image':
+            return [(obj, x_object, obj)]
+    return []
+
+
+def list_pdf_images(x_object, form_images, active=frozenset()):
+    """List (path, XObject dictionary, name) for every image in x_object
+
+    Form XObjects are followed into their own resources and their images
+    are reported with paths such as /Fm0/Im1. A form's image list is kept
+    in form_images, so a form shared by many pages is walked once, and
+    active holds the forms being walked so that self-referencing forms
+    cannot recurse forever.
+    """
+    found = []
+    for name in x_object:
+        xobj = x_object[name]
+        subtype = xobj['/Subtype'] if '/Subtype' in xobj else None
+        if subtype == '/Image':
+            found.append((name, x_object, name))
+        elif subtype == '/Form':
+            key = xobject_key(x_object, name)
+            if key in active:
+                continue
+            if key is not None and key in form_images:
+                nested = form_images[key]
+            else:
+                nested = []
+                inner = get_pdf_xobject_resources(xobj)
+                if inner is not None:
+                    nested = list_pdf_images(inner, form_images, active | {key})
+                if key is not None:
+                    form_images[key] = nested
+            found.extend((name + path, owner, image) for path, owner, image in nested)
+    return found
+
+
+def summarize_pdf_images(row, found):
+    """Collapse a page's image rows into its lowest resolution image"""
+    found = [entry for _, entry in found]
+    if not found:
+        return dict(row, Images=0, **{"Max DPI": "Unknown"})
+    measured = [entry for entry in found if pdf_dpi_value(entry["DPI"]) is not None]
+    if not measured:
+        return dict(found[0], Images=len(found), **{"Max DPI": "Unknown"})
+    lowest = min(measured, key=lambda entry: pdf_dpi_value(entry["DPI"]))
+    highest = max(measured, key=lambda entry: pdf_dpi_value(entry["DPI"]))
+    return dict(lowest, Images=len(found), **{"Max DPI": highest["DPI"]})
+
+
+def pdf_dpi_value(dpi):
+    """Return the lower axis of an "X x Y" DPI value, or None"""
+    try:
+        return min(float(value) for value in dpi.split(" x "))
+    except (AttributeError, ValueError):
+        return None
+
+
+def xobject_key(x_object, name):
+    """Return (object number, generation) of an indirect XObject, or None"""
+    ref = x_object.raw_get(name)
+    idnum = getattr(ref, "idnum", None)
+    if idnum is None:
+        return None
+    return idnum, ref.generation
+
+
+def get_pdf_xobject_resources(form):
+    """Return the XObject dictionary of a form's own resources, or None"""
+    if '/Resources' not in form or '/XObject' not in form['/Resources']:
+        return None
+    return form['/Resources']['/XObject']
+
+
+def image_cache_key(x_object, name, page):
+    """Identify an image XObject by its indirect reference and the page size
+
+    The DPI fallback depends on the page's MediaBox, so it is part of the
+    key. Images stored inline in the resource dictionary have no identity
+    and are not cached.
+    """
+    key = xobject_key(x_object, name)
+    if key is None:
+        return None
+    # PyPDF2's get() leaves an indirect MediaBox unresolved, and unhashable
+    media_box = page['/MediaBox'] if '/MediaBox' in page else None
+    if isinstance(media_box, list):
+        media_box = tuple(float(resolve_pdf_object(page, value)) for value in media_box)
+    return key + (media_box,)
+
+
+def get_pdf_page_placements(page, x_object, form_placements):
+    """Map each image path on a page to the transforms it is painted with
+
+    The content stream is scanned for q/Q/cm/Do to find the transformation
+    in force at each Do. Forms are followed through their /Matrix and
+    content, with the placements inside each form kept in form_placements
+    in the form's own space so shared forms are scanned once.
+    """
+    placements = {}
+    if x_object is None:
+        return placements
+    for path, ctm in collect_pdf_placements(get_pdf_page_content(page), x_object, form_placements):
+        placements.setdefault(path, []).append(ctm)
+    return placements
+
+
+def collect_pdf_placements(content, x_object, form_placements, active=frozenset()):
+    """List (image path, CTM) for every image painted by a content stream"""
+    found = []
+    for name, ctm in iter_placements(content):
+        if name not in x_object:
+            continue
+        xobj = x_object[name]
+        subtype = xobj['/Subtype'] if '/Subtype' in xobj else None
+        if subtype == '/Image':
+            found.append((name, ctm))
+        elif subtype == '/Form':
+            key = xobject_key(x_object, name)
+            if key in active:
+                continue
+            if key is not None and key in form_placements:
+                nested = form_placements[key]
+            else:
+                form = xobj
+                matrix = IDENTITY
+                if '/Matrix' in form:
+                    matrix = tuple(float(value) for value in form['/Matrix'])
+                inner = get_pdf_xobject_resources(form)
+                nested = []
+                if inner is not None:
+                    nested = [(path, multiply(inner_ctm, matrix)) for path, inner_ctm
+                              in collect_pdf_placements(get_pdf_stream_data(form), inner,
+                                                        form_placements, active | {key})]
+                if key is not None:
+                    form_placements[key] = nested
+            found.extend((name + path, multiply(inner_ctm, ctm)) for path, inner_ctm in nested)
+    return found
+
+
+def get_pdf_placed_dpi(placements, size):
+    """Return the lowest effective DPI of an image over its placements
+
+    When an image is painted more than once the lowest resolution is
+    reported, since that is what print QA cares about. Returns None if it
+    is never painted.
+    """
+    width, height = size
+    if not isinstance(width, (int, float)) or not isinstance(height, (int, float)):
+        return None
+
+    lowest = None
+    for ctm in placements:
+        resolution = effective_dpi(width, height, ctm)
+        if resolution is not None and (lowest is None or min(resolution) < min(lowest)):
+            lowest = resolution
+
+    if lowest is None:
+        return None
+    return f"{round(lowest[0])} x {round(lowest[1])}"
+
+
+def get_pdf_page_content(page):
+    """Return a page's decoded content stream bytes with either PDF engine"""
+    if '/Contents' not in page:
+        return b""
+    contents = page['/Contents']
+    if not isinstance(contents, list):
+        contents = [contents]
+
+    data = []
+    for stream in contents:
+        data.append(get_pdf_stream_data(resolve_pdf_object(page, stream)))
+    return b"\n".join(data)
+
+
+def get_pdf_stream_data(stream):
+    """Return a stream's decoded bytes with either PDF engine"""
+    if hasattr(stream, "decoded_data"):
+        return stream.decoded_data()
+    return stream.get_data()
+
+
+def resolve_pdf_object(container, value):
+    """Resolve an indirect reference found inside an array of container"""
+    if hasattr(value, "get_object"):
+        # PyPDF2 objects resolve themselves
+        return value.get_object()
+    doc = getattr(container, "doc", None)
+    return doc.resolve(value) if doc is not None else value
+
+
+def get_pdf_color_depth(img):
+    """Extract exact color depth information from PDF image"""
+    try:
+        color_depth = "Unknown"
+
+        # Get color space information
+        color_space = "Unknown"
+        if '/ColorSpace' in img:
+            color_space_obj = img['/ColorSpace']
+            if isinstance(color_space_obj, str):
+                color_space = str(color_space_obj)
+            elif isinstance(color_space_obj, list) and len(color_space_obj) > 0:
+                color_space = str(color_space_obj[0])
+
+        # Get bits per component
+        bits_per_component = 0
+        if '/BitsPerComponent' in img:
+            bits_per_component = img['/BitsPerComponent']
+
+        # Get number of color components
+        num_components = get_pdf_color_components(color_space)
+
+        # Calculate total bits (color depth)
+        if bits_per_component and num_components:
+            total_bits = bits_per_component * num_components
+            color_depth = f"{total_bits}-bit"
+
+            # Add color space information
+            if color_space == '/DeviceRGB':
+                color_depth += " RGB"
+            elif color_space == '/DeviceGray':
+                color_depth += " Grayscale"
+            elif color_space == '/DeviceCMYK':
+                color_depth += " CMYK"
+            elif color_space == '/Indexed':
+                color_depth += " Indexed"
+            else:
+                color_depth += f" ({color_space})"
+
+        # If we can't calculate total bits, provide component information
+        elif bits_per_component:
+            color_depth = f"{bits_per_component}-bit/component"
+            if color_space == '/DeviceRGB':
+                color_depth += " RGB"
+            elif color_space == '/DeviceGray':
+                color_depth += " Grayscale"
+            elif color_space == '/DeviceCMYK':
+                color_depth += " CMYK"
+            else:
+                color_depth += f" ({color_space})"
+
+        # If no bits per component, just return color space
+        elif color_space != "Unknown":
+            color_depth = color_space.replace('/', '')
+
+        return color_depth
+    except Exception as e:
+        print(f"Error extracting color depth: {str(e)}")
+        return "Unknown"
+
+
+def get_pdf_color_components(color_space):
+    """Get number of color components based on color space"""
+    if color_space == '/DeviceRGB':
+        return 3
+    elif color_space == '/DeviceGray':
+        return 1
+    elif color_space == '/DeviceCMYK':
+        return 4
+    elif color_space == '/Indexed':
+        return 1  # Indexed color typically uses 1 component
+    else:
+        return 0  # Unknown color space
+
+
+def get_pdf_dpi_info(img, page):
+    """Extract exact DPI information from PDF image"""
+    try:
+        dpi = "Unknown"
+
+        # Check if image has width and height
+        if '/Width' in img and '/Height' in img:
+            width = img['/Width']
+            height = img['/Height']
+
+            # Check if image has explicit dimensions
+            if '/BBox' in img:
+                bbox = img['/BBox']
+                if bbox and len(bbox) == 4:
+                    img_width_pt = abs(bbox[2] - bbox[0])
+                    img_height_pt = abs(bbox[3] - bbox[1])
+
+                    if img_width_pt > 0 and img_height_pt > 0:
+                        dpi_x = round(width / (img_width_pt / 72))
+                        dpi_y = round(height / (img_height_pt / 72))
+                        dpi = f"{dpi_x} x {dpi_y}"
+
+            # If no explicit dimensions, try to use page dimensions
+            if dpi == "Unknown" and '/MediaBox' in page:
+                media_box = page['/MediaBox']
+                page_width_pt = abs(media_box[2] - media_box[0])
+                page_height_pt = abs(media_box[3] - media_box[1])
+
+                # Assume image takes up most of the page
+                if page_width_pt > 0 and page_height_pt > 0:
+                    dpi_x = round(width / (page_width_pt / 72))
+                    dpi_y = round(height / (page_height_pt / 72))
+                    dpi = f"{dpi_x} x {dpi_y}"
+
+        return dpi
+    except:
+        return "Unknown"
+
+
+def get_pdf_compression_info(img):
+    """Extract exact compression information from PDF image"""
+    try:
+        compression = "Unknown"
+        if '/Filter' in img:
+            filters = img['/Filter']
+            if isinstance(filters, list):
+                filter_list = [str(f) for f in filters]
+                compression = ", ".join(filter_list)
+            else:
+                compression = str(filters)
+
+            # Make compression names more readable
+            compression = compression.replace('/FlateDecode', 'Flate')
+            compression = compression.replace('/DCTDecode', 'JPEG')
+            compression = compression.replace('/JPXDecode', 'JPEG2000')
+            compression = compression.replace('/CCITTFaxDecode', 'CCITT')
+            compression = compression.replace('/LZWDecode', 'LZW')
+            compression = compression.replace('/ASCIIHexDecode', 'ASCIIHex')
+            compression = compression.replace('/ASCII85Decode', 'ASCII85')
+            compression = compression.replace('/RunLengthDecode', 'RunLength')
+
+        return compression
+    except:
+        return "Unknown"
+
+
+def check_tiff_filename_convention(filename):
+    # Check if filename matches ISBN13_#####.tif pattern
+    filename = filename.lower()
+    if TIFF_NAME_RE.match(filename):
+        return "Yes"
+
+    # Check if it's close but has different extension
+    if TIFF_STEM_RE.match(filename):
+        return "Wrong extension"
+
+    return "No"
+
+
+def check_pdf_filename_convention(filename):
+    # Check if filename matches ISBN13.pdf pattern
+    filename = filename.lower()
+    if PDF_NAME_RE.match(filename):
+        return "Yes"
+
+    # Check if it's close but has different extension
+    if PDF_STEM_RE.match(filename):
+        return "Wrong extension"
+
+    return "No"
+
+
+def check_filename_convention(filename):
+    """Check a name from a mixed batch against the convention for its extension"""
+    if file_type_from_extension(filename) == "pdf":
+        return check_pdf_filename_convention(filename)
+    return check_tiff_filename_convention(filename)
+
+
+# Filename check for each file type
+FILENAME_CHECKS = {
+    "tiff": check_tiff_filename_convention,
+    "pdf": check_pdf_filename_convention,
+    "auto": check_filename_convention,
+}
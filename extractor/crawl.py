@@ -0,0 +1,95 @@
+"""Streaming discovery of input files from directories, globs and paths.
+
+Directory trees are walked with os.scandir, which reports whether each
+entry is a file or directory without a separate stat call, and paths are
+yielded as soon as each directory has been listed so extraction can
+start long before a large delivery tree has been fully scanned.
+"""
+
+import glob
+import os
+import sys
+
+from .core import FILE_EXTENSIONS, FILENAME_CHECKS
+
+
+def iter_files(inputs, file_type, follow_symlinks=False, valid_names_only=False, counts=None):
+    """Yield the files of file_type named by inputs, in discovery order
+
+    inputs may mix files, directories (searched recursively) and glob
+    patterns; each path is yielded once. Symlinked directories are only
+    entered with follow_symlinks, and then each directory is visited at
+    most once so symlink loops end. With valid_names_only, files that do
+    not match the naming convention are skipped. counts is an optional
+    Counter that receives "files" and "skipped_names" totals.
+    """
+    extensions = FILE_EXTENSIONS[file_type]
+    check_name = FILENAME_CHECKS[file_type]
+    seen = set()
+
+    for item in inputs:
+        if os.path.isdir(item):
+            paths = walk_tree(item, extensions, follow_symlinks)
+        elif glob.has_magic(item):
+            paths = (path for path in sorted(glob.glob(item, recursive=True)) if os.path.isfile(path))
+        elif os.path.isfile(item):
+            paths = (item,)
+        else:
+            print(f"Warning: {item} does not exist", file=sys.stderr)
+            continue
+
+        for path in paths:
+            if path in seen:
+                continue
+            seen.add(path)
+            if valid_names_only and check_name(os.path.basename(path)) != "Yes":
+                if counts is not None:
+                    counts["skipped_names"] += 1
+                continue
+            if counts is not None:
+                counts["files"] += 1
+            yield path
+
+
+def walk_tree(root, extensions, follow_symlinks=False):
+    """Yield files under root whose names end with one of extensions
+
+    Each directory's files are yielded in name order before its
+    subdirectories are entered, matching a sorted top-down os.walk.
+    Unreadable directories are reported and skipped.
+    """
+    visited = set()
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            if follow_symlinks:
+                # Directories are marked when entered, so the first path to
+                # reach a directory in walk order is the one reported
+                key = directory_key(directory)
+                if key in visited:
+                    continue
+                visited.add(key)
+            with os.scandir(directory) as scan:
+                entries = sorted(scan, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"Warning: cannot read {directory}: {e.strerror}", file=sys.stderr)
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    subdirectories.append(entry.path)
+                elif entry.name.lower().endswith(extensions) and entry.is_file():
+                    yield entry.path
+            except OSError:
+                # Entries can vanish or turn unreadable mid-walk
+                continue
+        stack.extend(reversed(subdirectories))
+
+
+def directory_key(path):
+    """Identify a directory by device and inode, whatever path reaches it"""
+    stat = os.stat(path)
+    return stat.st_dev, stat.st_ino
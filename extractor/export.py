@@ -0,0 +1,210 @@
+"""Writing extracted metadata rows to Excel, CSV, JSON Lines or Parquet.
+
+Writers take rows one at a time as extraction produces them and never
+hold more than a small batch in memory, so exporting a million-page
+audit uses the same memory as exporting ten rows. The format is chosen
+from the output file's extension.
+"""
+
+import csv
+import json
+import os
+
+from .core import DEFAULT_OPTIONS, export_columns
+
+# Excel's row limit per worksheet, including the header row
+EXCEL_MAX_ROWS = 1048576
+# Rows buffered before a Parquet row group is written
+PARQUET_BATCH_ROWS = 65536
+
+
+class CsvWriter:
+    """Write rows to a CSV file with a header line
+
+    With append, rows are added to an existing file, which must have the
+    same header.
+    """
+
+    def __init__(self, file_path, columns, append=False):
+        self.columns = columns
+        existing = append and os.path.exists(file_path) and os.path.getsize(file_path) > 0
+        if existing:
+            with open(file_path, newline="", encoding="utf-8") as file:
+                header = next(csv.reader(file), [])
+            if header != list(columns):
+                raise ValueError(f"cannot append to {file_path}: its columns differ")
+        self.file = open(file_path, "a" if append else "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file, lineterminator="\n")
+        if not existing:
+            self.writer.writerow(columns)
+
+    def write(self, row):
+        self.writer.writerow([row.get(col, "") for col in self.columns])
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesWriter:
+    """Write one JSON object per row, in column order"""
+
+    def __init__(self, file_path, columns, append=False):
+        self.columns = columns
+        self.file = open(file_path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, row):
+        record = {col: row.get(col, "") for col in self.columns}
+        self.file.write(json.dumps(record, ensure_ascii=False))
+        self.file.write("\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ExcelWriter:
+    """Write rows to an .xlsx workbook in openpyxl's write-only mode
+
+    Cells are streamed to disk as they are appended. When a sheet reaches
+    Excel's row limit the rows continue on a new sheet (Sheet2, Sheet3,
+    ...) with its own header.
+    """
+
+    def __init__(self, file_path, columns):
+        from openpyxl import Workbook
+
+        self.file_path = file_path
+        self.columns = columns
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.sheet_rows = 0
+        self.add_sheet()
+
+    def add_sheet(self):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+
+        self.sheet = self.workbook.create_sheet(f"Sheet{len(self.workbook.worksheets) + 1}")
+        header = []
+        for col in self.columns:
+            cell = WriteOnlyCell(self.sheet, value=col)
+            cell.font = Font(bold=True)
+            header.append(cell)
+        self.sheet.append(header)
+        self.sheet_rows = 1
+
+    def write(self, row):
+        if self.sheet_rows >= EXCEL_MAX_ROWS:
+            self.add_sheet()
+        self.sheet.append([row.get(col, "") for col in self.columns])
+        self.sheet_rows += 1
+
+    def close(self):
+        self.workbook.save(self.file_path)
+
+
+class ParquetWriter:
+    """Write rows to a Parquet file in row groups of PARQUET_BATCH_ROWS
+
+    Every column is stored as a string, since a failed file puts its
+    status text into numeric columns such as Page. Requires pyarrow.
+    """
+
+    def __init__(self, file_path, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export requires pyarrow (pip install pyarrow)") from None
+
+        self.pa = pa
+        self.columns = columns
+        self.schema = pa.schema([(col, pa.string()) for col in columns])
+        self.writer = pq.ParquetWriter(file_path, self.schema)
+        self.batch = {col: [] for col in columns}
+        self.batch_rows = 0
+
+    def write(self, row):
+        for col in self.columns:
+            value = row.get(col)
+            self.batch[col].append(None if value is None else str(value))
+        self.batch_rows += 1
+        if self.batch_rows >= PARQUET_BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self.batch_rows:
+            table = self.pa.Table.from_pydict(self.batch, schema=self.schema)
+            self.writer.write_table(table)
+            self.batch = {col: [] for col in self.columns}
+            self.batch_rows = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+# Writer class for each output extension; anything else is written as Excel
+WRITERS = {
+    ".csv": CsvWriter,
+    ".jsonl": JsonLinesWriter,
+    ".parquet": ParquetWriter,
+}
+# Formats that can be appended to, one row at a time
+APPENDABLE = (".csv", ".jsonl")
+
+
+class RowWriter:
+    """Stream metadata rows to the format chosen by the output extension
+
+    Use as a context manager, calling write() or write_rows() as results
+    arrive; the file is finished when the block exits. extra_columns are
+    written after the extracted columns, e.g. the rule columns. append
+    adds to an existing CSV or JSON Lines file instead of replacing it.
+    """
+
+    def __init__(self, file_path, file_type, options=DEFAULT_OPTIONS, extra_columns=(),
+                 append=False):
+        extension = os.path.splitext(file_path)[1].lower()
+        writer_class = WRITERS.get(extension, ExcelWriter)
+        columns = list(export_columns(file_type, options)) + list(extra_columns)
+        if append:
+            if extension not in APPENDABLE:
+                raise ValueError("only .csv and .jsonl outputs can be appended to")
+            self.writer = writer_class(file_path, columns, append=True)
+        else:
+            self.writer = writer_class(file_path, columns)
+        self.rows_written = 0
+
+    def write(self, row):
+        self.writer.write(row)
+        self.rows_written += 1
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        """Write out the rows buffered so far"""
+        if hasattr(self.writer, "flush"):
+            self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_rows(rows, file_path, file_type, options=DEFAULT_OPTIONS):
+    """Write metadata rows to a file whose format is chosen by extension"""
+    with RowWriter(file_path, file_type, options) as writer:
+        writer.write_rows(rows)
@@ -0,0 +1,179 @@
+"""Parallel extraction across a process pool with bounded in-flight work."""
+
+import os
+
+from . import timing
+from .core import (DEFAULT_OPTIONS, RESOURCE_LIMIT_STATUS, TIMEOUT_STATUS, error_row, extract_file,
+                   is_error_row, take_stats)
+
+
+def resolve_workers(workers):
+    """Map a worker count option to a concrete number (0 or None means all CPUs)"""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+
+def extract_with_stats(file_path, file_type, options):
+    """Worker entry point: extract one file and return its rows, counters and timings"""
+    timing.enabled = options.profile
+    rows = extract_file(file_path, file_type, options)
+    return rows, take_stats(), timing.take_spans()
+
+
+def iter_extract(files, file_type, workers=1, max_in_flight=None, ordered=False, cancel=None,
+                 options=DEFAULT_OPTIONS, cache=None, stats=None, profile=None, timeout=None,
+                 memory_limit=None, max_files_per_worker=None):
+    """Yield (index, rows) pairs for each file as extraction finishes
+
+    Results stream back in completion order, or in input order when
+    ordered is set. At most max_in_flight files are queued, running or
+    waiting to be yielded at any time, so memory stays bounded no matter
+    how many files are fed in. files may be any iterable of paths.
+
+    cancel is an optional threading.Event; once it is set no new files
+    are started and the generator returns. Files still being extracted
+    when the generator stops, whether cancelled, closed early or
+    interrupted by Ctrl+C, are abandoned and their workers killed.
+
+    cache is an optional ResultCache; unchanged files are answered from
+    it without being parsed, and fresh results are stored back.
+
+    stats is an optional Counter that accumulates the extraction counters
+    (such as PDF image cache hits) reported by every worker.
+
+    profile is an optional timing.Profile that receives the stage timings
+    recorded by every worker when options.profile is set.
+
+    timeout (seconds) and memory_limit (bytes) bound the work on any one
+    file: a worker that runs out of time is killed and the file reported
+    with a "Timeout" row, and a file that exhausts the worker's memory
+    gets a "Resource limit" row. Workers are replaced after
+    max_files_per_worker files. Setting any of these runs extraction in a
+    worker process even when workers is 1.
+    """
+    workers = resolve_workers(workers)
+    if workers == 1 and not (timeout or memory_limit or max_files_per_worker):
+        for index, file_path in enumerate(files):
+            if cancel is not None and cancel.is_set():
+                return
+            rows = cache.lookup(file_path, file_type, options) if cache is not None else None
+            if rows is None:
+                rows, file_stats, spans = extract_with_stats(file_path, file_type, options)
+                if stats is not None:
+                    stats.update(file_stats)
+                if profile is not None:
+                    profile.add(spans)
+                remember(cache, file_path, file_type, options, rows)
+            yield index, rows
+        return
+
+    # Only imported here so single-process runs start quickly
+    from concurrent.futures import FIRST_COMPLETED, wait
+    from .workers import WorkerPool
+
+    max_in_flight = max(1, max_in_flight or workers * 4)
+    source = enumerate(files)
+    pending = {}
+    finished = {}
+    next_index = 0
+    exhausted = False
+
+    pool = WorkerPool(workers, timeout or None, memory_limit or None,
+                      max_files_per_worker or None)
+    try:
+        while True:
+            if cancel is not None and cancel.is_set():
+                return
+
+            # Keep the pool fed without exceeding the in-flight bound
+            completed = []
+            while not exhausted and len(pending) + len(finished) < max_in_flight:
+                try:
+                    index, file_path = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                rows = cache.lookup(file_path, file_type, options) if cache is not None else None
+                if rows is not None:
+                    completed.append((index, rows))
+                    if ordered:
+                        finished[index] = rows
+                    continue
+                future = pool.submit(extract_with_stats, file_path, file_type, options)
+                pending[future] = (index, file_path)
+
+            if pending:
+                # Wake up periodically so a cancel request is noticed promptly
+                done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            else:
+                done = ()
+
+            for future in done:
+                index, file_path = pending.pop(future)
+                rows = future_rows(future, file_path, file_type, options, cache, stats, profile)
+                completed.append((index, rows))
+                if ordered:
+                    finished[index] = rows
+
+            if not ordered:
+                for index, rows in completed:
+                    yield index, rows
+            else:
+                while next_index in finished:
+                    yield next_index, finished.pop(next_index)
+                    next_index += 1
+
+            if exhausted and not pending and not finished:
+                break
+    finally:
+        # Nobody will read the results of files still running, so stop
+        # them now rather than wait for each to finish
+        pool.terminate()
+
+
+def future_rows(future, file_path, file_type, options, cache=None, stats=None, profile=None):
+    """Return the rows of a finished extract_with_stats future
+
+    A worker that timed out, ran out of memory or crashed yields the
+    matching error row, and the counters, timings and cache are updated
+    from a successful one.
+    """
+    from .workers import TaskTimeout
+
+    try:
+        rows, file_stats, spans = future.result()
+    except TaskTimeout as e:
+        print(f"Timeout processing {file_path}: {str(e)}")
+        return [error_row(file_path, file_type, TIMEOUT_STATUS, options)]
+    except MemoryError:
+        print(f"Resource limit processing {file_path}")
+        return [error_row(file_path, file_type, RESOURCE_LIMIT_STATUS, options)]
+    except Exception as e:
+        # A crashed worker must not take the rest of the batch down
+        print(f"Error processing {file_path}: {str(e)}")
+        return [error_row(file_path, file_type, options=options)]
+    if stats is not None:
+        stats.update(file_stats)
+    if profile is not None:
+        profile.add(spans)
+    remember(cache, file_path, file_type, options, rows)
+    return rows
+
+
+def remember(cache, file_path, file_type, options, rows):
+    """Store successful results in the cache, if there is one"""
+    if cache is not None and not any(is_error_row(row) for row in rows):
+        cache.store(file_path, file_type, options, rows)
+
+
+def extract_all(files, file_type, workers=1, max_in_flight=None, options=DEFAULT_OPTIONS,
+                cache=None, stats=None, timeout=None, memory_limit=None, max_files_per_worker=None):
+    """Extract every file and return all rows in input order"""
+    rows = []
+    for _, file_rows in iter_extract(files, file_type, workers, max_in_flight, ordered=True,
+                                     options=options, cache=cache, stats=stats, timeout=timeout,
+                                     memory_limit=memory_limit,
+                                     max_files_per_worker=max_files_per_worker):
+        rows.extend(file_rows)
+    return rows
@@ -0,0 +1,520 @@
+"""Streaming PDF reader that resolves only the objects it is asked for.
+
+The file is memory-mapped and only the cross-reference data is indexed
+up front, in compact arrays. Pages are produced one at a time by walking
+the page tree, and dictionaries resolve indirect references on access,
+so reading a page's /Resources, /XObject image dictionaries and
+/MediaBox never touches image or content stream data. Anything the
+reader does not understand (encryption, broken cross-reference tables,
+unusual filters) raises PdfFormatError so callers can fall back to
+PyPDF2.
+"""
+
+import mmap
+import re
+import zlib
+from array import array
+from collections import OrderedDict
+
+# Attributes a page inherits from its ancestors in the page tree
+INHERITABLE = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+# Resolved objects kept around; pages are not retained beyond this
+OBJECT_CACHE_SIZE = 1024
+OBJECT_STREAM_CACHE_SIZE = 8
+
+WHITESPACE_RE = re.compile(rb"(?:[\x00\t\n\f\r ]+|%[^\r\n]*)*")
+NAME_RE = re.compile(rb"/[^\x00\t\n\f\r ()<>\[\]{}/%]*")
+NUMBER_RE = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+REF_RE = re.compile(rb"(\d+)[\x00\t\n\f\r ]+(\d+)[\x00\t\n\f\r ]+R(?![^\x00\t\n\f\r ()<>\[\]{}/%])")
+KEYWORD_RE = re.compile(rb"[A-Za-z]+")
+HEX_RE = re.compile(rb"<([0-9A-Fa-f\x00\t\n\f\r ]*)>")
+STRING_CHUNK_RE = re.compile(rb"[^()\\]*")
+OBJ_HEADER_RE = re.compile(rb"[\x00\t\n\f\r ]*(\d+)[\x00\t\n\f\r ]+(\d+)[\x00\t\n\f\r ]+obj")
+STREAM_START_RE = re.compile(rb"stream\r?\n")
+XREF_ENTRY_RE = re.compile(rb"[\x00\t\n\f\r ]*(\d{10})[ ](\d{5})[ ]([nf])")
+SUBSECTION_RE = re.compile(rb"[\x00\t\n\f\r ]*(\d+)[\x00\t\n\f\r ]+(\d+)")
+NAME_ESCAPE_RE = re.compile(rb"#([0-9A-Fa-f]{2})")
+
+# Cross-reference entry kinds
+FREE, IN_FILE, IN_OBJECT_STREAM = 1, 2, 3
+
+
+class PdfFormatError(ValueError):
+    """Raised for PDFs the streaming reader cannot interpret"""
+
+
+class Name(str):
+    """A PDF name, kept with its leading slash like PyPDF2's NameObject"""
+
+
+class Ref:
+    """An indirect object reference, named like PyPDF2's IndirectObject"""
+
+    __slots__ = ("idnum", "generation")
+
+    def __init__(self, idnum, generation):
+        self.idnum = idnum
+        self.generation = generation
+
+    def __eq__(self, other):
+        return (isinstance(other, Ref) and other.idnum == self.idnum
+                and other.generation == self.generation)
+
+    def __hash__(self):
+        return hash((self.idnum, self.generation))
+
+    def __repr__(self):
+        return f"{self.idnum} {self.generation} R"
+
+
+class PdfDict(dict):
+    """Dictionary that resolves indirect references when values are read"""
+
+    def __init__(self, doc, *args):
+        dict.__init__(self, *args)
+        self.doc = doc
+
+    def __getitem__(self, key):
+        return self.doc.resolve(dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def raw_get(self, key, default=None):
+        """Return a value without resolving it, e.g. to see its reference"""
+        return dict.get(self, key, default)
+
+
+class PdfStream(PdfDict):
+    """A stream dictionary; its data stays in the file until asked for"""
+
+    def __init__(self, doc, entries, data_start):
+        PdfDict.__init__(self, doc, entries)
+        self.data_start = data_start
+
+    def raw_data(self):
+        return self.doc.stream_bytes(self)
+
+    def decoded_data(self):
+        return decode_stream(self, self.raw_data())
+
+
+def png_unpredict(data, columns):
+    """Undo PNG row predictors (used by cross-reference and object streams)"""
+    row_size = columns + 1
+    previous = bytearray(columns)
+    output = bytearray()
+    for start in range(0, len(data) - row_size + 1, row_size):
+        kind = data[start]
+        row = bytearray(data[start + 1:start + row_size])
+        if kind == 1:
+            for i in range(1, columns):
+                row[i] = (row[i] + row[i - 1]) & 0xFF
+        elif kind == 2:
+            for i in range(columns):
+                row[i] = (row[i] + previous[i]) & 0xFF
+        elif kind == 3:
+            for i in range(columns):
+                left = row[i - 1] if i else 0
+                row[i] = (row[i] + ((left + previous[i]) >> 1)) & 0xFF
+        elif kind == 4:
+            for i in range(columns):
+                left = row[i - 1] if i else 0
+                up_left = previous[i - 1] if i else 0
+                estimate = left + previous[i] - up_left
+                pa, pb, pc = abs(estimate - left), abs(estimate - previous[i]), abs(estimate - up_left)
+                if pa <= pb and pa <= pc:
+                    predictor = left
+                elif pb <= pc:
+                    predictor = previous[i]
+                else:
+                    predictor = up_left
+                row[i] = (row[i] + predictor) & 0xFF
+        elif kind != 0:
+            raise PdfFormatError(f"unknown PNG predictor {kind}")
+        output += row
+        previous = row
+    return bytes(output)
+
+
+def decode_stream(stream, data):
+    """Apply the stream's filters; only Flate (with predictors) is supported"""
+    filters = stream.get("/Filter")
+    if filters is None:
+        return data
+    if not isinstance(filters, list):
+        filters = [filters]
+    params = stream.get("/DecodeParms")
+    if not isinstance(params, list):
+        params = [params] * len(filters)
+
+    for name, param in zip(filters, params):
+        if name not in ("/FlateDecode", "/Fl"):
+            raise PdfFormatError(f"unsupported stream filter {name}")
+        try:
+            data = zlib.decompress(data)
+        except zlib.error:
+            # Tolerate truncated or trailing garbage the way readers usually do
+            data = zlib.decompressobj().decompress(data)
+        if param and param.get("/Predictor", 1) >= 10:
+            columns = param.get("/Columns", 1) * param.get("/Colors", 1)
+            columns = (columns * param.get("/BitsPerComponent", 8) + 7) // 8
+            data = png_unpredict(data, columns)
+        elif param and param.get("/Predictor", 1) == 2:
+            raise PdfFormatError("TIFF predictor not supported")
+    return data
+
+
+class PdfDocument:
+    """Lazily parsed PDF backed by a memory map of the file"""
+
+    def __init__(self, file_path):
+        self.file = open(file_path, "rb")
+        try:
+            self.buf = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise PdfFormatError("empty file")
+
+        self.kinds = bytearray()
+        self.field1 = array("q")
+        self.field2 = array("l")
+        self.objects = OrderedDict()
+        self.object_streams = OrderedDict()
+        self.trailer = None
+        try:
+            self.read_xref_chain()
+        except PdfFormatError:
+            self.close()
+            raise
+        except (ValueError, IndexError, KeyError, TypeError, OverflowError) as e:
+            self.close()
+            raise PdfFormatError(f"malformed cross-reference data: {e}")
+
+    def close(self):
+        self.objects.clear()
+        self.object_streams.clear()
+        self.buf.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Tokenizer ------------------------------------------------------------
+
+    def parse_object(self, buf, pos):
+        """Parse one object starting at pos, returning (value, end position)"""
+        pos = WHITESPACE_RE.match(buf, pos).end()
+        lead = buf[pos:pos + 1]
+        if lead == b"/":
+            match = NAME_RE.match(buf, pos)
+            raw = match.group()
+            if b"#" in raw:
+                raw = NAME_ESCAPE_RE.sub(lambda m: bytes([int(m.group(1), 16)]), raw)
+            return Name(raw.decode("latin-1")), match.end()
+        if lead == b"<":
+            if buf[pos + 1:pos + 2] == b"<":
+                return self.parse_dict(buf, pos + 2)
+            match = HEX_RE.match(buf, pos)
+            if not match:
+                raise PdfFormatError("bad hex string")
+            digits = re.sub(rb"[^0-9A-Fa-f]", b"", match.group(1))
+            if len(digits) % 2:
+                digits += b"0"
+            return bytes.fromhex(digits.decode("ascii")), match.end()
+        if lead == b"[":
+            items = []
+            pos += 1
+            while True:
+                pos = WHITESPACE_RE.match(buf, pos).end()
+                if buf[pos:pos + 1] == b"]":
+                    return items, pos + 1
+                if pos >= len(buf):
+                    raise PdfFormatError("unterminated array")
+                value, pos = self.parse_object(buf, pos)
+                items.append(value)
+        if lead == b"(":
+            return self.parse_string(buf, pos + 1)
+        if lead and lead in b"+-.0123456789":
+            match = REF_RE.match(buf, pos)
+            if match:
+                return Ref(int(match.group(1)), int(match.group(2))), match.end()
+            match = NUMBER_RE.match(buf, pos)
+            if not match:
+                raise PdfFormatError("bad number")
+            text = match.group()
+            value = float(text) if b"." in text else int(text)
+            return value, match.end()
+        match = KEYWORD_RE.match(buf, pos)
+        if match:
+            word = match.group()
+            if word == b"true":
+                return True, match.end()
+            if word == b"false":
+                return False, match.end()
+            if word == b"null":
+                return None, match.end()
+        raise PdfFormatError(f"unexpected token at offset {pos}")
+
+    def parse_dict(self, buf, pos):
+        entries = {}
+        while True:
+            pos = WHITESPACE_RE.match(buf, pos).end()
+            if buf[pos:pos + 2] == b">>":
+                return PdfDict(self, entries), pos + 2
+            key, pos = self.parse_object(buf, pos)
+            if not isinstance(key, Name):
+                raise PdfFormatError("dictionary key is not a name")
+            value, pos = self.parse_object(buf, pos)
+            entries[key] = value
+
+    def parse_string(self, buf, pos):
+        """Skip over a literal string, honouring nesting and escapes"""
+        start = pos
+        depth = 1
+        while True:
+            pos = STRING_CHUNK_RE.match(buf, pos).end()
+            char = buf[pos:pos + 1]
+            if not char:
+                raise PdfFormatError("unterminated string")
+            if char == b"\\":
+                pos += 2
+            elif char == b"(":
+                depth += 1
+                pos += 1
+            else:
+                depth -= 1
+                pos += 1
+                if depth == 0:
+                    return bytes(buf[start:pos - 1]), pos
+
+    # Cross-reference data ---------------------------------------------------
+
+    def set_entry(self, num, kind, value1, value2):
+        """Record an xref entry unless a newer section already defined it"""
+        if num >= len(self.kinds):
+            grow = num + 1 - len(self.kinds)
+            self.kinds.extend(bytes(grow))
+            self.field1.extend([0] * grow)
+            self.field2.extend([0] * grow)
+        if self.kinds[num] == 0:
+            self.kinds[num] = kind
+            self.field1[num] = value1
+            self.field2[num] = value2
+
+    def read_xref_chain(self):
+        tail_start = max(0, len(self.buf) - 2048)
+        position = self.buf.rfind(b"startxref", tail_start)
+        if position < 0:
+            raise PdfFormatError("startxref not found")
+        offset, _ = self.parse_object(self.buf, position + len(b"startxref"))
+
+        seen = set()
+        while offset is not None:
+            if not isinstance(offset, int) or offset in seen or offset >= len(self.buf):
+                raise PdfFormatError("bad cross-reference offset")
+            seen.add(offset)
+            trailer = self.read_xref_section(offset)
+            if self.trailer is None:
+                self.trailer = trailer
+            # Hybrid files keep part of their table in a cross-reference stream
+            hybrid = trailer.raw_get("/XRefStm")
+            if isinstance(hybrid, int) and hybrid not in seen:
+                seen.add(hybrid)
+                self.read_xref_section(hybrid)
+            offset = trailer.raw_get("/Prev")
+
+        if "/Encrypt" in self.trailer:
+            raise PdfFormatError("encrypted documents are not supported")
+        if "/Root" not in self.trailer:
+            raise PdfFormatError("trailer has no /Root")
+
+    def read_xref_section(self, offset):
+        pos = WHITESPACE_RE.match(self.buf, offset).end()
+        if self.buf[pos:pos + 4] == b"xref":
+            return self.read_xref_table(pos + 4)
+        return self.read_xref_stream(offset)
+
+    def read_xref_table(self, pos):
+        buf = self.buf
+        while True:
+            pos = WHITESPACE_RE.match(buf, pos).end()
+            if buf[pos:pos + 7] == b"trailer":
+                trailer, _ = self.parse_object(buf, pos + 7)
+                if not isinstance(trailer, PdfDict):
+                    raise PdfFormatError("bad trailer")
+                return trailer
+            match = SUBSECTION_RE.match(buf, pos)
+            if not match:
+                raise PdfFormatError("bad cross-reference subsection")
+            first, count = int(match.group(1)), int(match.group(2))
+            pos = match.end()
+            for num in range(first, first + count):
+                entry = XREF_ENTRY_RE.match(buf, pos)
+                if not entry:
+                    raise PdfFormatError("bad cross-reference entry")
+                pos = entry.end()
+                if entry.group(3) == b"n":
+                    self.set_entry(num, IN_FILE, int(entry.group(1)), int(entry.group(2)))
+                else:
+                    self.set_entry(num, FREE, 0, 0)
+
+    def read_xref_stream(self, offset):
+        stream = self.parse_indirect(offset)
+        if not isinstance(stream, PdfStream) or stream.get("/Type") != "/XRef":
+            raise PdfFormatError("cross-reference stream expected")
+        widths = stream["/W"]
+        size = stream["/Size"]
+        index = stream.get("/Index") or [0, size]
+        data = stream.decoded_data()
+        entry_size = sum(widths)
+        if entry_size <= 0:
+            raise PdfFormatError("bad cross-reference stream widths")
+
+        pos = 0
+        for first, count in zip(index[::2], index[1::2]):
+            for num in range(first, first + count):
+                entry = data[pos:pos + entry_size]
+                if len(entry) < entry_size:
+                    raise PdfFormatError("truncated cross-reference stream")
+                pos += entry_size
+                fields = []
+                start = 0
+                for width in widths:
+                    fields.append(int.from_bytes(entry[start:start + width], "big") if width else None)
+                    start += width
+                kind = 1 if fields[0] is None else fields[0]
+                if kind == 0:
+                    self.set_entry(num, FREE, 0, 0)
+                elif kind == 1:
+                    self.set_entry(num, IN_FILE, fields[1], fields[2] or 0)
+                elif kind == 2:
+                    self.set_entry(num, IN_OBJECT_STREAM, fields[1], fields[2] or 0)
+        return stream
+
+    # Objects --------------------------------------------------------------
+
+    def parse_indirect(self, offset):
+        """Parse the "N G obj ... endobj" object starting at offset"""
+        header = OBJ_HEADER_RE.match(self.buf, offset)
+        if not header:
+            raise PdfFormatError(f"no object at offset {offset}")
+        value, pos = self.parse_object(self.buf, header.end())
+        if isinstance(value, PdfDict):
+            pos = WHITESPACE_RE.match(self.buf, pos).end()
+            start = STREAM_START_RE.match(self.buf, pos)
+            if start:
+                return PdfStream(self, value, start.end())
+        return value
+
+    def stream_bytes(self, stream):
+        """Return a stream's raw (still encoded) data"""
+        start = stream.data_start
+        length = stream.get("/Length")
+        if isinstance(length, int) and length >= 0:
+            end = start + length
+            tail = WHITESPACE_RE.match(self.buf, end).end()
+            if self.buf[tail:tail + 9] == b"endstream":
+                return self.buf[start:end]
+        # Bad /Length: fall back to the endstream keyword
+        end = self.buf.find(b"endstream", start)
+        if end < 0:
+            raise PdfFormatError("unterminated stream")
+        return self.buf[start:end].rstrip(b"\r\n")
+
+    def object_stream(self, num):
+        """Return (decoded data, {object number: offset}) for an object stream"""
+        if num in self.object_streams:
+            self.object_streams.move_to_end(num)
+            return self.object_streams[num]
+        stream = self.load(num)
+        if not isinstance(stream, PdfStream):
+            raise PdfFormatError("object stream expected")
+        data = stream.decoded_data()
+        first = stream["/First"]
+        offsets = {}
+        pos = 0
+        for _ in range(stream["/N"]):
+            obj_num, pos = self.parse_object(data, pos)
+            obj_offset, pos = self.parse_object(data, pos)
+            offsets[obj_num] = first + obj_offset
+        self.object_streams[num] = (data, offsets)
+        if len(self.object_streams) > OBJECT_STREAM_CACHE_SIZE:
+            self.object_streams.popitem(last=False)
+        return data, offsets
+
+    def load(self, num):
+        """Load object num through the cross-reference data"""
+        if num in self.objects:
+            self.objects.move_to_end(num)
+            return self.objects[num]
+        kind = self.kinds[num] if num < len(self.kinds) else 0
+        if kind == IN_FILE:
+            value = self.parse_indirect(self.field1[num])
+        elif kind == IN_OBJECT_STREAM:
+            data, offsets = self.object_stream(self.field1[num])
+            if num not in offsets:
+                raise PdfFormatError(f"object {num} missing from its object stream")
+            value, _ = self.parse_object(data, offsets[num])
+        else:
+            value = None
+        self.objects[num] = value
+        if len(self.objects) > OBJECT_CACHE_SIZE:
+            self.objects.popitem(last=False)
+        return value
+
+    def resolve(self, value):
+        # Follow chains of references, guarding against loops
+        hops = 0
+        while isinstance(value, Ref):
+            value = self.load(value.idnum)
+            hops += 1
+            if hops > 32:
+                raise PdfFormatError("reference loop")
+        return value
+
+    # Page tree ------------------------------------------------------------
+
+    def iter_pages(self, max_pages=None):
+        """Yield page dictionaries in order, with inherited attributes filled in"""
+        root = self.resolve(self.trailer.raw_get("/Root"))
+        if not isinstance(root, PdfDict):
+            raise PdfFormatError("bad document catalog")
+        top = root.raw_get("/Pages")
+        visited = set()
+        stack = [(top, {})]
+        count = 0
+        while stack:
+            node_ref, inherited = stack.pop()
+            if isinstance(node_ref, Ref):
+                if node_ref in visited:
+                    raise PdfFormatError("page tree loop")
+                visited.add(node_ref)
+            node = self.resolve(node_ref)
+            if not isinstance(node, PdfDict):
+                raise PdfFormatError("bad page tree node")
+
+            kids = node.get("/Kids")
+            if node.get("/Type") == "/Pages" or (kids is not None and node.get("/Type") != "/Page"):
+                passed = dict(inherited)
+                for key in INHERITABLE:
+                    if key in node:
+                        passed[key] = node.raw_get(key)
+                for kid in reversed(kids or []):
+                    stack.append((kid, passed))
+                continue
+
+            page = PdfDict(self, node)
+            for key, value in inherited.items():
+                if key not in page:
+                    dict.__setitem__(page, key, value)
+            yield page
+            count += 1
+            if max_pages is not None and count >= max_pages:
+                return
@@ -0,0 +1,285 @@
+"""Strip and tile wise pixel reading for very large TIFFs.
+
+Pillow decodes a whole page into memory before any of it can be looked
+at, so measuring a 2 GB archival scan costs 2 GB per worker. RasterFile
+instead maps the file read-only and hands out the page in bands of rows:
+
+- Uncompressed strips and tiles are NumPy views straight into the
+  mapping, so only the rows actually sampled are ever paged in, and the
+  pages of each band are released again once it has been measured.
+- Deflate strips are inflated a band at a time and Deflate tiles one row
+  of tiles at a time, undoing the horizontal predictor as they go.
+
+The mapping is shared with the page cache, so workers reading the same
+file share its pages instead of each holding a private copy. Layouts this
+module does not decode (LZW, JPEG, PackBits, fax, planar or float data)
+raise TiffFormatError so the caller can fall back to Pillow.
+"""
+
+import mmap
+import zlib
+
+from .tiff import (BITS_PER_SAMPLE, COMPRESSION, FILL_ORDER, IMAGE_LENGTH, IMAGE_WIDTH,
+                   PHOTOMETRIC_INTERPRETATION, PLANAR_CONFIGURATION, PREDICTOR, ROWS_PER_STRIP,
+                   SAMPLE_FORMAT, SAMPLES_PER_PIXEL, STRIP_BYTE_COUNTS, STRIP_OFFSETS,
+                   TILE_BYTE_COUNTS, TILE_LENGTH, TILE_OFFSETS, TILE_WIDTH, TiffFormatError,
+                   TiffReader, as_tuple)
+
+# Decoded bytes handled per band, and compressed bytes inflated per step
+BAND_BYTES = 16 << 20
+INFLATE_INPUT = 1 << 20
+
+UNCOMPRESSED = 1
+DEFLATE = (8, 32946)
+
+
+class Layout:
+    """How the pixels of one IFD are stored"""
+
+    def __init__(self, ifd):
+        if ifd.get(FILL_ORDER, 1) != 1 or set(as_tuple(ifd.get(SAMPLE_FORMAT, 1))) != {1}:
+            raise TiffFormatError("pixel layout needs Pillow")
+        self.width = ifd.get(IMAGE_WIDTH)
+        self.height = ifd.get(IMAGE_LENGTH)
+        if not self.width or not self.height:
+            raise TiffFormatError("missing image size")
+        self.photometric = ifd.get(PHOTOMETRIC_INTERPRETATION, 0)
+        self.samples = ifd.get(SAMPLES_PER_PIXEL, 1)
+        bits = set(as_tuple(ifd.get(BITS_PER_SAMPLE, 1)))
+        self.bits = bits.pop()
+        self.compression = ifd.get(COMPRESSION, 1)
+        self.predictor = ifd.get(PREDICTOR, 1)
+
+        if bits or (ifd.get(PLANAR_CONFIGURATION, 1) != 1 and self.samples > 1):
+            raise TiffFormatError("pixel layout needs Pillow")
+        if self.photometric in (0, 1):
+            supported = self.samples == 1 and self.bits in (1, 8, 16)
+        elif self.photometric == 2:
+            # Extra samples such as alpha follow the color and are ignored
+            supported = self.samples >= 3 and self.bits in (8, 16)
+        else:
+            supported = False
+        if self.compression == UNCOMPRESSED:
+            supported = supported and self.predictor == 1
+        elif self.compression in DEFLATE:
+            supported = supported and (self.predictor == 1 or
+                                       self.predictor == 2 and self.bits != 1)
+        else:
+            supported = False
+        if not supported:
+            raise TiffFormatError("pixel layout needs Pillow")
+
+        if TILE_OFFSETS in ifd:
+            self.tile_width = ifd.get(TILE_WIDTH)
+            self.tile_length = ifd.get(TILE_LENGTH)
+            self.offsets = as_tuple(ifd.get(TILE_OFFSETS))
+            self.byte_counts = as_tuple(ifd.get(TILE_BYTE_COUNTS, ()))
+            if not self.tile_width or not self.tile_length:
+                raise TiffFormatError("bad tile size")
+            across = -(-self.width // self.tile_width)
+            down = -(-self.height // self.tile_length)
+            expected = across * down
+        else:
+            self.tile_width = None
+            self.rows_per_strip = min(ifd.get(ROWS_PER_STRIP, self.height), self.height)
+            self.offsets = as_tuple(ifd.get(STRIP_OFFSETS, ()))
+            self.byte_counts = as_tuple(ifd.get(STRIP_BYTE_COUNTS, ()))
+            if not self.rows_per_strip:
+                raise TiffFormatError("bad rows per strip")
+            expected = -(-self.height // self.rows_per_strip)
+        if len(self.offsets) < expected or len(self.byte_counts) < expected:
+            raise TiffFormatError("missing strip or tile offsets")
+
+    def row_bytes(self, width):
+        """Bytes in one stored row of width pixels"""
+        return (width * self.samples * self.bits + 7) // 8
+
+
+class RasterFile:
+    """A TIFF mapped read-only for band-wise pixel reading"""
+
+    def __init__(self, file_path):
+        self.file = open(file_path, "rb")
+        try:
+            self.reader = TiffReader(self.file)
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self.file.close()
+            raise
+
+    def close(self):
+        try:
+            self.map.close()
+        except BufferError:
+            # A band is still referenced; the mapping goes with it
+            pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def iter_ifds(self, max_pages=None):
+        return self.reader.iter_ifds(max_pages)
+
+    def iter_bands(self, ifd, step=1):
+        """Return an iterator of uint8 bands covering the page, every step-th row and column
+
+        Bands are H x W arrays for gray pages and H x W x 3 for color.
+        The layout is checked before anything is read, so unsupported
+        pages raise TiffFormatError here rather than part-way through.
+        """
+        layout = Layout(ifd)
+        if layout.tile_width:
+            return self.tile_bands(layout, step)
+        return self.strip_bands(layout, step)
+
+    def strip_bands(self, layout, step):
+        row_bytes = layout.row_bytes(layout.width)
+        band_rows = max(1, BAND_BYTES // row_bytes)
+        for index, first_row in enumerate(range(0, layout.height, layout.rows_per_strip)):
+            rows = min(layout.rows_per_strip, layout.height - first_row)
+            offset, size = layout.offsets[index], layout.byte_counts[index]
+            if layout.compression == UNCOMPRESSED:
+                strip = self.view(offset, rows * row_bytes).reshape(rows, row_bytes)
+                bands = (strip[start:start + band_rows] for start in range(0, rows, band_rows))
+            else:
+                bands = (frombuffer(data).reshape(-1, row_bytes) for data
+                         in self.inflate(offset, size, rows * row_bytes, band_rows * row_bytes))
+            start = 0
+            for band in bands:
+                sampled = band[sampled_from(first_row + start, step)::step]
+                if len(sampled):
+                    yield self.decode(layout, layout.width, self.unpredict(layout, sampled), step)
+                if layout.compression == UNCOMPRESSED:
+                    self.release(offset + start * row_bytes, len(band) * row_bytes)
+                start += len(band)
+            if layout.compression != UNCOMPRESSED:
+                self.release(offset, size)
+
+    def tile_bands(self, layout, step):
+        import numpy as np
+
+        tile_width, tile_length = layout.tile_width, layout.tile_length
+        row_bytes = layout.row_bytes(tile_width)
+        across = -(-layout.width // tile_width)
+        channels = 3 if layout.photometric == 2 else None
+        for tile_row, first_row in enumerate(range(0, layout.height, tile_length)):
+            rows = min(tile_length, layout.height - first_row)
+            sampled = range(sampled_from(first_row, step), rows, step)
+            if not len(sampled):
+                continue
+            shape = (len(sampled), across * tile_width) + ((channels,) if channels else ())
+            band = np.empty(shape, dtype=np.uint8)
+            for column in range(across):
+                index = tile_row * across + column
+                offset, size = layout.offsets[index], layout.byte_counts[index]
+                if layout.compression == UNCOMPRESSED:
+                    tile = self.view(offset, tile_length * row_bytes)
+                else:
+                    tile = frombuffer(b"".join(self.inflate(offset, size, tile_length * row_bytes)))
+                tile = tile.reshape(tile_length, row_bytes)
+                tile = self.unpredict(layout, tile[sampled.start:rows:step])
+                band[:, column * tile_width:(column + 1) * tile_width] = \
+                    self.decode(layout, tile_width, tile, 1)
+                self.release(offset, size)
+            yield band[:, :layout.width:step]
+
+    def inflate(self, offset, size, total, piece=None):
+        """Inflate the Deflate data at offset, yielding its first total bytes in pieces
+
+        Input is fed a little at a time and output is capped per call, so
+        a highly compressed strip never inflates much past one piece.
+        """
+        piece = piece or total
+        inflater = zlib.decompressobj()
+        data = memoryview(self.map)[offset:offset + size]
+        buffer = bytearray()
+        remaining = total
+        try:
+            for start in range(0, len(data), INFLATE_INPUT):
+                pending = data[start:start + INFLATE_INPUT]
+                while pending and remaining:
+                    buffer += inflater.decompress(pending, piece)
+                    pending = inflater.unconsumed_tail
+                    while remaining and len(buffer) >= min(piece, remaining):
+                        count = min(piece, remaining)
+                        yield buffer[:count]
+                        del buffer[:count]
+                        remaining -= count
+                if not remaining or inflater.eof:
+                    break
+            buffer += inflater.flush()
+        except zlib.error as e:
+            raise TiffFormatError(f"bad Deflate data: {e}")
+        finally:
+            data.release()
+        if len(buffer) < remaining:
+            raise TiffFormatError("truncated Deflate data")
+        if remaining:
+            yield buffer[:remaining]
+
+    def unpredict(self, layout, rows):
+        """Undo the horizontal differencing predictor on stored rows"""
+        import numpy as np
+
+        if layout.predictor != 2:
+            return rows
+        if layout.bits == 16:
+            stored = np.dtype(self.reader.byte_order + "u2")
+            values = rows.view(stored).reshape(len(rows), -1, layout.samples)
+            summed = np.cumsum(values, axis=1, dtype=np.uint16).astype(stored)
+            return summed.reshape(len(rows), -1).view(np.uint8)
+        values = rows.reshape(len(rows), -1, layout.samples)
+        return np.cumsum(values, axis=1, dtype=np.uint8).reshape(len(rows), -1)
+
+    def view(self, offset, size):
+        """Return a zero-copy uint8 view of size bytes of the file"""
+        import numpy as np
+
+        if offset + size > len(self.map):
+            raise TiffFormatError("strip or tile runs past the end of the file")
+        return np.frombuffer(self.map, dtype=np.uint8, count=size, offset=offset)
+
+    def release(self, offset, size):
+        """Drop the mapped pages of a band that has been measured"""
+        if hasattr(mmap, "MADV_DONTNEED"):
+            start = offset - offset % mmap.PAGESIZE
+            end = min(offset + size, len(self.map))
+            if end > start:
+                self.map.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    def decode(self, layout, width, rows, step):
+        """Turn stored rows into uint8 gray or RGB pixels, every step-th column"""
+        import numpy as np
+
+        if layout.bits == 1:
+            pixels = np.unpackbits(rows, axis=1)[:, :width:step] * np.uint8(255)
+        else:
+            values = rows
+            if layout.bits == 16:
+                values = rows.view(self.reader.byte_order + "u2") >> 8
+            values = values.reshape(len(rows), -1, layout.samples)[:, :width:step]
+            if layout.photometric == 2:
+                pixels = values[..., :3]
+            else:
+                pixels = values[..., 0]
+            pixels = pixels.astype(np.uint8, copy=False)
+        if layout.photometric == 0:
+            # WhiteIsZero
+            pixels = 255 - pixels
+        return pixels
+
+
+def frombuffer(data):
+    import numpy as np
+
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+def sampled_from(first_row, step):
+    """Index of the first row at or after first_row on the sampling grid, relative to it"""
+    return -first_row % step
@@ -0,0 +1,279 @@
+"""Declarative QA rules checked against extracted metadata.
+
+A rules file is JSON holding a list of rules. Each rule has a name, an
+optional "when" saying which rows it applies to, a "check" those rows
+must pass and an optional "reason" reported when they do not:
+
+    {"rules": [
+        {"builtin": "isbn13-checksum"},
+        {"name": "Minimum 300 dpi", "check": {"column": "DPI", "min": 300}},
+        {"name": "No JPEG on line art",
+         "when": {"column": "Color Depth", "equals": "1-bit (Bilevel)"},
+         "check": {"column": "Compression", "not_equals": "JPEG"}},
+        {"name": "CMYK only for covers",
+         "when": {"column": "Color Depth", "contains": "CMYK"},
+         "check": {"column": "Filename", "matches": "_00001\\\\."},
+         "reason": "CMYK interior page"}
+    ]}
+
+"when" and "check" take one condition or a list that must all hold. A
+condition names a column and one operator from OPERATORS. Rules are
+compiled once and every condition is evaluated once per distinct value
+of its column, the same way ResultStore encodes its columns, so even a
+million rows take little more time than their distinct values.
+
+Each row gains a Rules column ("Pass" or "Fail") and a Rule Failures
+column listing the reasons of the rules it failed. Rows of files that
+could not be read keep their error status in both.
+"""
+
+import json
+import re
+
+from .core import is_error_row
+
+RULE_COLUMNS = ("Rules", "Rule Failures")
+
+# Distinct values remembered per condition when checking rows one batch
+# at a time; columns with more distinct values than this (full paths)
+# are evaluated afresh for the rest
+MEMO_LIMIT = 1 << 16
+
+
+def parse_number(value):
+    """Return a number, or the lower axis of an "X x Y" value, or None"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return min(float(part) for part in str(value).split(" x "))
+    except ValueError:
+        return None
+
+
+def valid_isbn13(value):
+    """Return True if value starts with a 978/979 ISBN-13 whose check digit is right"""
+    digits = str(value)[:13]
+    if len(digits) != 13 or not digits.isdigit() or digits[:3] not in ("978", "979"):
+        return False
+    total = sum(int(digit) * (3 if position % 2 else 1) for position, digit in enumerate(digits))
+    return total % 10 == 0
+
+
+def at_least(value, minimum):
+    number = parse_number(value)
+    return number is not None and number >= minimum
+
+
+def at_most(value, maximum):
+    number = parse_number(value)
+    return number is not None and number <= maximum
+
+
+# Operator: (compile the operand, test a value against the compiled operand)
+OPERATORS = {
+    "equals": (str, lambda value, operand: str(value) == operand),
+    "not_equals": (str, lambda value, operand: str(value) != operand),
+    "in": (lambda operand: frozenset(map(str, operand)), lambda value, operand: str(value) in operand),
+    "not_in": (lambda operand: frozenset(map(str, operand)),
+               lambda value, operand: str(value) not in operand),
+    "contains": (str, lambda value, operand: operand in str(value)),
+    "not_contains": (str, lambda value, operand: operand not in str(value)),
+    "matches": (re.compile, lambda value, operand: operand.search(str(value)) is not None),
+    "not_matches": (re.compile, lambda value, operand: operand.search(str(value)) is None),
+    "min": (float, at_least),
+    "max": (float, at_most),
+    "isbn13": (bool, lambda value, operand: valid_isbn13(value) == operand),
+}
+
+# Rules any rules file can include with {"builtin": name}
+BUILTIN_RULES = {
+    "isbn13-checksum": {
+        "name": "ISBN-13 checksum",
+        "check": {"column": "Filename", "isbn13": True},
+        "reason": "Filename does not start with a valid ISBN-13",
+    },
+    "filename-convention": {
+        "name": "Filename convention",
+        "check": {"column": "Filename Valid", "equals": "Yes"},
+        "reason": "Filename does not follow the naming convention",
+    },
+}
+
+
+class RuleError(ValueError):
+    """Raised for a rules file that cannot be compiled"""
+
+
+class Condition:
+    """One compiled column test, remembering its result per distinct value"""
+
+    def __init__(self, spec, rule_name):
+        if not isinstance(spec, dict) or "column" not in spec:
+            raise RuleError(f"rule {rule_name!r}: a condition needs a column")
+        operators = [key for key in spec if key != "column"]
+        if len(operators) != 1 or operators[0] not in OPERATORS:
+            raise RuleError(f"rule {rule_name!r}: a condition needs exactly one of "
+                            f"{', '.join(OPERATORS)}")
+        self.column = spec["column"]
+        self.operator = operators[0]
+        compile_operand, self.test = OPERATORS[self.operator]
+        try:
+            self.operand = compile_operand(spec[self.operator])
+        except (TypeError, ValueError, re.error) as e:
+            raise RuleError(f"rule {rule_name!r}: bad {self.operator} value: {e}") from None
+        self.memo = {}
+
+    def __call__(self, value):
+        try:
+            return self.memo[value]
+        except KeyError:
+            result = self.test(value, self.operand)
+            if len(self.memo) < MEMO_LIMIT:
+                self.memo[value] = result
+            return result
+        except TypeError:
+            # Unhashable values are not remembered
+            return self.test(value, self.operand)
+
+
+class Rule:
+    """One compiled rule"""
+
+    def __init__(self, spec):
+        if not isinstance(spec, dict):
+            raise RuleError("each rule must be an object")
+        if "builtin" in spec:
+            if spec["builtin"] not in BUILTIN_RULES:
+                raise RuleError(f"unknown built-in rule {spec['builtin']!r}; "
+                                f"available: {', '.join(BUILTIN_RULES)}")
+            spec = dict(BUILTIN_RULES[spec["builtin"]], **{k: v for k, v in spec.items()
+                                                         if k != "builtin"})
+        self.name = spec.get("name")
+        if not self.name:
+            raise RuleError("every rule needs a name")
+        if "check" not in spec:
+            raise RuleError(f"rule {self.name!r} has no check")
+        self.when = [Condition(condition, self.name) for condition in as_list(spec.get("when"))]
+        self.check = [Condition(condition, self.name) for condition in as_list(spec["check"])]
+        if not self.check:
+            raise RuleError(f"rule {self.name!r} has no check")
+        self.reason = spec.get("reason", self.name)
+
+    def columns(self):
+        return {condition.column for condition in self.when + self.check}
+
+    def fails(self, row):
+        """Return True if the rule applies to the row and the row fails it"""
+        for condition in self.when:
+            if not condition(row.get(condition.column, "")):
+                return False
+        for condition in self.check:
+            if not condition(row.get(condition.column, "")):
+                return True
+        return False
+
+    def failure_mask(self, store):
+        """Return a boolean array of the store's rows that fail the rule"""
+        applies = None
+        for condition in self.when:
+            mask = store.column_mask(condition.column, condition)
+            applies = mask if applies is None else applies & mask
+        passes = None
+        for condition in self.check:
+            mask = store.column_mask(condition.column, condition)
+            passes = mask if passes is None else passes & mask
+        failed = ~passes
+        return failed if applies is None else failed & applies
+
+
+def as_list(conditions):
+    if conditions is None:
+        return []
+    return conditions if isinstance(conditions, list) else [conditions]
+
+
+class RuleSet:
+    """A compiled list of rules"""
+
+    def __init__(self, specs):
+        self.rules = [Rule(spec) for spec in specs]
+        names = [rule.name for rule in self.rules]
+        duplicates = {name for name in names if names.count(name) > 1}
+        if duplicates:
+            raise RuleError(f"duplicate rule names: {', '.join(sorted(duplicates))}")
+
+    def __len__(self):
+        return len(self.rules)
+
+    def missing_columns(self, columns):
+        """Return the columns the rules test that are not among columns"""
+        tested = set()
+        for rule in self.rules:
+            tested |= rule.columns()
+        return sorted(tested - set(columns))
+
+    def apply(self, rows):
+        """Add the rule columns to each row dict in place"""
+        for row in rows:
+            if is_error_row(row):
+                row["Rules"] = row["Rule Failures"] = row["DPI"]
+                continue
+            reasons = [rule.reason for rule in self.rules if rule.fails(row)]
+            row["Rules"] = "Fail" if reasons else "Pass"
+            row["Rule Failures"] = "; ".join(reasons)
+        return rows
+
+    def evaluate(self, store):
+        """Check every row of a ResultStore at once
+
+        Returns {"Rules": [...], "Rule Failures": [...]} with one value
+        per row, in store order.
+        """
+        import numpy as np
+
+        rows = len(store)
+        if not rows:
+            return {column: [] for column in RULE_COLUMNS}
+        if self.rules:
+            failures = np.stack([rule.failure_mask(store) for rule in self.rules], axis=1)
+            result_column, reason_column = self.outcomes(failures)
+        else:
+            # No rules means nothing can fail, and packbits cannot take
+            # a mask with no columns
+            result_column, reason_column = ["Pass"] * rows, [""] * rows
+        if store.error_rows:
+            for index in np.flatnonzero(store.error_mask()).tolist():
+                result_column[index] = reason_column[index] = store.value(index, "DPI")
+        return {"Rules": result_column, "Rule Failures": reason_column}
+
+    def outcomes(self, failures):
+        """Return the result and reason text of each row of a rows x rules failure mask"""
+        import numpy as np
+
+        # Rows failing the same rules share one outcome: find the distinct
+        # combinations and build their text once each
+        packed = np.packbits(failures, axis=1)
+        combinations = np.ascontiguousarray(packed).view(np.dtype((np.void, packed.shape[1])))
+        combinations, outcome = np.unique(combinations.ravel(), return_inverse=True)
+        results, reasons = [], []
+        for combination in combinations:
+            failed = np.unpackbits(np.frombuffer(combination.tobytes(), dtype=np.uint8))
+            names = [rule.reason for rule, bit in zip(self.rules, failed) if bit]
+            results.append("Fail" if names else "Pass")
+            reasons.append("; ".join(names))
+
+        outcome = outcome.ravel().tolist()
+        return [results[index] for index in outcome], [reasons[index] for index in outcome]
+
+
+def load_rules(path):
+    """Read and compile a JSON rules file"""
+    with open(path, encoding="utf-8") as file:
+        try:
+            document = json.load(file)
+        except json.JSONDecodeError as e:
+            raise RuleError(f"{path}: {e}") from None
+    specs = document.get("rules") if isinstance(document, dict) else document
+    if not isinstance(specs, list):
+        raise RuleError(f"{path}: expected a list of rules")
+    return RuleSet(specs)
@@ -0,0 +1,348 @@
+"""Sharded, resumable runs over a fixed manifest of files.
+
+A manifest lists the files of a run, one path per line. Shard K of N
+takes every N-th file of it starting at the K-th, so N nodes (or N local
+processes) given the same manifest split it evenly and deterministically
+without talking to each other.
+
+Each shard appends one JSON line per finished file to its own checkpoint
+file, and syncs it to disk every CHECKPOINT_FILES files or
+CHECKPOINT_SECONDS seconds, so a crash loses at most that much work.
+Running the shard again skips the files already recorded, after cutting
+off a line left half written. Files that ran out of time or memory
+(Timeout and Resource limit rows) are recorded but marked for retry, so
+a resumed shard extracts them again, perhaps with a longer --timeout,
+and the new record replaces the old one. A finished shard writes a .done
+marker, and merge_shards streams the rows of every shard into one export
+in manifest order, holding one record per shard and the index of each
+shard's records in memory.
+
+run.json in the run directory records the manifest's digest, the file
+type, the extraction options and the rules, so a shard or merge with
+different settings is refused instead of mixing two runs' results.
+"""
+
+import heapq
+import json
+import os
+import re
+import sys
+import time
+from array import array
+from collections import Counter, deque
+
+from .cache import file_digest
+from .core import (DEFAULT_OPTIONS, EXTRACTOR_VERSION, RESOURCE_LIMIT_STATUS, TIMEOUT_STATUS,
+                   ExtractOptions, is_error_row)
+from .parallel import iter_extract
+
+# A checkpoint is synced to disk after this many files or seconds
+CHECKPOINT_FILES = 500
+CHECKPOINT_SECONDS = 30.0
+RUN_FILE = "run.json"
+# Options that change the rows, and so must match across shards
+RESULT_OPTIONS = ("max_pages", "pdf_engine", "dpi_mode", "pdf_images", "analyze")
+# Start of every complete checkpoint line; the index is read without
+# decoding the rows, so resuming a large shard is quick
+RECORD_START = re.compile(rb'\{"index": (\d+), ')
+# Follows the index of a record that a resumed shard extracts again
+RETRY_FLAG = b'"retry": true, '
+# Error statuses that may not recur on another attempt
+TRANSIENT_STATUSES = (TIMEOUT_STATUS, RESOURCE_LIMIT_STATUS)
+
+
+class ShardError(ValueError):
+    """Raised for a run directory that does not match the requested run"""
+
+
+def write_manifest(files, path):
+    """Write the files to a manifest, one per line, and return how many there were"""
+    count = 0
+    partial = path + ".partial"
+    with open(partial, "w", encoding="utf-8") as file:
+        for file_path in files:
+            if "\n" in file_path:
+                print(f"Warning: skipping {file_path!r}: newlines in names are not supported",
+                      file=sys.stderr)
+                continue
+            file.write(file_path)
+            file.write("\n")
+            count += 1
+    os.replace(partial, path)
+    return count
+
+
+def iter_manifest(path):
+    """Yield (index, path) for each file of a manifest; blank lines are ignored"""
+    index = 0
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            file_path = line.rstrip("\n")
+            if file_path:
+                yield index, file_path
+                index += 1
+
+
+def manifest_count(path):
+    count = 0
+    with open(path, "rb") as file:
+        for line in file:
+            if line.strip(b"\n"):
+                count += 1
+    return count
+
+
+def shard_name(shard, shards):
+    return f"shard-{shard:04d}-of-{shards:04d}"
+
+
+def describe_run(manifest, shards, file_type, options=DEFAULT_OPTIONS, rules_path=None):
+    """Return the run.json record identifying a sharded run"""
+    return {
+        "version": EXTRACTOR_VERSION,
+        "manifest": {"digest": file_digest(manifest), "files": manifest_count(manifest)},
+        "shards": shards,
+        "file_type": file_type,
+        "options": {name: getattr(options, name) for name in RESULT_OPTIONS},
+        "rules": file_digest(rules_path) if rules_path else None,
+    }
+
+
+def run_options(run):
+    """Return the ExtractOptions recorded in a run.json record"""
+    return ExtractOptions(**run["options"])
+
+
+def open_run(run_dir, run):
+    """Create run_dir for a run, or check that it already holds the same run
+
+    Several shards may start at once, so run.json is created with a
+    hard link, which fails if another shard got there first.
+    """
+    os.makedirs(run_dir, exist_ok=True)
+    path = os.path.join(run_dir, RUN_FILE)
+    if not os.path.exists(path):
+        partial = f"{path}.{os.getpid()}"
+        with open(partial, "w", encoding="utf-8") as file:
+            json.dump(run, file, indent=2)
+        try:
+            os.link(partial, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(partial)
+    existing = load_run(run_dir)
+    differences = [key for key in run if existing.get(key) != run[key]]
+    if differences:
+        raise ShardError(f"{run_dir} holds a different run (its {', '.join(differences)} "
+                         f"differ); use a new run directory")
+    return existing
+
+
+def load_run(run_dir):
+    try:
+        with open(os.path.join(run_dir, RUN_FILE), encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        raise ShardError(f"{run_dir} is not a run directory (no {RUN_FILE})") from None
+
+
+class Checkpoint:
+    """Append-only record of the files a shard has finished"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        # Files recorded with a transient error, to be extracted again
+        self.retry = set()
+        self.recover()
+        self.file = open(path, "ab")
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+
+    def recover(self):
+        """Read the indices already recorded, cutting off anything after the last good line"""
+        good = 0
+        try:
+            with open(self.path, "rb") as file:
+                for line in file:
+                    match = RECORD_START.match(line)
+                    if match is None or not line.endswith(b"}\n"):
+                        break
+                    self.mark(int(match.group(1)), line.startswith(RETRY_FLAG, match.end()))
+                    good += len(line)
+        except FileNotFoundError:
+            return
+        if good < os.path.getsize(self.path):
+            print(f"Warning: discarding an incomplete record at the end of {self.path}",
+                  file=sys.stderr)
+            os.truncate(self.path, good)
+
+    def mark(self, index, retry):
+        # A later record of the same file supersedes an earlier one
+        if retry:
+            self.done.discard(index)
+            self.retry.add(index)
+        else:
+            self.retry.discard(index)
+            self.done.add(index)
+
+    def record(self, index, file_path, rows, retry=False):
+        record = {"index": index, "retry": True} if retry else {"index": index}
+        record.update(path=file_path, rows=rows)
+        line = json.dumps(record, ensure_ascii=False)
+        self.file.write(line.encode("utf-8") + b"\n")
+        self.mark(index, retry)
+        self.unsynced += 1
+
+    def due(self):
+        return self.unsynced and (self.unsynced >= CHECKPOINT_FILES or
+                                  time.monotonic() - self.synced_at >= CHECKPOINT_SECONDS)
+
+    def sync(self):
+        """Make every recorded file durable"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+
+def iter_records(path):
+    """Yield (index, path, rows) from a checkpoint file in index order
+
+    Reading stops at an incomplete line. A file retried on resume is
+    recorded again after files with higher indices, so the records are
+    first indexed by their offsets, and only the last record of each
+    index is yielded.
+    """
+    indices = array("q")
+    offsets = array("q")
+    with open(path, "rb") as file:
+        offset = 0
+        for line in file:
+            match = RECORD_START.match(line)
+            if match is None or not line.endswith(b"}\n"):
+                break
+            indices.append(int(match.group(1)))
+            offsets.append(offset)
+            offset += len(line)
+
+        order = range(len(indices))
+        if any(indices[position] >= indices[position + 1] for position in order[:-1]):
+            # sorted() is stable, so the last record of an index comes last
+            order = sorted(order, key=indices.__getitem__)
+        for step, position in enumerate(order):
+            if step + 1 < len(order) and indices[order[step + 1]] == indices[position]:
+                continue
+            file.seek(offsets[position])
+            try:
+                record = json.loads(file.readline())
+            except ValueError:
+                break
+            yield record["index"], record["path"], record["rows"]
+
+
+def run_shard(manifest, run_dir, shard, shards, file_type, options=DEFAULT_OPTIONS, workers=1,
+              cache=None, rules=None, timeout=None, memory_limit=None, max_files_per_worker=None,
+              max_in_flight=None):
+    """Extract the manifest files belonging to one shard, resuming where it stopped
+
+    open_run() must have been called for run_dir. Returns a Counter of
+    "files" and "rows" done this time, "resumed" files skipped, and the
+    error statuses met. KeyboardInterrupt leaves the checkpoint synced,
+    so running the shard again carries on from there.
+    """
+    if not 0 <= shard < shards:
+        raise ShardError(f"shard must be between 0 and {shards - 1}")
+    name = shard_name(shard, shards)
+    done_path = os.path.join(run_dir, name + ".done")
+    checkpoint = Checkpoint(os.path.join(run_dir, name + ".jsonl"))
+    counts = Counter(resumed=len(checkpoint.done), retried=len(checkpoint.retry))
+    total = len(range(shard, manifest_count(manifest), shards))
+    retrying = f", {counts['retried']} to retry" if counts["retried"] else ""
+    print(f"Shard {shard} of {shards}: {total} files, {counts['resumed']} already done"
+          f"{retrying}", file=sys.stderr)
+
+    # Results come back in input order, so the indices of the files
+    # handed out line up with them
+    indices = deque()
+
+    def files():
+        for index, file_path in iter_manifest(manifest):
+            if index % shards == shard and index not in checkpoint.done:
+                indices.append((index, file_path))
+                yield file_path
+
+    try:
+        for _, rows in iter_extract(files(), file_type, workers, max_in_flight, ordered=True,
+                                    options=options, cache=cache, timeout=timeout,
+                                    memory_limit=memory_limit,
+                                    max_files_per_worker=max_files_per_worker):
+            index, file_path = indices.popleft()
+            if rules is not None:
+                rules.apply(rows)
+            retry = any(is_error_row(row) and row["DPI"] in TRANSIENT_STATUSES for row in rows)
+            checkpoint.record(index, file_path, rows, retry)
+            counts["files"] += 1
+            counts["rows"] += len(rows)
+            counts.update(row["DPI"] for row in rows if is_error_row(row))
+            if checkpoint.due():
+                checkpoint.sync()
+                print(f"Shard {shard} of {shards}: {len(checkpoint.done)} of {total} files",
+                      file=sys.stderr)
+    finally:
+        checkpoint.close()
+
+    with open(done_path + ".partial", "w", encoding="utf-8") as file:
+        json.dump({"files": len(checkpoint.done), "retry": len(checkpoint.retry)}, file)
+    os.replace(done_path + ".partial", done_path)
+    return counts
+
+
+def missing_shards(run_dirs, shards):
+    """Return the shard numbers with no .done marker in any of run_dirs"""
+    return [shard for shard in range(shards)
+            if not any(os.path.exists(os.path.join(run_dir, shard_name(shard, shards) + ".done"))
+                       for run_dir in run_dirs)]
+
+
+def check_runs(run_dirs):
+    """Return the run.json record shared by run_dirs, or raise ShardError"""
+    run = load_run(run_dirs[0])
+    for run_dir in run_dirs[1:]:
+        if load_run(run_dir) != run:
+            raise ShardError(f"{run_dir} and {run_dirs[0]} hold different runs")
+    return run
+
+
+def merge_shards(run_dirs, writer):
+    """Write the rows recorded by every shard in run_dirs to writer, in manifest order
+
+    Shards may be spread over several directories, e.g. one per node;
+    a file recorded twice is written once. Returns a Counter of "files"
+    and "rows" written and the error statuses met.
+    """
+    run = check_runs(run_dirs)
+    shards = run["shards"]
+    sources = []
+    for run_dir in run_dirs:
+        for shard in range(shards):
+            path = os.path.join(run_dir, shard_name(shard, shards) + ".jsonl")
+            if os.path.exists(path):
+                sources.append(iter_records(path))
+
+    counts = Counter()
+    previous = None
+    for index, _, rows in heapq.merge(*sources, key=lambda record: record[0]):
+        if index == previous:
+            continue
+        previous = index
+        writer.write_rows(rows)
+        counts["files"] += 1
+        counts["rows"] += len(rows)
+        counts.update(row["DPI"] for row in rows if is_error_row(row))
+    return counts
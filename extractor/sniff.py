@@ -0,0 +1,27 @@
+"""Identify TIFF and PDF files from their leading bytes.
+
+Mixed deliveries are not trusted to have the right extensions, so each
+file is sent to the reader its signature names; only files carrying
+neither signature fall back to their extension.
+"""
+
+# Classic TIFF and BigTIFF signatures, little and big endian
+TIFF_MAGICS = (b"II*\x00", b"MM\x00*")
+BIGTIFF_MAGICS = (b"II+\x00", b"MM\x00+")
+# PDF readers accept the header anywhere in the first kilobyte
+PDF_MAGIC = b"%PDF-"
+SNIFF_SIZE = 1024
+
+
+def sniff_file_type(head):
+    """Return "tiff" or "pdf" for the first bytes of a file, or None"""
+    if head[:4] in TIFF_MAGICS or head[:4] in BIGTIFF_MAGICS:
+        return "tiff"
+    if PDF_MAGIC in head[:SNIFF_SIZE]:
+        return "pdf"
+    return None
+
+
+def file_type_from_extension(file_path):
+    """Guess "tiff" or "pdf" from a file name alone"""
+    return "pdf" if str(file_path).lower().endswith(".pdf") else "tiff"
@@ -0,0 +1,158 @@
+"""Compact columnar storage for large numbers of metadata rows.
+
+A dict per row repeats the same keys, the same file path and filename
+on every page and many copies of values such as "Uncompressed" or
+"Yes". ResultStore instead keeps the fields that describe a whole file
+once per file, and every other column as an array of integer codes into
+a table of its distinct values, so a million rows cost a few machine
+words each.
+"""
+
+from array import array
+
+from .core import is_error_row
+
+# Fields that are the same on every row extracted from one file
+FILE_COLUMNS = ("File Type", "Filename", "Extension", "Filename Valid", "Full Path")
+
+
+class Categories:
+    """Distinct values of one column and the code assigned to each"""
+
+    __slots__ = ("codes", "values")
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+class ResultStore:
+    """Append-only store of the rows extracted from a batch of files
+
+    Rows are added one file at a time with add_rows() and read back by
+    index with value() or as dicts with row() / iter_rows(). The store
+    is a sequence, so it can be handed to anything that indexes rows.
+    """
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.file_columns = tuple(col for col in self.columns if col in FILE_COLUMNS)
+        self.row_columns = tuple(col for col in self.columns if col not in FILE_COLUMNS)
+
+        # One entry per file
+        self.file_values = {col: [] for col in self.file_columns}
+        self.file_errors = bytearray()
+
+        # One entry per row
+        self.row_files = array("l")
+        self.categories = {col: Categories() for col in self.row_columns}
+        self.codes = {col: array("l") for col in self.row_columns}
+        self.error_rows = 0
+
+    def add_rows(self, rows):
+        """Append the rows extracted from one file"""
+        if not rows:
+            return
+        file_index = len(self.file_errors)
+        first = rows[0]
+        for col in self.file_columns:
+            self.file_values[col].append(first.get(col, ""))
+        failed = is_error_row(first)
+        self.file_errors.append(failed)
+        if failed:
+            self.error_rows += len(rows)
+
+        self.row_files.extend([file_index] * len(rows))
+        for col in self.row_columns:
+            encode = self.categories[col].encode
+            self.codes[col].extend([encode(row.get(col, "")) for row in rows])
+
+    def __len__(self):
+        return len(self.row_files)
+
+    def value(self, index, column):
+        if column in self.codes:
+            return self.categories[column].values[self.codes[column][index]]
+        return self.file_values[column][self.row_files[index]]
+
+    def row(self, index):
+        return {col: self.value(index, col) for col in self.columns}
+
+    __getitem__ = row
+
+    def is_error(self, index):
+        return bool(self.file_errors[self.row_files[index]])
+
+    def iter_rows(self, include_errors=True):
+        """Yield every row as a dict, optionally skipping failed files"""
+        for index in range(len(self)):
+            if include_errors or not self.is_error(index):
+                yield self.row(index)
+
+    def sort_keys(self, column, key):
+        """Return key(value) for every row, calling key once per distinct value"""
+        if column in self.codes:
+            keys = [key(value) for value in self.categories[column].values]
+            return [keys[code] for code in self.codes[column]]
+        keys = [key(value) for value in self.file_values[column]]
+        return [keys[file_index] for file_index in self.row_files]
+
+    def column_mask(self, column, predicate):
+        """Return a NumPy boolean array of predicate(value) for every row
+
+        Like sort_keys(), predicate is called once per distinct value, and
+        a column the store does not have reads as "" on every row.
+        """
+        import numpy as np
+
+        if column in self.codes:
+            values = self.categories[column].values
+            codes = self.code_array(self.codes[column])
+        elif column in self.file_values:
+            values = self.file_values[column]
+            codes = self.code_array(self.row_files)
+        else:
+            return np.full(len(self), bool(predicate("")))
+        table = np.array([bool(predicate(value)) for value in values], dtype=bool)
+        return table[codes] if len(table) else np.zeros(len(self), dtype=bool)
+
+    def error_mask(self):
+        """Return a NumPy boolean array marking the rows of failed files"""
+        import numpy as np
+
+        failed = np.frombuffer(bytes(self.file_errors), dtype=np.uint8)
+        return failed[self.code_array(self.row_files)] != 0
+
+    def code_array(self, codes):
+        """View an array of codes as a NumPy array without copying"""
+        import numpy as np
+
+        return np.frombuffer(codes, dtype=f"i{codes.itemsize}")
+
+    def to_pandas(self, include_errors=True):
+        """Build a DataFrame, with encoded columns as pandas categoricals"""
+        import numpy as np
+        import pandas as pd
+
+        row_files = self.code_array(self.row_files)
+        data = {}
+        for col in self.columns:
+            if col in self.codes:
+                codes = self.code_array(self.codes[col])
+                data[col] = pd.Categorical.from_codes(
+                    codes, categories=pd.Index(self.categories[col].values, dtype=object))
+            else:
+                data[col] = np.array(self.file_values[col], dtype=object)[row_files]
+        frame = pd.DataFrame(data, columns=list(self.columns))
+
+        if not include_errors and self.error_rows:
+            frame = frame[~self.error_mask()].reset_index(drop=True)
+        return frame
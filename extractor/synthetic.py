@@ -0,0 +1,194 @@
+"""Reproducible synthetic TIFF and PDF corpora for benchmarking.
+
+The same seed always produces byte-identical files, so timings taken on
+different versions of the extractor are comparable. TIFFs cover the bit
+depths, compressions and page counts seen in deliveries; PDFs cover
+plain page runs, image XObjects shared across pages, Form XObjects and
+very large content streams.
+"""
+
+import os
+import random
+import zlib
+
+from PIL import Image
+
+# (Pillow mode, compressions that mode supports)
+TIFF_VARIANTS = (
+    ("1", ("raw", "group4", "packbits")),
+    ("L", ("raw", "tiff_lzw", "tiff_adobe_deflate", "jpeg")),
+    ("RGB", ("raw", "tiff_lzw", "tiff_adobe_deflate", "jpeg", "packbits")),
+    ("CMYK", ("raw", "tiff_lzw")),
+)
+TIFF_DPIS = (72, 150, 300, 400, 600)
+MAX_TIFF_PAGES = 5
+
+# PDF layouts: (name, weight)
+PDF_KINDS = (("pages", 4), ("shared", 4), ("forms", 2), ("heavy", 1))
+MAX_PDF_PAGES = 40
+HEAVY_CONTENT_BYTES = 1024 * 1024
+
+
+def isbn_name(rng):
+    return "978" + "".join(rng.choice("0123456789") for _ in range(10))
+
+
+def make_corpus(directory, tiff_count=200, pdf_count=50, seed=1):
+    """Write a corpus into directory/tiff and directory/pdf
+
+    Returns a dict with the number of files and pages of each type.
+    Each file is generated from its own seed, so files that already
+    exist are left alone and a corpus can be reused or extended.
+    """
+    summary = {"tiff_files": 0, "tiff_pages": 0, "pdf_files": 0, "pdf_pages": 0}
+
+    tiff_dir = os.path.join(directory, "tiff")
+    os.makedirs(tiff_dir, exist_ok=True)
+    for index in range(tiff_count):
+        rng = random.Random(f"{seed}:tiff:{index}")
+        name = f"{isbn_name(rng)}_{index:05d}.tif"
+        pages = write_tiff(os.path.join(tiff_dir, name), rng)
+        summary["tiff_files"] += 1
+        summary["tiff_pages"] += pages
+
+    pdf_dir = os.path.join(directory, "pdf")
+    os.makedirs(pdf_dir, exist_ok=True)
+    kinds = [kind for kind, weight in PDF_KINDS for _ in range(weight)]
+    for index in range(pdf_count):
+        rng = random.Random(f"{seed}:pdf:{index}")
+        name = f"{isbn_name(rng)}.pdf"
+        pages = write_pdf(os.path.join(pdf_dir, name), rng, rng.choice(kinds))
+        summary["pdf_files"] += 1
+        summary["pdf_pages"] += pages
+
+    return summary
+
+
+def write_tiff(path, rng):
+    """Write a TIFF with a random mode, compression, DPI and page count"""
+    mode, compressions = rng.choice(TIFF_VARIANTS)
+    compression = rng.choice(compressions)
+    dpi = rng.choice(TIFF_DPIS)
+    pages = rng.randint(1, MAX_TIFF_PAGES) if rng.random() < 0.3 else 1
+    width, height = rng.randint(32, 256), rng.randint(32, 256)
+    if os.path.exists(path):
+        return pages
+
+    frames = []
+    for _ in range(pages):
+        # Noise on a flat background, so compressors have some work to do
+        bands = len(mode) if mode != "1" else 1
+        background = tuple(rng.randint(0, 255) for _ in range(bands))
+        image = Image.new(mode, (width, height), background if bands > 1 else background[0])
+        pixels = image.load()
+        for _ in range(width * height // 16):
+            value = tuple(rng.randint(0, 255) for _ in range(bands))
+            pixels[rng.randrange(width), rng.randrange(height)] = value if bands > 1 else value[0]
+        frames.append(image)
+
+    frames[0].save(path, compression=compression, dpi=(dpi, dpi),
+                   save_all=pages > 1, append_images=frames[1:])
+    return pages
+
+
+def write_pdf(path, rng, kind):
+    """Write a PDF of the given layout and return its page count"""
+    pages = rng.randint(1, MAX_PDF_PAGES)
+    if kind == "heavy":
+        pages = rng.randint(1, 3)
+    if os.path.exists(path):
+        return pages
+
+    writer = PdfWriter()
+    shared = [writer.image(rng.choice((600, 1200, 2400)), rng.choice((800, 1600, 3000)), rng)
+              for _ in range(3)]
+    form = None
+    if kind == "forms":
+        inner = writer.image(300, 300, rng)
+        form = writer.form(b"q 100 0 0 100 0 0 cm /Im0 Do Q", {"/Im0": inner})
+
+    kids = []
+    for _ in range(pages):
+        if kind == "pages":
+            xobjects = {"/Im0": writer.image(rng.choice((1275, 2550)), rng.choice((1650, 3300)), rng)}
+        else:
+            xobjects = {"/Im0": rng.choice(shared)}
+        content = b"q 576 0 0 720 18 36 cm /Im0 Do Q"
+        if form is not None:
+            xobjects["/Fm0"] = form
+            content += b" q 2 0 0 2 100 100 cm /Fm0 Do Q"
+        if kind == "heavy":
+            content = heavy_content(rng) + content
+        kids.append(writer.page(content, xobjects))
+
+    writer.write(path, kids)
+    return pages
+
+
+def heavy_content(rng):
+    """Build a long content stream of path and text operators"""
+    chunks = []
+    size = 0
+    while size < HEAVY_CONTENT_BYTES:
+        x, y = rng.randint(0, 600), rng.randint(0, 780)
+        chunk = (f"q 0.{rng.randint(1, 9)} g {x} {y} m {x + 10} {y + 5} l S "
+                 f"BT /F1 9 Tf {x} {y} Td (line {size}) Tj ET Q\n").encode()
+        chunks.append(chunk)
+        size += len(chunk)
+    return b"".join(chunks)
+
+
+class PdfWriter:
+    """Just enough of a PDF writer for the synthetic corpus"""
+
+    def __init__(self):
+        self.objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None]
+
+    def add(self, body):
+        self.objects.append(body)
+        return len(self.objects)
+
+    def stream(self, data, entries=b"", compress=False):
+        if compress:
+            data = zlib.compress(data)
+            entries += b" /Filter /FlateDecode"
+        return b"<< /Length %d%s >>\nstream\n%s\nendstream" % (len(data), entries, data)
+
+    def image(self, width, height, rng):
+        # The pixel data is a token few bytes; only the dictionary is read
+        data = bytes(rng.randrange(256) for _ in range(16))
+        return self.add(self.stream(
+            data, b" /Type /XObject /Subtype /Image /Width %d /Height %d"
+                  b" /ColorSpace /DeviceRGB /BitsPerComponent 8" % (width, height),
+            compress=True))
+
+    def form(self, content, xobjects):
+        return self.add(self.stream(
+            content, b" /Type /XObject /Subtype /Form /BBox [0 0 1000 1000]"
+                     b" /Resources << /XObject << %s >> >>" % resource_names(xobjects)))
+
+    def page(self, content, xobjects):
+        contents = self.add(self.stream(content, compress=len(content) > 1024))
+        return self.add(b"<< /Type /Page /Parent 2 0 R /Resources << /XObject << %s >> >>"
+                        b" /Contents %d 0 R >>" % (resource_names(xobjects), contents))
+
+    def write(self, path, kids):
+        self.objects[1] = (b"<< /Type /Pages /Count %d /MediaBox [0 0 612 792] /Kids [%s] >>"
+                           % (len(kids), b" ".join(b"%d 0 R" % kid for kid in kids)))
+        output = bytearray(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(self.objects, 1):
+            offsets.append(len(output))
+            output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        xref = len(output)
+        output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(self.objects) + 1)
+        for offset in offsets:
+            output += b"%010d 00000 n \n" % offset
+        output += (b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                   % (len(self.objects) + 1, xref))
+        with open(path, "wb") as file:
+            file.write(output)
+
+
+def resource_names(xobjects):
+    return b" ".join(name.encode() + b" %d 0 R" % number for name, number in xobjects.items())
@@ -0,0 +1,358 @@
+"""Lightweight TIFF/BigTIFF header reader that never touches pixel data.
+
+Only the image file directory (IFD) is read: the header, the entry table
+of the requested IFD and, on demand, the out-of-line values of the tags
+that are actually asked for. Files the reader does not understand raise
+TiffFormatError so callers can fall back to Pillow.
+"""
+
+import struct
+
+from .prefetch import open_input
+from .sniff import BIGTIFF_MAGICS, TIFF_MAGICS
+
+# Tags used by the extractor
+NEW_SUBFILE_TYPE = 254
+IMAGE_WIDTH = 256
+IMAGE_LENGTH = 257
+BITS_PER_SAMPLE = 258
+COMPRESSION = 259
+PHOTOMETRIC_INTERPRETATION = 262
+FILL_ORDER = 266
+STRIP_OFFSETS = 273
+SAMPLES_PER_PIXEL = 277
+ROWS_PER_STRIP = 278
+STRIP_BYTE_COUNTS = 279
+X_RESOLUTION = 282
+Y_RESOLUTION = 283
+PLANAR_CONFIGURATION = 284
+RESOLUTION_UNIT = 296
+PREDICTOR = 317
+TILE_WIDTH = 322
+TILE_LENGTH = 323
+TILE_OFFSETS = 324
+TILE_BYTE_COUNTS = 325
+EXTRA_SAMPLES = 338
+SAMPLE_FORMAT = 339
+
+# Field type -> (struct code, size in bytes)
+FIELD_TYPES = {
+    1: ("B", 1),    # BYTE
+    2: ("s", 1),    # ASCII
+    3: ("H", 2),    # SHORT
+    4: ("L", 4),    # LONG
+    5: ("LL", 8),   # RATIONAL
+    6: ("b", 1),    # SBYTE
+    7: ("s", 1),    # UNDEFINED
+    8: ("h", 2),    # SSHORT
+    9: ("l", 4),    # SLONG
+    10: ("ll", 8),  # SRATIONAL
+    11: ("f", 4),   # FLOAT
+    12: ("d", 8),   # DOUBLE
+    13: ("L", 4),   # IFD
+    16: ("Q", 8),   # LONG8
+    17: ("q", 8),   # SLONG8
+    18: ("Q", 8),   # IFD8
+}
+RATIONAL_TYPES = (5, 10)
+
+COMPRESSION_NAMES = {
+    1: "Uncompressed",
+    2: "CCITT 1D",
+    3: "Group 3 Fax",
+    4: "Group 4 Fax",
+    5: "LZW",
+    6: "JPEG",
+    7: "PackBits",
+    8: "Deflate",
+    32773: "PackBits",
+    32946: "Deflate"
+}
+
+# (photometric, bits per sample, extra samples) -> Pillow mode, for the
+# layouts Pillow opens with a plain mode; anything else goes to Pillow
+PIXEL_MODES = {
+    (0, (1,), ()): "1",
+    (1, (1,), ()): "1",
+    (0, (2,), ()): "L",
+    (1, (2,), ()): "L",
+    (0, (4,), ()): "L",
+    (1, (4,), ()): "L",
+    (0, (8,), ()): "L",
+    (1, (8,), ()): "L",
+    (2, (8, 8, 8), ()): "RGB",
+    (2, (8, 8, 8, 8), ()): "RGBA",
+    (2, (8, 8, 8, 8), (0,)): "RGB",
+    (2, (8, 8, 8, 8), (1,)): "RGBA",
+    (2, (8, 8, 8, 8), (2,)): "RGBA",
+    (2, (16, 16, 16), ()): "RGB",
+    (2, (16, 16, 16, 16), ()): "RGBA",
+    (2, (16, 16, 16, 16), (0,)): "RGB",
+    (2, (16, 16, 16, 16), (1,)): "RGBA",
+    (2, (16, 16, 16, 16), (2,)): "RGBA",
+    (3, (1,), ()): "P",
+    (3, (2,), ()): "P",
+    (3, (4,), ()): "P",
+    (3, (8,), ()): "P",
+    (5, (8, 8, 8, 8), ()): "CMYK",
+    (5, (16, 16, 16, 16), ()): "CMYK",
+    (6, (8,), ()): "L",
+    (6, (8, 8, 8), ()): "RGB",
+}
+
+
+class TiffFormatError(ValueError):
+    """Raised for files the header reader cannot interpret"""
+
+
+class IFD:
+    """One image file directory; entry values are decoded on first access"""
+
+    def __init__(self, reader, offset, entries, next_offset):
+        self.reader = reader
+        self.offset = offset
+        self.entries = entries
+        self.next_offset = next_offset
+        self.values = {}
+
+    def __contains__(self, tag):
+        return tag in self.entries
+
+    def field_type(self, tag):
+        return self.entries[tag][0]
+
+    def get(self, tag, default=None):
+        if tag not in self.entries:
+            return default
+        if tag not in self.values:
+            self.values[tag] = self.reader.decode_entry(*self.entries[tag])
+        return self.values[tag]
+
+
+class TiffReader:
+    """Reads TIFF and BigTIFF headers and IFD entry tables from a binary file"""
+
+    def __init__(self, file):
+        self.file = file
+        header = file.read(16)
+        if header[:4] in TIFF_MAGICS:
+            self.big = False
+        elif header[:4] in BIGTIFF_MAGICS:
+            self.big = True
+        else:
+            raise TiffFormatError("not a TIFF file")
+
+        self.byte_order = "<" if header[:2] == b"II" else ">"
+        if self.big:
+            # BigTIFF: offset size 8, reserved 0, then an 8 byte IFD offset
+            if len(header) < 16:
+                raise TiffFormatError("truncated BigTIFF header")
+            offset_size, reserved = struct.unpack(self.byte_order + "HH", header[4:8])
+            if offset_size != 8 or reserved != 0:
+                raise TiffFormatError("unsupported BigTIFF offset size")
+            self.first_offset = struct.unpack(self.byte_order + "Q", header[8:16])[0]
+            self.count_format, self.entry_size, self.inline_size, self.offset_format = "Q", 20, 8, "Q"
+        else:
+            if len(header) < 8:
+                raise TiffFormatError("truncated TIFF header")
+            self.first_offset = struct.unpack(self.byte_order + "L", header[4:8])[0]
+            self.count_format, self.entry_size, self.inline_size, self.offset_format = "H", 12, 4, "L"
+
+    def read_at(self, offset, size):
+        self.file.seek(offset)
+        data = self.file.read(size)
+        if len(data) != size:
+            raise TiffFormatError("unexpected end of file")
+        return data
+
+    def read_ifd(self, offset):
+        """Read the entry table at offset without decoding any values"""
+        if offset < 8:
+            raise TiffFormatError("invalid IFD offset")
+        count_size = struct.calcsize(self.byte_order + self.count_format)
+        count = struct.unpack(self.byte_order + self.count_format,
+                              self.read_at(offset, count_size))[0]
+        if count == 0 or count > 4096:
+            raise TiffFormatError("implausible IFD entry count")
+
+        offset_bytes = struct.calcsize(self.byte_order + self.offset_format)
+        table = self.read_at(offset + count_size, count * self.entry_size + offset_bytes)
+
+        entry_format = self.byte_order + "HH" + self.offset_format
+        head_size = struct.calcsize(entry_format)
+        entries = {}
+        for position in range(0, count * self.entry_size, self.entry_size):
+            tag, field_type, value_count = struct.unpack_from(entry_format, table, position)
+            field = table[position + head_size:position + self.entry_size]
+            entries[tag] = (field_type, value_count, field)
+
+        next_offset = struct.unpack_from(self.byte_order + self.offset_format, table,
+                                         count * self.entry_size)[0]
+        return IFD(self, offset, entries, next_offset)
+
+    def first_ifd(self):
+        return self.read_ifd(self.first_offset)
+
+    def iter_ifds(self, max_pages=None):
+        """Walk the IFD chain lazily, stopping at a loop or after max_pages"""
+        if max_pages is not None and max_pages < 1:
+            return
+        ifd = self.first_ifd()
+        seen = {ifd.offset}
+        count = 1
+        yield ifd
+        while ifd.next_offset and (max_pages is None or count < max_pages):
+            if ifd.next_offset in seen:
+                break
+            ifd = self.read_ifd(ifd.next_offset)
+            seen.add(ifd.offset)
+            count += 1
+            yield ifd
+
+    def decode_entry(self, field_type, count, field):
+        """Decode an entry, fetching its value from elsewhere in the file if needed"""
+        if field_type not in FIELD_TYPES:
+            raise TiffFormatError(f"unknown field type {field_type}")
+        code, size = FIELD_TYPES[field_type]
+        total = size * count
+        if total <= self.inline_size:
+            data = field[:total]
+        else:
+            value_offset = struct.unpack(self.byte_order + self.offset_format, field)[0]
+            data = self.read_at(value_offset, total)
+
+        if code == "s":
+            if field_type == 2:
+                return data.split(b"\x00", 1)[0].decode("latin-1")
+            return data
+
+        values = struct.unpack(self.byte_order + code * count, data)
+        if field_type in RATIONAL_TYPES:
+            values = tuple(zip(values[::2], values[1::2]))
+        return values[0] if count == 1 else values
+
+
+def format_resolution(value):
+    """Format a resolution the way Pillow's IFDRational prints"""
+    if isinstance(value, tuple):
+        return str(value[0] / value[1])
+    return str(value)
+
+
+def resolution_value(ifd, tag):
+    """Return a resolution entry as a (numerator, denominator) pair or the default 1"""
+    if tag not in ifd:
+        return 1
+    value = ifd.get(tag)
+    if ifd.field_type(tag) != 5 or not isinstance(value[0], int) or value[1] == 0:
+        raise TiffFormatError("unusual resolution entry")
+    return value
+
+
+def summarize_dpi(ifd):
+    """Describe the resolution exactly as the Pillow based path does"""
+    x_res = resolution_value(ifd, X_RESOLUTION)
+    y_res = resolution_value(ifd, Y_RESOLUTION)
+    x_set = x_res[0] if isinstance(x_res, tuple) else x_res
+    y_set = y_res[0] if isinstance(y_res, tuple) else y_res
+    if not (x_set and y_set):
+        return "Not specified"
+
+    unit = ifd.get(RESOLUTION_UNIT)
+    if unit is None or unit == 2:  # dots per inch
+        return f"{format_resolution(x_res)} x {format_resolution(y_res)}"
+    if unit == 3:  # dots per centimeter, converted to dpi
+        x_dpi = x_res[0] / x_res[1] * 2.54 if isinstance(x_res, tuple) else x_res * 2.54
+        y_dpi = y_res[0] / y_res[1] * 2.54 if isinstance(y_res, tuple) else y_res * 2.54
+        return f"{x_dpi} x {y_dpi}"
+    return "Not specified"
+
+
+def as_tuple(value):
+    return value if isinstance(value, tuple) else (value,)
+
+
+def pixel_mode(ifd):
+    """Work out the Pillow mode for the IFD, or raise if it is not a plain layout"""
+    photometric = ifd.get(PHOTOMETRIC_INTERPRETATION, 0)
+    if ifd.get(FILL_ORDER, 1) != 1:
+        raise TiffFormatError("unsupported fill order")
+    if set(as_tuple(ifd.get(SAMPLE_FORMAT, 1))) != {1}:
+        raise TiffFormatError("unsupported sample format")
+
+    # Old-style JPEG data is treated as YCbCr whatever the tag says
+    old_jpeg = ifd.get(COMPRESSION, 1) == 6
+    if old_jpeg:
+        photometric = 6
+
+    bits = as_tuple(ifd.get(BITS_PER_SAMPLE, 1))
+    extra = as_tuple(ifd.get(EXTRA_SAMPLES, ()))
+    samples = ifd.get(SAMPLES_PER_PIXEL, 3 if old_jpeg and photometric in (2, 6) else 1)
+
+    # Normalize the bits tuple to one entry per sample, as Pillow does
+    if samples < len(bits):
+        bits = bits[:samples]
+    elif samples > len(bits) and len(bits) == 1:
+        bits = bits * samples
+
+    mode = PIXEL_MODES.get((photometric, bits, extra))
+    if mode is None:
+        raise TiffFormatError("pixel layout needs Pillow")
+    return mode
+
+
+def describe_color_depth(total_bits, color_mode):
+    """Turn bit depth and Pillow mode into the Color Depth column text"""
+    if total_bits > 0:
+        if color_mode == '1':
+            return "1-bit (Bilevel)"
+        elif color_mode in ['L', 'P']:
+            return f"{total_bits}-bit Grayscale"
+        elif color_mode == 'RGB':
+            return f"{total_bits}-bit Color"
+        elif color_mode == 'RGBA':
+            return f"{total_bits}-bit Color with Alpha"
+        elif color_mode == 'CMYK':
+            return f"{total_bits}-bit CMYK"
+        else:
+            return f"{total_bits}-bit ({color_mode})"
+    else:
+        # Fallback to mode-based detection
+        if color_mode == '1':
+            return "1-bit (Bilevel)"
+        elif color_mode in ['L', 'P']:
+            return "8-bit Grayscale"
+        elif color_mode == 'RGB':
+            return "24-bit Color"
+        elif color_mode == 'RGBA':
+            return "32-bit Color with Alpha"
+        elif color_mode == 'CMYK':
+            return "32-bit CMYK"
+        else:
+            return f"Unknown ({color_mode})"
+
+
+def summarize_ifd(ifd):
+    """Return (DPI, Compression, Color Depth) strings for an IFD"""
+    dpi = summarize_dpi(ifd)
+
+    if COMPRESSION in ifd:
+        code = ifd.get(COMPRESSION)
+        compression = COMPRESSION_NAMES.get(code, f"Unknown ({code})")
+    else:
+        compression = "Unknown"
+
+    bits = ifd.get(BITS_PER_SAMPLE, 0)
+    bits_per_sample = as_tuple(bits)[0] if bits != () else 0
+    samples_per_pixel = ifd.get(SAMPLES_PER_PIXEL, 1)
+    color_depth = describe_color_depth(bits_per_sample * samples_per_pixel, pixel_mode(ifd))
+
+    return dpi, compression, color_depth
+
+
+def iter_tiff_ifds(file_path, max_pages=None, latency=0.0):
+    """Yield the IFDs of a TIFF one page at a time, keeping the file open meanwhile"""
+    with open_input(file_path, latency) as file:
+        reader = TiffReader(file)
+        for ifd in reader.iter_ifds(max_pages):
+            yield ifd
@@ -0,0 +1,168 @@
+"""Opt-in timing of the stages of extraction, export and display.
+
+Code marks a stage with ``with stage("pdf.open"):``. While profiling is
+off (the default) stage() returns a shared do-nothing context manager, so
+the instrumentation costs one function call per stage. When it is on,
+every stage records a span of (name, start, duration, file, pid, thread)
+in a per-process list; the batch engine collects the spans after each
+file and a Profile aggregates them into percentiles, the slowest files
+and a Chrome trace (load it in chrome://tracing or ui.perfetto.dev).
+
+Stages nest: a "file" span covers the whole of one file's extraction and
+the stages inside it overlap it.
+"""
+
+import heapq
+import json
+import os
+import threading
+import time
+from array import array
+
+# Set in each process that should record spans
+enabled = False
+spans = []
+local = threading.local()
+
+# Percentiles reported for every stage
+PERCENTILES = (50, 95, 99)
+
+
+class Span:
+    """Context manager recording one timed stage"""
+
+    __slots__ = ("name", "file_path", "outer", "start")
+
+    def __init__(self, name, file_path=None):
+        self.name = name
+        self.file_path = file_path
+
+    def __enter__(self):
+        # Stages inside a file span are attributed to that file
+        self.outer = getattr(local, "file_path", None)
+        if self.file_path is None:
+            self.file_path = self.outer
+        else:
+            local.file_path = self.file_path
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        local.file_path = self.outer
+        spans.append((self.name, self.start, duration, self.file_path, os.getpid(),
+                      threading.get_ident()))
+        return False
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def stage(name, file_path=None):
+    """Time a block as the named stage, if profiling is enabled
+
+    Pass file_path to make the block the span of a whole file; stages
+    inside it are then attributed to that file.
+    """
+    if not enabled:
+        return NULL_SPAN
+    return Span(name, None if file_path is None else str(file_path))
+
+
+def take_spans():
+    """Return the spans recorded since the last call and forget them"""
+    # Copy then trim, so spans appended meanwhile by other threads survive
+    taken = spans[:]
+    del spans[:len(taken)]
+    return taken
+
+
+class Profile:
+    """Aggregate of the spans recorded across a batch
+
+    Durations are kept per stage for percentiles, the slowest files in a
+    small heap, and the raw spans only when a trace is wanted.
+    """
+
+    def __init__(self, keep_spans=False, slowest=10):
+        self.durations = {}
+        self.slowest_count = slowest
+        self.slowest_files = []
+        self.spans = [] if keep_spans else None
+        self.origin = time.perf_counter()
+
+    def add(self, new_spans):
+        for span in new_spans:
+            name, _, duration, file_path = span[:4]
+            if name not in self.durations:
+                self.durations[name] = array("d")
+            self.durations[name].append(duration)
+            if name == "file":
+                entry = (duration, file_path)
+                if len(self.slowest_files) < self.slowest_count:
+                    heapq.heappush(self.slowest_files, entry)
+                else:
+                    heapq.heappushpop(self.slowest_files, entry)
+            if self.spans is not None:
+                self.spans.append(span)
+
+    def summary(self):
+        """Return {stage: {"count", "total", "p50", "p95", "p99", "max"}} in seconds"""
+        result = {}
+        for name, durations in self.durations.items():
+            ordered = sorted(durations)
+            entry = {"count": len(ordered), "total": sum(ordered)}
+            for percentile in PERCENTILES:
+                entry[f"p{percentile}"] = nearest_rank(ordered, percentile)
+            entry["max"] = ordered[-1]
+            result[name] = entry
+        return result
+
+    def slowest(self):
+        """Return (seconds, path) of the slowest files, slowest first"""
+        return sorted(self.slowest_files, reverse=True)
+
+    def format_summary(self):
+        """Render the stage percentiles and slowest files as text"""
+        lines = [f"{'stage':<16} {'count':>8} {'total':>9} {'p50':>9} {'p95':>9} "
+                 f"{'p99':>9} {'max':>9}"]
+        summary = self.summary()
+        for name in sorted(summary, key=lambda name: -summary[name]["total"]):
+            entry = summary[name]
+            lines.append(f"{name:<16} {entry['count']:>8} {entry['total']:>8.3f}s "
+                         + " ".join(f"{entry[key] * 1000:>7.2f}ms"
+                                    for key in ("p50", "p95", "p99", "max")))
+        slowest = self.slowest()
+        if slowest:
+            lines.append("Slowest files:")
+            lines.extend(f"{duration * 1000:>10.1f}ms  {file_path}" for duration, file_path in slowest)
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        """Write the recorded spans in the Chrome trace event format"""
+        events = []
+        for name, start, duration, file_path, pid, thread in self.spans or ():
+            event = {"name": name, "cat": name.split(".")[0], "ph": "X", "pid": pid,
+                     "tid": thread, "ts": round((start - self.origin) * 1e6, 1),
+                     "dur": round(duration * 1e6, 1)}
+            if file_path is not None:
+                event["args"] = {"file": file_path}
+            events.append(event)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+def nearest_rank(ordered, percentile):
+    """Return the value at a percentile of an ascending sequence"""
+    index = max(0, -(-len(ordered) * percentile // 100) - 1)
+    return ordered[index]
@@ -0,0 +1,707 @@
+"""Hot folder daemon: extract files as they arrive in watched directories.
+
+Arrivals are noticed through inotify on Linux, so the cost of watching
+does not grow with the number of files already in the tree; elsewhere,
+or when inotify is unavailable or out of watches, directories are polled
+and only those whose modification time changed are listed again. The
+tree is walked once at startup and again only if the kernel's event
+queue overflows.
+
+A file that has just appeared may still be being written, so every
+arrival waits in a Debouncer until its size and modification time have
+not changed for the settle period. Files whose size and modification
+time match the last extraction are skipped, so touching a directory or
+re-saving nothing does not produce duplicate rows. Those signatures are
+kept in a journal next to the sink, so a restarted daemon skips the
+files it has already extracted and picks up those it had not reached.
+
+Rows are appended to a CSV or JSON Lines sink as each file finishes, and
+a small HTTP endpoint on localhost reports the queue depth and
+throughput as JSON.
+"""
+
+import errno
+import heapq
+import json
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from .core import DEFAULT_OPTIONS, FILE_EXTENSIONS, is_error_row
+
+# Seconds a file's size and modification time must hold still before it
+# is extracted, and between directory scans when polling
+DEFAULT_SETTLE = 2.0
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_STATUS_PORT = 8765
+# Appended to the sink's path to name the journal of extracted files
+JOURNAL_SUFFIX = ".processed"
+# Completions counted towards the files per minute rate
+RATE_WINDOW = 60.0
+# A directory modified this recently may change again within the same
+# timestamp tick, so the poller lists it again even if its time is unchanged
+RACY_NS = 2 * 10**9
+
+# inotify event flags, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+# Every write to a file raises IN_MODIFY, so it is not watched: a file is
+# picked up when it is created, closed or moved in, and the Debouncer
+# re-checks it until it is stable
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+def file_signature(path):
+    """Return (size, modification time) of a regular file, or None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def list_directory(directory):
+    """Return the entries of a directory split into files and subdirectories
+
+    Returns None if the directory cannot be read.
+    """
+    try:
+        with os.scandir(directory) as scan:
+            entries = list(scan)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            print(f"Warning: cannot read {directory}: {e.strerror}", file=sys.stderr)
+        return None
+    files, subdirectories = [], []
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                files.append(entry)
+        except OSError:
+            # Entries can vanish mid-listing
+            continue
+    return files, subdirectories
+
+
+class InotifyWatcher:
+    """Report arrivals under a set of directories through Linux inotify
+
+    Raises OSError if inotify is not available.
+    """
+
+    backend = "inotify"
+
+    def __init__(self, roots, extensions):
+        # Only imported here so the command line starts quickly
+        import ctypes
+
+        self.roots = roots
+        self.extensions = extensions
+        self.watches = {}
+        self.rescans = 0
+        self.get_errno = ctypes.get_errno
+        # The interpreter's own symbols include the C library's
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = self.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def fileno(self):
+        return self.fd
+
+    def next_check(self):
+        """Monotonic time the watcher needs reading by even without events"""
+        return None
+
+    def close(self):
+        os.close(self.fd)
+
+    def start(self):
+        """Watch every directory under the roots and return the files already there"""
+        found = []
+        for root in self.roots:
+            found.extend(self.add_tree(root))
+        return found
+
+    def add_tree(self, root):
+        """Watch root and the directories below it, returning the files in them
+
+        Each directory is watched before it is listed, so a file created
+        in between is reported by one or the other.
+        """
+        found = []
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                error = self.get_errno()
+                if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                    continue
+                # ENOSPC: out of watches; the caller falls back to polling
+                raise OSError(error, os.strerror(error), directory)
+            self.watches[wd] = directory
+            listing = list_directory(directory)
+            if listing is None:
+                continue
+            files, subdirectories = listing
+            found.extend(entry.path for entry in files
+                         if entry.name.lower().endswith(self.extensions))
+            stack.extend(subdirectories)
+        return found
+
+    def read(self):
+        """Return (arrived, gone) paths from the events queued since the last read"""
+        arrived, gone = [], []
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length]
+                offset += EVENT_HEADER.size + length
+                self.handle(wd, mask, os.fsdecode(name.split(b"\0", 1)[0]), arrived, gone)
+        return arrived, gone
+
+    def handle(self, wd, mask, name, arrived, gone):
+        if mask & IN_Q_OVERFLOW:
+            # Events were dropped; find out what is there the slow way
+            self.rescans += 1
+            arrived.extend(self.start())
+            return
+        if mask & IN_IGNORED:
+            self.watches.pop(wd, None)
+            return
+        directory = self.watches.get(wd)
+        if directory is None or not name:
+            return
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                arrived.extend(self.add_tree(path))
+            elif mask & IN_MOVED_FROM:
+                self.forget_tree(path)
+        elif not name.lower().endswith(self.extensions):
+            return
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            gone.append(path)
+        else:
+            arrived.append(path)
+
+    def forget_tree(self, root):
+        """Stop watching a directory moved away, whose watches keep reporting its old path"""
+        prefix = root + os.sep
+        for wd, directory in list(self.watches.items()):
+            if directory == root or directory.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+
+
+class PollingWatcher:
+    """Report arrivals under a set of directories by polling them
+
+    Every interval each known directory is stat'ed, and only directories
+    whose modification time changed are listed again. Creating, renaming
+    or deleting a file changes its directory, so arrivals are found
+    without visiting every file; a file rewritten in place is only
+    noticed once something in its directory changes.
+    """
+
+    backend = "polling"
+
+    def __init__(self, roots, extensions, interval=DEFAULT_POLL_INTERVAL):
+        self.roots = roots
+        self.extensions = extensions
+        self.interval = interval
+        self.rescans = 0
+        # Directory: (modification time, {file name: signature})
+        self.directories = {}
+        self.next_scan = 0.0
+
+    @property
+    def watches(self):
+        return self.directories
+
+    def fileno(self):
+        return None
+
+    def next_check(self):
+        return self.next_scan
+
+    def close(self):
+        pass
+
+    def start(self):
+        found = []
+        for root in self.roots:
+            found.extend(self.add_tree(root))
+        self.next_scan = time.monotonic() + self.interval
+        return found
+
+    def add_tree(self, root):
+        found = []
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            arrived, _, subdirectories = self.list(directory)
+            found.extend(arrived)
+            stack.extend(subdirectory for subdirectory in subdirectories
+                         if subdirectory not in self.directories)
+        return found
+
+    def list(self, directory):
+        """Re-list a directory, returning (arrived, gone, subdirectories)"""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return [], self.forget_tree(directory), []
+        listing = list_directory(directory)
+        if listing is None:
+            return [], [], []
+        files, subdirectories = listing
+        _, known = self.directories.get(directory, (None, {}))
+        current = {}
+        arrived = []
+        for entry in files:
+            if not entry.name.lower().endswith(self.extensions):
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            signature = current[entry.name] = (stat.st_size, stat.st_mtime_ns)
+            if known.get(entry.name) != signature:
+                arrived.append(entry.path)
+        gone = [os.path.join(directory, name) for name in known if name not in current]
+        self.directories[directory] = (mtime, current)
+        return arrived, gone, subdirectories
+
+    def forget_tree(self, root):
+        """Drop a vanished directory and those below it, returning their files"""
+        prefix = root + os.sep
+        gone = []
+        for directory in list(self.directories):
+            if directory == root or directory.startswith(prefix):
+                _, known = self.directories.pop(directory)
+                gone.extend(os.path.join(directory, name) for name in known)
+        return gone
+
+    def read(self):
+        now = time.monotonic()
+        if now < self.next_scan:
+            return [], []
+        self.next_scan = now + self.interval
+        arrived, gone = [], []
+        wall_clock = time.time_ns()
+        for directory in list(self.directories):
+            if directory not in self.directories:
+                # Dropped along with a vanished parent
+                continue
+            mtime, _ = self.directories[directory]
+            try:
+                current = os.stat(directory).st_mtime_ns
+            except OSError:
+                gone.extend(self.forget_tree(directory))
+                continue
+            if current == mtime and wall_clock - current > RACY_NS:
+                continue
+            new, removed, subdirectories = self.list(directory)
+            arrived.extend(new)
+            gone.extend(removed)
+            for subdirectory in subdirectories:
+                if subdirectory not in self.directories:
+                    arrived.extend(self.add_tree(subdirectory))
+        return arrived, gone
+
+
+def make_watcher(roots, extensions, force_polling=False, poll_interval=DEFAULT_POLL_INTERVAL):
+    """Return a started watcher and the files already under roots
+
+    inotify is used where it works, falling back to polling when the
+    platform lacks it or the tree needs more watches than are allowed.
+    """
+    if not force_polling and sys.platform.startswith("linux"):
+        watcher = None
+        try:
+            watcher = InotifyWatcher(roots, extensions)
+            return watcher, watcher.start()
+        except OSError as e:
+            if watcher is not None:
+                watcher.close()
+            print(f"Warning: inotify unavailable ({e.strerror or e}); polling every "
+                  f"{poll_interval:g} seconds", file=sys.stderr)
+    watcher = PollingWatcher(roots, extensions, poll_interval)
+    return watcher, watcher.start()
+
+
+class Debouncer:
+    """Hold paths until their size and modification time stop changing
+
+    A path is ready once the same signature has been seen settle seconds
+    apart; a path that changes in between waits another settle period,
+    and one that disappears is dropped.
+    """
+
+    def __init__(self, settle=DEFAULT_SETTLE):
+        self.settle = settle
+        # Path: (signature, time it is next checked)
+        self.waiting = {}
+        self.heap = []
+
+    def __len__(self):
+        return len(self.waiting)
+
+    def touch(self, path, now):
+        """Note activity on path, restarting its settle period"""
+        due = now + self.settle
+        self.waiting[path] = (file_signature(path), due)
+        heapq.heappush(self.heap, (due, path))
+
+    def discard(self, path):
+        self.waiting.pop(path, None)
+
+    def next_due(self):
+        return self.heap[0][0] if self.heap else None
+
+    def ready(self, now):
+        """Return [(path, signature)] for the paths that have settled"""
+        settled = []
+        while self.heap and self.heap[0][0] <= now:
+            due, path = heapq.heappop(self.heap)
+            entry = self.waiting.get(path)
+            if entry is None or entry[1] != due:
+                # Touched again since, or discarded
+                continue
+            signature = file_signature(path)
+            if signature is None:
+                del self.waiting[path]
+            elif signature == entry[0]:
+                del self.waiting[path]
+                settled.append((path, signature))
+            else:
+                self.touch(path, now)
+        return settled
+
+
+class HotFolder:
+    """Watch directories and append the metadata of every settled file to a sink
+
+    writer is an open RowWriter, typically appending to a CSV or JSON
+    Lines file; it is flushed after every batch of finished files so the
+    sink can be tailed. Files are always extracted in worker processes,
+    so a file that hangs or crashes a parser only costs its own row.
+    cache, rules, timeout, memory_limit and max_files_per_worker work as
+    in iter_extract and the extract command.
+
+    journal_path, if given, names a JSON Lines file recording the size
+    and modification time of every extracted file. It is read at start,
+    so files extracted by an earlier run are not extracted again, and a
+    file is only written to it once the sink has flushed its rows, so a
+    crash can repeat a row but never lose one.
+
+    run() blocks until stop() is called, typically from a signal handler,
+    then finishes the files already being extracted.
+    """
+
+    def __init__(self, directories, writer, file_type="tiff", workers=1, options=DEFAULT_OPTIONS,
+                 cache=None, rules=None, settle=DEFAULT_SETTLE,
+                 poll_interval=DEFAULT_POLL_INTERVAL, force_polling=False,
+                 ignore_existing=False, timeout=None, memory_limit=None,
+                 max_files_per_worker=None, max_in_flight=None, journal_path=None):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.writer = writer
+        self.file_type = file_type
+        self.workers = workers
+        self.options = options
+        self.cache = cache
+        self.rules = rules
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        self.ignore_existing = ignore_existing
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.max_files_per_worker = max_files_per_worker
+        self.max_in_flight = max(1, max_in_flight or workers * 4)
+        self.journal_path = journal_path
+        self.journal = None
+        # Journal lines of the files whose rows the sink has not flushed yet
+        self.journal_lines = []
+
+        self.debouncer = Debouncer(settle)
+        self.queue = deque()
+        self.pending = {}
+        # Path: signature of the file when it was last extracted
+        self.processed = {}
+        self.watcher = None
+        self.counts = Counter()
+        self.errors = Counter()
+        self.stats = Counter()
+        self.finished_at = deque()
+        self.last_file = None
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        # Finished futures and stop requests write here to wake the loop
+        self.wake_reader, self.wake_writer = os.pipe()
+        os.set_blocking(self.wake_reader, False)
+        os.set_blocking(self.wake_writer, False)
+
+    def wake(self, *_):
+        try:
+            os.write(self.wake_writer, b"\0")
+        except (BlockingIOError, OSError):
+            # Already awake, or shutting down
+            pass
+
+    def stop(self):
+        """Ask run() to stop taking new files and return"""
+        self.stopping.set()
+        self.wake()
+
+    def run(self):
+        # Only imported here so the other commands start quickly
+        from .workers import WorkerPool
+
+        extensions = FILE_EXTENSIONS[self.file_type]
+        if self.journal_path is not None:
+            self.open_journal()
+        self.watcher, existing = make_watcher(self.directories, extensions, self.force_polling,
+                                              self.poll_interval)
+        now = time.monotonic()
+        for path in existing:
+            if self.ignore_existing:
+                self.processed[path] = file_signature(path)
+            else:
+                self.debouncer.touch(path, now)
+        print(f"Watching {len(self.watcher.watches)} directories with {self.watcher.backend}; "
+              f"{len(existing)} files already present"
+              f"{' were skipped' if self.ignore_existing else ''}", file=sys.stderr)
+        try:
+            with WorkerPool(self.workers, self.timeout or None, self.memory_limit or None,
+                            self.max_files_per_worker or None) as pool:
+                while not self.stopping.is_set():
+                    self.wait()
+                    self.take_events()
+                    self.submit(pool)
+                    self.collect()
+                # Let the files already running finish; queued ones are not
+                # in the journal, so the next start picks them up again
+                # (unless it is told to ignore existing files)
+                while self.pending:
+                    self.wait()
+                    self.collect()
+        finally:
+            self.watcher.close()
+            os.close(self.wake_reader)
+            os.close(self.wake_writer)
+            try:
+                self.flush()
+            finally:
+                if self.journal is not None:
+                    self.journal.close()
+                if self.cache is not None:
+                    self.cache.flush()
+
+    def open_journal(self):
+        """Load the files extracted by earlier runs and open the journal for appending
+
+        The journal is rewritten without the files that have gone since
+        and without a line cut short by a crash, so each start leaves one
+        line per file still present.
+        """
+        try:
+            with open(self.journal_path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                        self.processed[record["path"]] = (record["size"], record["mtime_ns"])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            pass
+        partial = self.journal_path + ".partial"
+        with open(partial, "w", encoding="utf-8") as file:
+            for path, signature in list(self.processed.items()):
+                if file_signature(path) is None:
+                    del self.processed[path]
+                else:
+                    file.write(journal_line(path, signature))
+        os.replace(partial, self.journal_path)
+        self.journal = open(self.journal_path, "a", encoding="utf-8")
+
+    def wait(self):
+        """Sleep until an event, a finished file, a settle deadline or a poll is due"""
+        deadlines = [deadline for deadline in (self.debouncer.next_due(), self.watcher.next_check())
+                     if deadline is not None]
+        delay = max(0.0, min(deadlines) - time.monotonic()) if deadlines else 1.0
+        watched = [self.wake_reader]
+        if self.watcher.fileno() is not None:
+            watched.append(self.watcher.fileno())
+        try:
+            select.select(watched, [], [], min(delay, 1.0))
+        except InterruptedError:
+            pass
+        try:
+            while os.read(self.wake_reader, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def take_events(self):
+        arrived, gone = self.watcher.read()
+        now = time.monotonic()
+        with self.lock:
+            for path in gone:
+                self.debouncer.discard(path)
+                self.processed.pop(path, None)
+            for path in arrived:
+                self.debouncer.touch(path, now)
+            for path, signature in self.debouncer.ready(now):
+                if self.processed.get(path) == signature:
+                    self.counts["skipped_unchanged"] += 1
+                    continue
+                self.queue.append((path, signature))
+
+    def submit(self, pool):
+        from .parallel import extract_with_stats
+
+        hits = 0
+        while self.queue and len(self.pending) < self.max_in_flight:
+            with self.lock:
+                path, signature = self.queue.popleft()
+            rows = None
+            if self.cache is not None:
+                rows = self.cache.lookup(path, self.file_type, self.options)
+            if rows is not None:
+                self.finish(path, signature, rows)
+                hits += 1
+                continue
+            future = pool.submit(extract_with_stats, path, self.file_type, self.options)
+            with self.lock:
+                self.pending[future] = (path, signature)
+            future.add_done_callback(self.wake)
+        if hits:
+            self.flush()
+
+    def collect(self):
+        from .parallel import future_rows
+
+        done = [future for future in self.pending if future.done()]
+        for future in done:
+            with self.lock:
+                path, signature = self.pending.pop(future)
+            rows = future_rows(future, path, self.file_type, self.options, self.cache, self.stats)
+            self.finish(path, signature, rows)
+        if done:
+            self.flush()
+
+    def finish(self, path, signature, rows):
+        if self.rules is not None:
+            self.rules.apply(rows)
+        self.writer.write_rows(rows)
+        if self.journal is not None:
+            self.journal_lines.append(journal_line(path, signature))
+        now = time.monotonic()
+        with self.lock:
+            self.processed[path] = signature
+            self.counts["files"] += 1
+            self.counts["rows"] += len(rows)
+            self.errors.update(row["DPI"] for row in rows if is_error_row(row))
+            if self.rules is not None:
+                self.counts["rule_failures"] += sum(row["Rules"] == "Fail" for row in rows)
+            self.finished_at.append(now)
+            self.last_file = path
+
+    def flush(self):
+        """Flush the sink, then journal the files whose rows it now holds"""
+        self.writer.flush()
+        if self.journal_lines:
+            self.journal.writelines(self.journal_lines)
+            self.journal.flush()
+            self.journal_lines = []
+
+    def status(self):
+        """Return a JSON-ready snapshot of the daemon's progress"""
+        now = time.monotonic()
+        with self.lock:
+            while self.finished_at and self.finished_at[0] < now - RATE_WINDOW:
+                self.finished_at.popleft()
+            uptime = time.time() - self.started
+            return {
+                "backend": self.watcher.backend if self.watcher else None,
+                "directories": len(self.watcher.watches) if self.watcher else 0,
+                "settling": len(self.debouncer),
+                "queued": len(self.queue),
+                "in_flight": len(self.pending),
+                "queue_depth": len(self.debouncer) + len(self.queue) + len(self.pending),
+                "files_done": self.counts["files"],
+                "rows_written": self.counts["rows"],
+                "errors": dict(self.errors),
+                "rule_failures": self.counts["rule_failures"],
+                "skipped_unchanged": self.counts["skipped_unchanged"],
+                "rescans": self.watcher.rescans if self.watcher else 0,
+                "files_per_minute": len(self.finished_at) * 60.0 / min(RATE_WINDOW,
+                                                                       max(uptime, 1.0)),
+                "uptime_seconds": round(uptime, 1),
+                "last_file": self.last_file,
+                "stopping": self.stopping.is_set(),
+            }
+
+
+def journal_line(path, signature):
+    size, mtime_ns = signature
+    return json.dumps({"path": path, "size": size, "mtime_ns": mtime_ns}, ensure_ascii=False) + "\n"
+
+
+def serve_status(hot_folder, port, host="127.0.0.1"):
+    """Serve hot_folder.status() as JSON on GET / and /status from a background thread
+
+    Returns the server; call shutdown() on it to stop serving.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/status"):
+                self.send_error(404)
+                return
+            body = json.dumps(hot_folder.status(), indent=2).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Polling monitors would flood the daemon's own output
+            pass
+
+    server = ThreadingHTTPServer((host, port), StatusHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="watch-status", daemon=True).start()
+    return server
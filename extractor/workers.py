@@ -0,0 +1,272 @@
+"""Worker processes that can be stopped one file at a time.
+
+ProcessPoolExecutor cannot interrupt a running task, so one file that
+sends a parser into a loop holds a worker for as long as it likes, and a
+file that makes it allocate gigabytes can take the machine down with it.
+WorkerPool hands each worker one task at a time over its own pipe, kills
+a worker whose task runs past the time limit, caps every worker's
+address space so runaway allocations fail with MemoryError inside that
+worker, and replaces workers after a set number of tasks so slow leaks
+in the parsing libraries cannot build up over a long batch.
+
+submit() returns concurrent.futures.Future objects, so the pool drops in
+where a ProcessPoolExecutor was used.
+"""
+
+import multiprocessing
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; memory limits are then not enforced
+    resource = None
+
+# Address space limits only hold where the platform enforces RLIMIT_AS
+MEMORY_LIMIT_SUPPORTED = resource is not None and hasattr(resource, "RLIMIT_AS")
+
+
+class TaskTimeout(Exception):
+    """The task ran past the time limit and its worker was killed"""
+
+
+class WorkerDied(Exception):
+    """The worker process exited without returning a result"""
+
+
+def worker_main(conn, memory_limit):
+    """Worker process body: run tasks from conn until told to stop"""
+    # Ctrl+C is handled by the parent, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if memory_limit and MEMORY_LIMIT_SUPPORTED:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        fn, args = task
+        try:
+            result = (True, fn(*args))
+        except BaseException as e:
+            result = (False, e)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # The result or exception could not be pickled
+            conn.send((False, RuntimeError(f"cannot return result: {e}")))
+
+
+class Worker:
+    """One worker process and the task it is running"""
+
+    def __init__(self, context, memory_limit):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child, memory_limit),
+                                       daemon=True)
+        self.process.start()
+        # Only the worker may hold its end, so its exit shows up as EOF
+        child.close()
+        self.future = None
+        self.started = None
+        self.tasks = 0
+
+    def stop(self):
+        """Ask the worker to exit once idle, without waiting for it"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """Process pool with per-task time limits, memory caps and worker recycling
+
+    timeout is in seconds per task, memory_limit in bytes per worker and
+    max_tasks_per_worker the number of tasks after which a worker is
+    replaced; None disables each.
+    """
+
+    def __init__(self, max_workers, timeout=None, memory_limit=None, max_tasks_per_worker=None,
+                 mp_context=None):
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.context = mp_context or multiprocessing.get_context()
+
+        self.lock = threading.Lock()
+        self.tasks = deque()
+        self.idle = []
+        self.busy = {}
+        self.retired = []
+        self.closing = False
+        # Written to whenever a worker becomes busy, so the supervisor
+        # starts watching it
+        self.wakeup_reader, self.wakeup_writer = self.context.Pipe(duplex=False)
+        self.supervisor = threading.Thread(target=self.supervise, name="worker-pool",
+                                           daemon=True)
+        self.supervisor.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        with self.lock:
+            if self.closing:
+                raise RuntimeError("cannot submit to a pool that has been shut down")
+            self.tasks.append((future, fn, args))
+            self.dispatch()
+        return future
+
+    def dispatch(self):
+        """Start queued tasks on idle or new workers; the lock must be held"""
+        while self.tasks:
+            if self.idle:
+                worker = self.idle.pop()
+            elif len(self.busy) < self.max_workers:
+                worker = Worker(self.context, self.memory_limit)
+            else:
+                return
+            future, fn, args = self.tasks.popleft()
+            if not future.set_running_or_notify_cancel():
+                self.idle.append(worker)
+                continue
+            try:
+                worker.conn.send((fn, args))
+            except OSError:
+                # The worker died while idle
+                worker.kill()
+                future.set_exception(WorkerDied("worker exited before the task was sent"))
+                continue
+            except Exception as e:
+                # Arguments that cannot be pickled never reach the pipe
+                self.idle.append(worker)
+                future.set_exception(e)
+                continue
+            worker.future = future
+            worker.started = time.monotonic()
+            self.busy[worker.conn] = worker
+            self.wakeup_writer.send_bytes(b"")
+
+    def supervise(self):
+        """Supervisor thread body: collect results and enforce time limits"""
+        while True:
+            with self.lock:
+                if self.closing and not self.busy and not self.tasks:
+                    break
+                connections = list(self.busy)
+                # Recycled workers are joined as soon as they exit, so
+                # retired stays short however long the batch runs
+                sentinels = [worker.process.sentinel for worker in self.retired]
+                delay = None
+                if self.timeout is not None and self.busy:
+                    deadline = min(worker.started for worker in self.busy.values()) + self.timeout
+                    delay = max(0.0, deadline - time.monotonic())
+
+            ready = wait(connections + sentinels + [self.wakeup_reader], delay)
+
+            with self.lock:
+                self.reap()
+                for conn in ready:
+                    if conn is self.wakeup_reader:
+                        while self.wakeup_reader.poll():
+                            self.wakeup_reader.recv_bytes()
+                    elif conn in self.busy:
+                        self.collect(self.busy.pop(conn))
+                if self.timeout is not None:
+                    now = time.monotonic()
+                    for conn, worker in list(self.busy.items()):
+                        if now - worker.started >= self.timeout:
+                            del self.busy[conn]
+                            worker.kill()
+                            worker.future.set_exception(
+                                TaskTimeout(f"no result after {self.timeout:g} seconds"))
+                self.dispatch()
+
+    def collect(self, worker):
+        """Pass a finished worker's result on and return it to service"""
+        try:
+            ok, value = worker.conn.recv()
+        except (EOFError, OSError):
+            worker.process.join()
+            worker.conn.close()
+            worker.future.set_exception(
+                WorkerDied(f"worker exited with code {worker.process.exitcode}"))
+            return
+        if ok:
+            worker.future.set_result(value)
+        else:
+            worker.future.set_exception(value)
+        worker.future = None
+        worker.tasks += 1
+        if self.max_tasks_per_worker and worker.tasks >= self.max_tasks_per_worker:
+            worker.stop()
+            self.retired.append(worker)
+        else:
+            self.idle.append(worker)
+
+    def reap(self):
+        """Join the retired workers that have exited; the lock must be held"""
+        running = []
+        for worker in self.retired:
+            if worker.process.exitcode is None:
+                running.append(worker)
+            else:
+                worker.process.join()
+        self.retired = running
+
+    def terminate(self):
+        """Cancel queued tasks, kill the workers running tasks and shut down
+
+        The futures of the killed tasks fail with WorkerDied.
+        """
+        with self.lock:
+            self.closing = True
+            while self.tasks:
+                self.tasks.popleft()[0].cancel()
+            # The supervisor sees each killed worker's pipe close and
+            # fails its future, so shutdown() returns without waiting
+            for worker in self.busy.values():
+                worker.process.kill()
+        self.shutdown()
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """Stop accepting tasks, let running ones finish and stop the workers"""
+        with self.lock:
+            self.closing = True
+            if cancel_futures:
+                while self.tasks:
+                    self.tasks.popleft()[0].cancel()
+            self.wakeup_writer.send_bytes(b"")
+        if not wait:
+            return
+        self.supervisor.join()
+        for worker in self.idle:
+            worker.stop()
+        for worker in self.idle + self.retired:
+            worker.process.join()
+        self.idle = []
+        self.retired = []
+        self.wakeup_reader.close()
+        self.wakeup_writer.close()
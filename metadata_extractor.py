@@ -1,12 +1,197 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import os
-from PIL import Image, TiffTags
-import pandas as pd
-import re
-import PyPDF2
-from PyPDF2 import PdfReader
-import io
+import queue
+import threading
+import time
+from array import array
+from collections import Counter
+
+from extractor import ExtractOptions, display_columns, export_columns, iter_extract, timing
+from extractor.crawl import iter_files
+from extractor.export import RowWriter
+from extractor.store import ResultStore
+
+# Maximum number of queued worker messages handled per UI refresh
+DRAIN_BATCH_SIZE = 500
+DRAIN_INTERVAL_MS = 100
+
+# A file still being parsed after this many seconds is reported as Timeout,
+# and worker processes are replaced after this many files
+FILE_TIMEOUT_SECONDS = 300
+MAX_FILES_PER_WORKER = 1000
+
+# Set EXTRACTOR_PROFILE to a file name to time every stage; the stage
+# percentiles are printed and a Chrome trace written after each extraction
+PROFILE_TRACE = os.environ.get("EXTRACTOR_PROFILE")
+
+
+def sort_key(value):
+    """Order numbers numerically and everything else as text"""
+    if isinstance(value, (int, float)):
+        return (0, value, "")
+    return (1, 0, str(value))
+
+
+class VirtualTable:
+    """Treeview that only materializes the rows currently on screen
+    
+    Rows live in a ResultStore and are read back only for the visible
+    lines; the Treeview holds one item per visible line and those items are
+    rewritten as the view scrolls, so inserting, clearing and scrolling cost
+    the same for ten rows or a million.
+    """
+    
+    def __init__(self, parent, columns):
+        self.tree = ttk.Treeview(parent, show="headings", selectmode="none")
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.yview)
+        
+        self.rows = []
+        self.order = None
+        self.sort_column = None
+        self.sort_reverse = False
+        self.offset = 0
+        self.visible = 0
+        self.refresh_pending = False
+        
+        style = ttk.Style()
+        self.row_height = int(style.lookup("Treeview", "rowheight") or 20)
+        
+        self.tree.bind("<Configure>", self.on_resize)
+        for widget in (self.tree, self.scrollbar):
+            widget.bind("<MouseWheel>", self.on_mousewheel)
+            widget.bind("<Button-4>", lambda event: self.scroll(-3))
+            widget.bind("<Button-5>", lambda event: self.scroll(3))
+        self.tree.bind("<Up>", lambda event: self.scroll(-1))
+        self.tree.bind("<Down>", lambda event: self.scroll(1))
+        self.tree.bind("<Prior>", lambda event: self.scroll(-self.visible))
+        self.tree.bind("<Next>", lambda event: self.scroll(self.visible))
+        self.tree.bind("<Home>", lambda event: self.scroll_to(0))
+        self.tree.bind("<End>", lambda event: self.scroll_to(len(self.rows)))
+        
+        self.set_columns(columns)
+    
+    def grid(self, row, column, columnspan):
+        self.tree.grid(row=row, column=column, columnspan=columnspan,
+                       sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.scrollbar.grid(row=row, column=column + columnspan, sticky=(tk.N, tk.S))
+    
+    def set_columns(self, columns):
+        self.columns = columns
+        self.tree.config(columns=columns)
+        for col in columns:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=100)
+        
+        # Adjust specific column widths
+        self.tree.column("Filename", width=200)
+        self.tree.column("Color Depth", width=120)
+        self.tree.column("Filename Valid", width=100)
+        if "Page" in columns:
+            self.tree.column("Page", width=50)
+        self.refresh()
+    
+    def set_rows(self, rows):
+        """Show a new row sequence; the old one is simply dropped"""
+        self.rows = rows
+        self.order = None
+        self.sort_column = None
+        self.offset = 0
+        self.update_headings()
+        self.refresh()
+    
+    def rows_added(self, count):
+        """Tell the table that count rows were appended to its sequence"""
+        if self.order is not None:
+            # Rows arriving after a sort are listed after the sorted block
+            total = len(self.rows)
+            self.order.extend(range(total - count, total))
+        self.schedule_refresh()
+    
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        
+        keys = self.rows.sort_keys(column, sort_key)
+        indices = sorted(range(len(keys)), key=keys.__getitem__, reverse=self.sort_reverse)
+        self.order = array("L", indices)
+        self.update_headings()
+        self.refresh()
+    
+    def update_headings(self):
+        for col in self.columns:
+            text = col
+            if col == self.sort_column:
+                text += " \u25bc" if self.sort_reverse else " \u25b2"
+            self.tree.heading(col, text=text)
+    
+    def on_resize(self, event):
+        # Leave room for the heading row
+        visible = max(1, (event.height - self.row_height - 4) // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+    
+    def on_mousewheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+    
+    def scroll(self, lines):
+        self.scroll_to(self.offset + lines)
+    
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, len(self.rows) - self.visible))
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+    
+    def yview(self, *args):
+        """Scrollbar callback: ("moveto", fraction) or ("scroll", n, what)"""
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.rows)))
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.scroll(int(args[1]) * step)
+    
+    def schedule_refresh(self):
+        # Coalesce bursts of appended rows into a single redraw
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.tree.after_idle(self.refresh)
+    
+    def refresh(self):
+        with timing.stage("gui.table"):
+            self.redraw()
+    
+    def redraw(self):
+        self.refresh_pending = False
+        total = len(self.rows)
+        items = self.tree.get_children()
+        
+        # Keep exactly one Treeview item per visible line
+        if len(items) > self.visible:
+            self.tree.delete(*items[self.visible:])
+            items = items[:self.visible]
+        elif len(items) < self.visible:
+            items = items + tuple(self.tree.insert("", "end")
+                                  for _ in range(self.visible - len(items)))
+        
+        for line, item in enumerate(items):
+            position = self.offset + line
+            if position < total:
+                index = self.order[position] if self.order is not None else position
+                row = self.rows[index]
+                self.tree.item(item, values=tuple(row[col] for col in self.columns))
+            else:
+                self.tree.item(item, values=())
+        
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
 
 class MetadataExtractor:
     def __init__(self, root):
@@ -15,6 +200,8 @@ class MetadataExtractor:
         self.root.geometry("1200x700")
         
         self.files = []
+        # A folder to search recursively instead of a list of files
+        self.folder = None
         
         # Create main frame
         main_frame = ttk.Frame(root, padding="10")
@@ -44,85 +231,93 @@ class MetadataExtractor:
                                    variable=self.file_type, value="pdf")
         pdf_radio.grid(row=0, column=1, padx=10)
         
-        # Select files button
-        select_btn = ttk.Button(main_frame, text="Select Files", 
+        # Mixed batches: each file goes to the right reader by its content
+        auto_radio = ttk.Radiobutton(file_type_frame, text="Both (auto-detect)",
+                                     variable=self.file_type, value="auto")
+        auto_radio.grid(row=0, column=2, padx=10)
+        
+        # Worker process count
+        ttk.Label(file_type_frame, text="Workers:").grid(row=0, column=3, padx=(30, 5))
+        self.workers = tk.IntVar(value=os.cpu_count() or 1)
+        workers_spin = ttk.Spinbox(file_type_frame, from_=1, to=256, width=5,
+                                   textvariable=self.workers)
+        workers_spin.grid(row=0, column=4)
+        
+        # Pixel content analysis adds columns and decodes every page image
+        self.analyze = tk.BooleanVar(value=False)
+        analyze_check = ttk.Checkbutton(file_type_frame, text="Analyze content",
+                                        variable=self.analyze)
+        analyze_check.grid(row=0, column=5, padx=(30, 0))
+        
+        # Select files and select folder buttons
+        select_frame = ttk.Frame(main_frame)
+        select_frame.grid(row=2, column=0, pady=(0, 10), sticky=tk.W)
+        self.select_btn = ttk.Button(select_frame, text="Select Files", 
                                command=self.select_files)
-        select_btn.grid(row=2, column=0, pady=(0, 10), sticky=tk.W)
+        self.select_btn.grid(row=0, column=0)
+        self.folder_btn = ttk.Button(select_frame, text="Select Folder",
+                                     command=self.select_folder)
+        self.folder_btn.grid(row=0, column=1, padx=(5, 0))
         
         # Extract button
-        extract_btn = ttk.Button(main_frame, text="Extract Metadata", 
+        self.extract_btn = ttk.Button(main_frame, text="Extract Metadata", 
                                 command=self.extract_metadata)
-        extract_btn.grid(row=2, column=1, pady=(0, 10), sticky=tk.W)
+        self.extract_btn.grid(row=2, column=1, pady=(0, 10), sticky=tk.W)
         
         # Export button
-        export_btn = ttk.Button(main_frame, text="Export to Excel", 
+        self.export_btn = ttk.Button(main_frame, text="Export to Excel", 
                                command=self.export_to_excel)
-        export_btn.grid(row=2, column=2, pady=(0, 10), sticky=tk.E)
+        self.export_btn.grid(row=2, column=2, pady=(0, 10), sticky=tk.E)
         
         # Progress bar
-        self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
-        self.progress.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
-        
-        # Treeview for results
-        if self.file_type.get() == "tiff":
-            columns = ("Filename", "Format", "Extension", "DPI", "Compression", "Color Depth", "Filename Valid")
-        else:
-            columns = ("Filename", "Page", "Type", "Color Depth", "DPI", "Compression", "Filename Valid")
-            
-        self.tree = ttk.Treeview(main_frame, columns=columns, show="headings")
-        
-        # Set column headings
-        for col in columns:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=100)
+        self.progress = ttk.Progressbar(main_frame, mode='determinate')
+        self.progress.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
         
-        # Adjust specific column widths
-        self.tree.column("Filename", width=200)
-        self.tree.column("Color Depth", width=120)
-        self.tree.column("Filename Valid", width=100)
-        if "Page" in columns:
-            self.tree.column("Page", width=50)
+        # Cancel button
+        self.cancel_btn = ttk.Button(main_frame, text="Cancel",
+                                     command=self.cancel_extraction, state=tk.DISABLED)
+        self.cancel_btn.grid(row=3, column=2, padx=(10, 0), pady=(0, 10), sticky=tk.E)
         
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        # Controls disabled while an extraction is running
+        self.run_controls = [tiff_radio, pdf_radio, auto_radio, workers_spin, analyze_check,
+                             self.select_btn, self.folder_btn, self.extract_btn, self.export_btn]
         
-        self.tree.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar.grid(row=4, column=3, sticky=(tk.N, tk.S))
+        # Results table; rows are drawn on demand from self.results
+        self.table = VirtualTable(main_frame, display_columns(self.file_type.get(),
+                                                              self.extract_options()))
+        self.table.grid(row=4, column=0, columnspan=3)
         
         # Status label
         self.status_label = ttk.Label(main_frame, text="Ready")
         self.status_label.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E))
         
-        # Data storage
-        self.metadata_list = []
+        # Every extracted row, including failed files (which are not exported)
+        self.results = ResultStore(export_columns(self.file_type.get(), self.extract_options()))
+        self.table.set_rows(self.results)
+        
+        # Background extraction state
+        self.worker_thread = None
+        self.profile = None
+        timing.enabled = bool(PROFILE_TRACE)
+        self.result_queue = queue.Queue()
+        self.cancel_event = threading.Event()
         
         # Update treeview when file type changes
         self.file_type.trace('w', self.update_columns)
+        self.analyze.trace('w', self.update_columns)
+    
+    def extract_options(self, profile=False):
+        """Build the extraction options from the current settings"""
+        return ExtractOptions(profile=profile, analyze=self.analyze.get())
     
     def update_columns(self, *args):
-        # Clear the treeview
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        # Update columns based on file type
-        if self.file_type.get() == "tiff":
-            columns = ("Filename", "Format", "Extension", "DPI", "Compression", "Color Depth", "Filename Valid")
-        else:
-            columns = ("Filename", "Page", "Type", "Color Depth", "DPI", "Compression", "Filename Valid")
-        
-        # Reconfigure treeview
-        self.tree.config(columns=columns)
-        for col in columns:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=100)
-        
-        # Adjust specific column widths
-        self.tree.column("Filename", width=200)
-        self.tree.column("Color Depth", width=120)
-        self.tree.column("Filename Valid", width=100)
-        if "Page" in columns:
-            self.tree.column("Page", width=50)
+        self.clear_results()
+        self.table.set_columns(display_columns(self.file_type.get(), self.extract_options()))
+    
+    def clear_results(self):
+        # Dropping the store is O(1); the table only redraws visible lines
+        self.results = ResultStore(export_columns(self.file_type.get(), self.extract_options()))
+        self.table.set_rows(self.results)
     
     def select_files(self):
         if self.file_type.get() == "tiff":
@@ -130,11 +325,16 @@ class MetadataExtractor:
                 ('TIFF files', '*.tif *.tiff'),
                 ('All files', '*.*')
             )
-        else:
+        elif self.file_type.get() == "pdf":
             filetypes = (
                 ('PDF files', '*.pdf'),
                 ('All files', '*.*')
             )
+        else:
+            filetypes = (
+                ('TIFF and PDF files', '*.tif *.tiff *.pdf'),
+                ('All files', '*.*')
+            )
         
         filenames = filedialog.askopenfilenames(
             title='Open files',
@@ -144,515 +344,197 @@ class MetadataExtractor:
         
         if filenames:
             self.files = list(filenames)
+            self.folder = None
             self.status_label.config(text=f"Selected {len(self.files)} files")
             
             # Clear previous results
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-                
-            self.metadata_list = []
+            self.clear_results()
+    
+    def select_folder(self):
+        folder = filedialog.askdirectory(title='Open folder', mustexist=True)
+        if folder:
+            # The folder is searched while extraction runs, not up front
+            self.files = []
+            self.folder = folder
+            self.status_label.config(text=f"Selected folder {folder}")
+            self.clear_results()
     
     def extract_metadata(self):
-        if not self.files:
+        if not self.files and self.folder is None:
             messagebox.showwarning("Warning", "Please select files first")
             return
         
-        self.progress.start()
-        self.status_label.config(text="Extracting metadata...")
-        self.root.update()
+        if self.worker_thread is not None:
+            return
+        
+        try:
+            workers = max(1, int(self.workers.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showwarning("Warning", "Workers must be a whole number")
+            return
         
         # Clear previous results
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        self.metadata_list = []
+        self.clear_results()
         
-        if self.file_type.get() == "tiff":
-            self.extract_tiff_metadata()
+        # Folder contents are discovered by the worker thread as it goes
+        self.discovered = Counter()
+        if self.folder is not None:
+            files = iter_files([self.folder], self.file_type.get(), counts=self.discovered)
+            self.scanning = True
         else:
-            self.extract_pdf_metadata()
+            files = list(self.files)
+            self.discovered["files"] = len(files)
+            self.scanning = False
         
-        self.progress.stop()
-        self.status_label.config(text=f"Extracted metadata from {len(self.metadata_list)} items")
-    
-    def extract_tiff_metadata(self):
-        for file_path in self.files:
-            try:
-                metadata = self.get_tiff_metadata(file_path)
-                self.metadata_list.append(metadata)
-                
-                # Add to treeview
-                self.tree.insert("", "end", values=(
-                    metadata["Filename"],
-                    metadata["Format"],
-                    metadata["Extension"],
-                    metadata["DPI"],
-                    metadata["Compression"],
-                    metadata["Color Depth"],
-                    metadata["Filename Valid"]
-                ))
-                
-            except Exception as e:
-                self.tree.insert("", "end", values=(
-                    os.path.basename(file_path),
-                    "Error",
-                    "Error",
-                    "Error",
-                    "Error",
-                    "Error",
-                    "Error"
-                ))
-                print(f"Error processing {file_path}: {str(e)}")
+        self.progress.config(maximum=max(1, self.discovered["files"]), value=0)
+        self.status_label.config(text="Extracting metadata...")
+        self.set_running(True)
+        
+        # Run extraction off the UI thread; results come back through the queue
+        self.cancel_event = threading.Event()
+        self.result_queue = queue.Queue()
+        self.files_done = 0
+        self.started_at = time.monotonic()
+        if PROFILE_TRACE:
+            timing.take_spans()
+            self.profile = timing.Profile(keep_spans=True)
+        self.worker_thread = threading.Thread(
+            target=self.run_extraction,
+            args=(files, self.file_type.get(), workers,
+                  self.extract_options(profile=self.profile is not None),
+                  self.result_queue, self.cancel_event, self.profile),
+            daemon=True)
+        self.worker_thread.start()
+        self.root.after(DRAIN_INTERVAL_MS, self.drain_results)
     
-    def extract_pdf_metadata(self):
-        for file_path in self.files:
-            try:
-                metadata_list = self.get_pdf_metadata(file_path)
-                for metadata in metadata_list:
-                    self.metadata_list.append(metadata)
-                    
-                    # Add to treeview
-                    self.tree.insert("", "end", values=(
-                        metadata["Filename"],
-                        metadata["Page"],
-                        metadata["Type"],
-                        metadata["Color Depth"],
-                        metadata["DPI"],
-                        metadata["Compression"],
-                        metadata["Filename Valid"]
-                    ))
-                
-            except Exception as e:
-                self.tree.insert("", "end", values=(
-                    os.path.basename(file_path),
-                    "Error",
-                    "Error",
-                    "Error",
-                    "Error",
-                    "Error",
-                    "Error"
-                ))
-                print(f"Error processing {file_path}: {str(e)}")
+    def run_extraction(self, files, file_type, workers, options, result_queue, cancel_event,
+                       profile):
+        """Worker thread body: extract files and post results to the UI queue"""
+        try:
+            for _, rows in iter_extract(self.track_scanning(files), file_type, workers=workers,
+                                        ordered=True, cancel=cancel_event, options=options,
+                                        profile=profile, timeout=FILE_TIMEOUT_SECONDS,
+                                        max_files_per_worker=MAX_FILES_PER_WORKER):
+                result_queue.put(("rows", rows))
+            result_queue.put(("done", None))
+        except Exception as e:
+            result_queue.put(("failed", str(e)))
     
-    def get_tiff_metadata(self, file_path):
-        filename = os.path.basename(file_path)
-        
-        # Check filename convention
-        filename_valid = self.check_tiff_filename_convention(filename)
-        
-        with Image.open(file_path) as img:
-            # Get basic info
-            img_format = img.format or "Unknown"
-            extension = os.path.splitext(file_path)[1].lower()
-            
-            # Get DPI - extract exact values
-            dpi_x, dpi_y = img.info.get('dpi', (0, 0))
-            if dpi_x and dpi_y:
-                dpi = f"{dpi_x} x {dpi_y}"
-            else:
-                # Try to get resolution from EXIF data
-                dpi = self.get_tiff_resolution(img)
-            
-            # Get compression - extract exact value
-            compression = self.get_tiff_compression(img)
-            
-            # Get color depth - extract exact value
-            color_depth = self.get_tiff_color_depth(img)
-        
-        return {
-            "File Type": "TIFF",
-            "Filename": filename,
-            "Format": img_format,
-            "Extension": extension,
-            "DPI": dpi,
-            "Compression": compression,
-            "Color Depth": color_depth,
-            "Filename Valid": filename_valid,
-            "Full Path": file_path
-        }
+    def track_scanning(self, files):
+        """Pass files through, noting when folder discovery has finished"""
+        yield from files
+        self.scanning = False
     
-    def get_tiff_resolution(self, img):
-        """Extract exact resolution from TIFF metadata"""
-        try:
-            # Try to get resolution from EXIF data
-            if hasattr(img, '_getexif') and img._getexif():
-                exif_data = img._getexif()
-                # XResolution tag (282)
-                x_res = exif_data.get(282, (1, 1)) if exif_data else (1, 1)
-                # YResolution tag (283)
-                y_res = exif_data.get(283, (1, 1)) if exif_data else (1, 1)
+    def drain_results(self):
+        """Move queued results into the table in batches, then reschedule"""
+        added = 0
+        finished = None
+        with timing.stage("gui.drain"):
+            for _ in range(DRAIN_BATCH_SIZE):
+                try:
+                    kind, payload = self.result_queue.get_nowait()
+                except queue.Empty:
+                    break
                 
-                if isinstance(x_res, tuple) and isinstance(y_res, tuple):
-                    x_dpi = round(x_res[0] / x_res[1]) if x_res[1] != 0 else 0
-                    y_dpi = round(y_res[0] / y_res[1]) if y_res[1] != 0 else 0
-                    if x_dpi and y_dpi:
-                        return f"{x_dpi} x {y_dpi}"
-            
-            # Try to get resolution from tag data
-            if hasattr(img, 'tag'):
-                tags = img.tag_v2
-                # XResolution tag (282)
-                if 282 in tags:
-                    x_res = tags[282]
-                    if isinstance(x_res, tuple) and len(x_res) == 2:
-                        x_dpi = round(x_res[0] / x_res[1]) if x_res[1] != 0 else 0
-                    else:
-                        x_dpi = x_res if isinstance(x_res, (int, float)) else 0
-                else:
-                    x_dpi = 0
+                if kind != "rows":
+                    finished = (kind, payload)
+                    break
                 
-                # YResolution tag (283)
-                if 283 in tags:
-                    y_res = tags[283]
-                    if isinstance(y_res, tuple) and len(y_res) == 2:
-                        y_dpi = round(y_res[0] / y_res[1]) if y_res[1] != 0 else 0
-                    else:
-                        y_dpi = y_res if isinstance(y_res, (int, float)) else 0
-                else:
-                    y_dpi = 0
-                
-                if x_dpi and y_dpi:
-                    return f"{x_dpi} x {y_dpi}"
-            
-            return "Not specified"
-        except:
-            return "Not specified"
-    
-    def get_tiff_compression(self, img):
-        """Extract exact compression from TIFF metadata"""
-        try:
-            compression = "Unknown"
-            if hasattr(img, 'tag'):
-                tags = img.tag_v2
-                if 259 in tags:  # Compression tag
-                    compression_code = tags[259]
-                    compression_names = {
-                        1: "Uncompressed",
-                        2: "CCITT 1D",
-                        3: "Group 3 Fax",
-                        4: "Group 4 Fax",
-                        5: "LZW",
-                        6: "JPEG",
-                        7: "PackBits",
-                        8: "Deflate",
-                        32773: "PackBits",
-                        32946: "Deflate"
-                    }
-                    compression = compression_names.get(compression_code, f"Unknown ({compression_code})")
-            return compression
-        except:
-            return "Unknown"
-    
-    def get_tiff_color_depth(self, img):
-        """Extract exact color depth from TIFF metadata"""
-        try:
-            # Get bits per sample from metadata
-            bits_per_sample = 0
-            if hasattr(img, 'tag'):
-                tags = img.tag_v2
-                if 258 in tags:  # BitsPerSample tag
-                    bits_data = tags[258]
-                    if isinstance(bits_data, (list, tuple)):
-                        bits_per_sample = bits_data[0] if bits_data else 0
-                    else:
-                        bits_per_sample = bits_data
-            
-            # Get samples per pixel from metadata
-            samples_per_pixel = 1
-            if hasattr(img, 'tag'):
-                tags = img.tag_v2
-                if 277 in tags:  # SamplesPerPixel tag
-                    samples_data = tags[277]
-                    if isinstance(samples_data, (list, tuple)):
-                        samples_per_pixel = samples_data[0] if samples_data else 1
-                    else:
-                        samples_per_pixel = samples_data
-            
-            # Calculate total color depth
-            total_bits = bits_per_sample * samples_per_pixel
-            
-            # Get color mode for additional info
-            color_mode = img.mode
-            
-            if total_bits > 0:
-                if color_mode == '1':
-                    return "1-bit (Bilevel)"
-                elif color_mode in ['L', 'P']:
-                    return f"{total_bits}-bit Grayscale"
-                elif color_mode == 'RGB':
-                    return f"{total_bits}-bit Color"
-                elif color_mode == 'RGBA':
-                    return f"{total_bits}-bit Color with Alpha"
-                elif color_mode == 'CMYK':
-                    return f"{total_bits}-bit CMYK"
-                else:
-                    return f"{total_bits}-bit ({color_mode})"
-            else:
-                # Fallback to mode-based detection
-                if color_mode == '1':
-                    return "1-bit (Bilevel)"
-                elif color_mode in ['L', 'P']:
-                    return "8-bit Grayscale"
-                elif color_mode == 'RGB':
-                    return "24-bit Color"
-                elif color_mode == 'RGBA':
-                    return "32-bit Color with Alpha"
-                elif color_mode == 'CMYK':
-                    return "32-bit CMYK"
-                else:
-                    return f"Unknown ({color_mode})"
-                    
-        except:
-            return "Unknown"
-    
-    def get_pdf_metadata(self, file_path):
-        filename = os.path.basename(file_path)
+                self.results.add_rows(payload)
+                added += len(payload)
+                self.files_done += 1
         
-        # Check filename convention
-        filename_valid = self.check_pdf_filename_convention(filename)
+        if added:
+            self.table.rows_added(added)
+        self.progress.config(maximum=max(1, self.discovered["files"]), value=self.files_done)
         
-        metadata_list = []
+        if finished is None:
+            self.status_label.config(text=self.progress_text())
+            self.root.after(DRAIN_INTERVAL_MS, self.drain_results)
+            return
         
-        with open(file_path, 'rb') as file:
-            pdf_reader = PdfReader(file)
-            num_pages = len(pdf_reader.pages)
-            
-            for page_num in range(num_pages):
-                page = pdf_reader.pages[page_num]
-                
-                # Extract page metadata
-                page_type = "PDF"
-                color_depth = "Unknown"
-                dpi = "Unknown"
-                compression = "Unknown"
-                
-                # Check if page contains images
-                if '/XObject' in page['/Resources']:
-                    x_object = page['/Resources']['/XObject'].get_object()
-                    for obj in x_object:
-                        if x_object[obj]['/Subtype'] == '/Image':
-                            page_type = "PDF Image"
-                            img = x_object[obj]
-                            
-                            # Extract color depth information
-                            color_depth = self.get_pdf_color_depth(img)
-                            
-                            # Extract DPI information
-                            dpi = self.get_pdf_dpi_info(img, page)
-                            
-                            # Extract compression information
-                            compression = self.get_pdf_compression_info(img)
-                            
-                            break  # Only analyze the first image on the page
-                
-                metadata_list.append({
-                    "File Type": "PDF",
-                    "Filename": filename,
-                    "Page": page_num + 1,
-                    "Type": page_type,
-                    "Color Depth": color_depth,
-                    "DPI": dpi,
-                    "Compression": compression,
-                    "Filename Valid": filename_valid,
-                    "Full Path": file_path
-                })
-        
-        return metadata_list
-    
-    def get_pdf_color_depth(self, img):
-        """Extract exact color depth information from PDF image"""
-        try:
-            color_depth = "Unknown"
-            
-            # Get color space information
-            color_space = "Unknown"
-            if '/ColorSpace' in img:
-                color_space_obj = img['/ColorSpace']
-                if isinstance(color_space_obj, PyPDF2.generic.NameObject):
-                    color_space = str(color_space_obj)
-                elif isinstance(color_space_obj, PyPDF2.generic.ArrayObject) and len(color_space_obj) > 0:
-                    color_space = str(color_space_obj[0])
-            
-            # Get bits per component
-            bits_per_component = 0
-            if '/BitsPerComponent' in img:
-                bits_per_component = img['/BitsPerComponent']
-            
-            # Get number of color components
-            num_components = self.get_pdf_color_components(color_space)
-            
-            # Calculate total bits (color depth)
-            if bits_per_component and num_components:
-                total_bits = bits_per_component * num_components
-                color_depth = f"{total_bits}-bit"
-                
-                # Add color space information
-                if color_space == '/DeviceRGB':
-                    color_depth += " RGB"
-                elif color_space == '/DeviceGray':
-                    color_depth += " Grayscale"
-                elif color_space == '/DeviceCMYK':
-                    color_depth += " CMYK"
-                elif color_space == '/Indexed':
-                    color_depth += " Indexed"
-                else:
-                    color_depth += f" ({color_space})"
-            
-            # If we can't calculate total bits, provide component information
-            elif bits_per_component:
-                color_depth = f"{bits_per_component}-bit/component"
-                if color_space == '/DeviceRGB':
-                    color_depth += " RGB"
-                elif color_space == '/DeviceGray':
-                    color_depth += " Grayscale"
-                elif color_space == '/DeviceCMYK':
-                    color_depth += " CMYK"
-                else:
-                    color_depth += f" ({color_space})"
-            
-            # If no bits per component, just return color space
-            elif color_space != "Unknown":
-                color_depth = color_space.replace('/', '')
-            
-            return color_depth
-        except Exception as e:
-            print(f"Error extracting color depth: {str(e)}")
-            return "Unknown"
-    
-    def get_pdf_color_components(self, color_space):
-        """Get number of color components based on color space"""
-        if color_space == '/DeviceRGB':
-            return 3
-        elif color_space == '/DeviceGray':
-            return 1
-        elif color_space == '/DeviceCMYK':
-            return 4
-        elif color_space == '/Indexed':
-            return 1  # Indexed color typically uses 1 component
+        self.worker_thread = None
+        self.set_running(False)
+        self.report_profile()
+        kind, payload = finished
+        if kind == "failed":
+            self.status_label.config(text="Extraction failed")
+            messagebox.showerror("Error", f"Extraction failed: {payload}")
+        elif self.cancel_event.is_set():
+            self.status_label.config(
+                text=f"Cancelled after {self.files_done} of {self.discovered['files']} files "
+                     f"({self.exportable_rows()} items)")
         else:
-            return 0  # Unknown color space
+            self.status_label.config(text=f"Extracted metadata from {self.exportable_rows()} items")
     
-    def get_pdf_dpi_info(self, img, page):
-        """Extract exact DPI information from PDF image"""
+    def report_profile(self):
+        """Print the stage timings of the last extraction and save its trace
+        
+        Called again after an export, so the export appears in both.
+        """
+        if self.profile is None or self.worker_thread is not None:
+            return
+        self.profile.add(timing.take_spans())
+        print(self.profile.format_summary())
         try:
-            dpi = "Unknown"
-            
-            # Check if image has width and height
-            if '/Width' in img and '/Height' in img:
-                width = img['/Width']
-                height = img['/Height']
-                
-                # Check if image has explicit dimensions
-                if '/BBox' in img:
-                    bbox = img['/BBox']
-                    if bbox and len(bbox) == 4:
-                        img_width_pt = abs(bbox[2] - bbox[0])
-                        img_height_pt = abs(bbox[3] - bbox[1])
-                        
-                        if img_width_pt > 0 and img_height_pt > 0:
-                            dpi_x = round(width / (img_width_pt / 72))
-                            dpi_y = round(height / (img_height_pt / 72))
-                            dpi = f"{dpi_x} x {dpi_y}"
-                
-                # If no explicit dimensions, try to use page dimensions
-                if dpi == "Unknown" and '/MediaBox' in page:
-                    media_box = page['/MediaBox']
-                    page_width_pt = abs(media_box[2] - media_box[0])
-                    page_height_pt = abs(media_box[3] - media_box[1])
-                    
-                    # Assume image takes up most of the page
-                    if page_width_pt > 0 and page_height_pt > 0:
-                        dpi_x = round(width / (page_width_pt / 72))
-                        dpi_y = round(height / (page_height_pt / 72))
-                        dpi = f"{dpi_x} x {dpi_y}"
-            
-            return dpi
-        except:
-            return "Unknown"
+            self.profile.write_trace(PROFILE_TRACE)
+        except OSError as e:
+            print(f"Cannot write trace {PROFILE_TRACE}: {e}")
     
-    def get_pdf_compression_info(self, img):
-        """Extract exact compression information from PDF image"""
-        try:
-            compression = "Unknown"
-            if '/Filter' in img:
-                filters = img['/Filter']
-                if isinstance(filters, PyPDF2.generic.ArrayObject):
-                    filter_list = [str(f) for f in filters]
-                    compression = ", ".join(filter_list)
-                else:
-                    compression = str(filters)
-                
-                # Make compression names more readable
-                compression = compression.replace('/FlateDecode', 'Flate')
-                compression = compression.replace('/DCTDecode', 'JPEG')
-                compression = compression.replace('/JPXDecode', 'JPEG2000')
-                compression = compression.replace('/CCITTFaxDecode', 'CCITT')
-                compression = compression.replace('/LZWDecode', 'LZW')
-                compression = compression.replace('/ASCIIHexDecode', 'ASCIIHex')
-                compression = compression.replace('/ASCII85Decode', 'ASCII85')
-                compression = compression.replace('/RunLengthDecode', 'RunLength')
-            
-            return compression
-        except:
-            return "Unknown"
+    def exportable_rows(self):
+        return len(self.results) - self.results.error_rows
+    
+    def progress_text(self):
+        """Describe files done, throughput and estimated time remaining"""
+        total = self.discovered["files"]
+        elapsed = time.monotonic() - self.started_at
+        rate = self.files_done / elapsed if elapsed > 0 else 0
+        text = f"Processed {self.files_done} of {total} files"
+        if self.scanning:
+            # The total is still growing, so no ETA yet
+            text += " found so far"
+            if rate > 0:
+                text += f" - {rate:.1f} files/s"
+        elif rate > 0:
+            remaining = int((total - self.files_done) / rate)
+            minutes, seconds = divmod(remaining, 60)
+            text += f" - {rate:.1f} files/s - ETA {minutes}:{seconds:02d}"
+        return text
     
-    def check_tiff_filename_convention(self, filename):
-        # Check if filename matches ISBN13_#####.tif pattern
-        pattern = r'^\d{13}_\d{5}\.tif$'
-        if re.match(pattern, filename.lower()):
-            return "Yes"
-        
-        # Check if it's close but has different extension
-        pattern_close = r'^\d{13}_\d{5}\.'
-        if re.match(pattern_close, filename.lower()):
-            return "Wrong extension"
-        
-        return "No"
+    def cancel_extraction(self):
+        if self.worker_thread is not None:
+            self.cancel_event.set()
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.status_label.config(text="Cancelling...")
     
-    def check_pdf_filename_convention(self, filename):
-        # Check if filename matches ISBN13.pdf pattern
-        pattern = r'^\d{13}\.pdf$'
-        if re.match(pattern, filename.lower()):
-            return "Yes"
-        
-        # Check if it's close but has different extension
-        pattern_close = r'^\d{13}\.'
-        if re.match(pattern_close, filename.lower()):
-            return "Wrong extension"
-        
-        return "No"
+    def set_running(self, running):
+        """Toggle controls between the idle and extracting states"""
+        state = tk.DISABLED if running else tk.NORMAL
+        for widget in self.run_controls:
+            widget.config(state=state)
+        self.cancel_btn.config(state=tk.NORMAL if running else tk.DISABLED)
     
     def export_to_excel(self):
-        if not self.metadata_list:
+        if not self.exportable_rows():
             messagebox.showwarning("Warning", "No metadata to export. Please extract metadata first.")
             return
         
         file_path = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")]
+            filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv"),
+                       ("JSON Lines files", "*.jsonl"), ("Parquet files", "*.parquet"),
+                       ("All files", "*.*")]
         )
         
         if not file_path:
             return
         
         try:
-            # Create DataFrame
-            df = pd.DataFrame(self.metadata_list)
-            
-            # Reorder columns based on file type
-            if self.file_type.get() == "tiff":
-                columns = ["File Type", "Filename", "Format", "Extension", "DPI", "Compression", 
-                          "Color Depth", "Filename Valid", "Full Path"]
-            else:
-                columns = ["File Type", "Filename", "Page", "Type", "Color Depth", "DPI", 
-                          "Compression", "Filename Valid", "Full Path"]
-            
-            # Only include columns that exist in the DataFrame
-            columns = [col for col in columns if col in df.columns]
-            df = df[columns]
-            
             # Export to Excel
-            df.to_excel(file_path, index=False)
+            writer = RowWriter(file_path, self.file_type.get(), self.extract_options())
+            with timing.stage("export.write"), writer:
+                writer.write_rows(self.results.iter_rows(include_errors=False))
+            self.report_profile()
             
             self.status_label.config(text=f"Exported to {os.path.basename(file_path)}")
             messagebox.showinfo("Success", f"Metadata exported to {file_path}")
@@ -0,0 +1,23 @@
+"""Shared fixtures: a small synthetic corpus built once per test session."""
+
+import pytest
+
+from extractor.synthetic import make_corpus
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory):
+    """Directory holding tiff/ and pdf/ subdirectories of generated files"""
+    directory = tmp_path_factory.mktemp("corpus")
+    make_corpus(str(directory), tiff_count=40, pdf_count=12, seed=7)
+    return directory
+
+
+@pytest.fixture(scope="session")
+def tiff_files(corpus):
+    return sorted(str(path) for path in (corpus / "tiff").iterdir())
+
+
+@pytest.fixture(scope="session")
+def pdf_files(corpus):
+    return sorted(str(path) for path in (corpus / "pdf").iterdir())
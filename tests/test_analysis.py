@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from extractor import ANALYSIS_COLUMNS, ExtractOptions, extract_file
+from extractor.analysis import analyze_chunks, analyze_image, analyze_pixels
+
+
+def test_blank_white_page():
+    result = analyze_pixels(np.full((200, 100), 255, dtype=np.uint8))
+    assert result == {"Effective Color": "Bilevel", "Unique Colors": 1, "Blank": "Yes"}
+
+
+def test_grayscale_saved_as_rgb_is_grayscale():
+    gray = np.tile(np.arange(256, dtype=np.uint8), (50, 1))
+    result = analyze_image(Image.fromarray(gray).convert("RGB"))
+    assert result["Effective Color"] == "Grayscale"
+    assert result["Unique Colors"] == 256
+    assert result["Blank"] == "No"
+
+
+def test_bilevel_and_color():
+    bilevel = np.zeros((100, 100), dtype=np.uint8)
+    bilevel[::2] = 255
+    assert analyze_pixels(bilevel)["Effective Color"] == "Bilevel"
+    color = np.zeros((100, 100, 3), dtype=np.uint8)
+    color[..., 0] = 200
+    assert analyze_pixels(color)["Effective Color"] == "Color"
+
+
+def test_bands_give_the_same_result_as_the_whole_image():
+    pixels = np.random.default_rng(5).integers(0, 256, (300, 200, 3), dtype=np.uint8)
+    assert analyze_chunks([pixels[:100], pixels[100:250], pixels[250:]]) == analyze_pixels(pixels)
+
+
+@pytest.mark.parametrize("kind", ["tiff", "pdf"])
+def test_analyze_option_adds_the_analysis_columns(tiff_files, pdf_files, kind):
+    file_path = (tiff_files if kind == "tiff" else pdf_files)[0]
+    plain = extract_file(file_path, kind)
+    analysed = extract_file(file_path, kind, ExtractOptions(analyze=True))
+    assert len(analysed) == len(plain)
+    for before, after in zip(plain, analysed):
+        assert set(after) == set(before) | set(ANALYSIS_COLUMNS)
+        assert {col: after[col] for col in before} == before
@@ -0,0 +1,36 @@
+import filecmp
+import os
+
+from extractor.benchmark import SCENARIOS, find_regressions, run_scenario
+from extractor.synthetic import make_corpus
+
+
+def test_corpus_is_reproducible(tmp_path):
+    first = make_corpus(str(tmp_path / "a"), tiff_count=8, pdf_count=4, seed=3)
+    second = make_corpus(str(tmp_path / "b"), tiff_count=8, pdf_count=4, seed=3)
+    assert first == second
+    for kind in ("tiff", "pdf"):
+        names = sorted(os.listdir(tmp_path / "a" / kind))
+        assert names == sorted(os.listdir(tmp_path / "b" / kind))
+        _, mismatch, errors = filecmp.cmpfiles(tmp_path / "a" / kind, tmp_path / "b" / kind,
+                                               names, shallow=False)
+        assert not mismatch and not errors
+
+
+def test_scenario_counts_the_corpus(corpus, tiff_files):
+    name = next(name for name, (file_type, _) in SCENARIOS.items() if file_type == "tiff")
+    result = run_scenario(str(corpus), name, repeat=1)
+    assert result["files"] == len(tiff_files)
+    assert result["pages"] >= result["files"]
+
+
+def test_regressions_beyond_the_tolerance_are_reported():
+    baseline = {"results": {"tiff": {"files_per_sec": 100.0, "pages_per_sec": 200.0,
+                                     "peak_rss_mb": 50.0}}}
+    within = {"tiff": {"files_per_sec": 90.0, "pages_per_sec": 180.0, "peak_rss_mb": 55.0}}
+    assert find_regressions(within, baseline, tolerance=0.15) == []
+    slower = {"tiff": {"files_per_sec": 80.0, "pages_per_sec": 180.0, "peak_rss_mb": 60.0},
+              "new": {"files_per_sec": 1.0, "pages_per_sec": 1.0, "peak_rss_mb": None}}
+    regressions = find_regressions(slower, baseline, tolerance=0.15)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("tiff: files_per_sec fell")
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from extractor import cache as cache_module
+from extractor.cache import ResultCache
+from extractor.core import DEFAULT_OPTIONS, ExtractOptions
+
+ROWS = [{"Filename": "9780306406157.pdf", "Page": 1}]
+
+
+@pytest.fixture
+def sample(tmp_path):
+    path = tmp_path / "9780306406157.pdf"
+    path.write_bytes(b"%PDF-1.4 original")
+    return str(path)
+
+
+def test_unchanged_file_is_a_hit(tmp_path, sample):
+    with ResultCache(str(tmp_path / "cache.db")) as cache:
+        assert cache.lookup(sample, "pdf", DEFAULT_OPTIONS) is None
+        cache.store(sample, "pdf", DEFAULT_OPTIONS, ROWS)
+    with ResultCache(str(tmp_path / "cache.db")) as cache:
+        assert cache.lookup(sample, "pdf", DEFAULT_OPTIONS) == ROWS
+        assert cache.lookup(sample, "pdf", ExtractOptions(max_pages=1)) is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_relative_paths_are_keyed_by_the_file_they_name(tmp_path, monkeypatch):
+    for name, content in (("a", b"%PDF-1.4 first"), ("b", b"%PDF-1.4 the second")):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "9780306406157.pdf").write_bytes(content)
+    rows = [dict(ROWS[0], **{"Full Path": "9780306406157.pdf"})]
+    with ResultCache(str(tmp_path / "cache.db")) as cache:
+        monkeypatch.chdir(tmp_path / "a")
+        cache.store("9780306406157.pdf", "pdf", DEFAULT_OPTIONS, rows)
+        assert cache.lookup("9780306406157.pdf", "pdf", DEFAULT_OPTIONS) == rows
+        monkeypatch.chdir(tmp_path / "b")
+        assert cache.lookup("9780306406157.pdf", "pdf", DEFAULT_OPTIONS) is None
+        absolute = str(tmp_path / "a" / "9780306406157.pdf")
+        hit = cache.lookup(absolute, "pdf", DEFAULT_OPTIONS)
+        assert hit[0]["Full Path"] == absolute
+
+
+def test_changed_mtime_is_a_miss(tmp_path, sample):
+    with ResultCache(str(tmp_path / "cache.db")) as cache:
+        cache.store(sample, "pdf", DEFAULT_OPTIONS, ROWS)
+        stat = os.stat(sample)
+        os.utime(sample, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert cache.lookup(sample, "pdf", DEFAULT_OPTIONS) is None
+
+
+def test_verify_hash_ignores_touch_but_catches_rewrites(tmp_path, sample):
+    with ResultCache(str(tmp_path / "cache.db"), verify_hash=True) as cache:
+        cache.store(sample, "pdf", DEFAULT_OPTIONS, ROWS)
+        stat = os.stat(sample)
+        os.utime(sample, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert cache.lookup(sample, "pdf", DEFAULT_OPTIONS) == ROWS
+
+        # Same size and mtime, different content
+        stat = os.stat(sample)
+        with open(sample, "wb") as file:
+            file.write(b"%PDF-1.4 replaced")
+        os.utime(sample, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert cache.lookup(sample, "pdf", DEFAULT_OPTIONS) is None
+
+
+def test_new_version_clears_the_cache(tmp_path, sample, monkeypatch):
+    with ResultCache(str(tmp_path / "cache.db")) as cache:
+        cache.store(sample, "pdf", DEFAULT_OPTIONS, ROWS)
+    monkeypatch.setattr(cache_module, "EXTRACTOR_VERSION", "0.0.0-test")
+    with ResultCache(str(tmp_path / "cache.db")) as cache:
+        assert cache.lookup(sample, "pdf", DEFAULT_OPTIONS) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    paths = []
+    for index in range(3):
+        path = tmp_path / f"{index}.pdf"
+        path.write_bytes(b"%PDF")
+        paths.append(str(path))
+    with ResultCache(str(tmp_path / "cache.db"), max_entries=2) as cache:
+        for path in paths:
+            cache.store(path, "pdf", DEFAULT_OPTIONS, ROWS)
+        cache.flush()
+        assert cache.lookup(paths[0], "pdf", DEFAULT_OPTIONS) is None
+        assert cache.lookup(paths[2], "pdf", DEFAULT_OPTIONS) == ROWS
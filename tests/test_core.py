@@ -0,0 +1,88 @@
+import csv
+
+import pytest
+
+from extractor import (ERROR_STATUSES, TIFF_EXPORT_COLUMNS, check_pdf_filename_convention,
+                       check_tiff_filename_convention, error_row, export_columns, extract_file,
+                       is_error_row)
+from extractor.cli import main
+
+
+@pytest.mark.parametrize("filename, expected", [
+    ("9780306406157_00001.tif", "Yes"),
+    ("9780306406157_00001.TIF", "Yes"),
+    ("9780306406157_00001.tiff", "Wrong extension"),
+    ("9780306406157_1.tif", "No"),
+    ("cover.tif", "No"),
+])
+def test_tiff_filename_convention(filename, expected):
+    assert check_tiff_filename_convention(filename) == expected
+
+
+@pytest.mark.parametrize("filename, expected", [
+    ("9780306406157.pdf", "Yes"),
+    ("9780306406157.PDF", "Yes"),
+    ("9780306406157.pdf.bak", "Wrong extension"),
+    ("9780306406157_00001.pdf", "No"),
+])
+def test_pdf_filename_convention(filename, expected):
+    assert check_pdf_filename_convention(filename) == expected
+
+
+def test_extract_tiff_rows(tiff_files):
+    rows = extract_file(tiff_files[0], "tiff")
+    assert rows
+    for page, row in enumerate(rows, 1):
+        assert set(row) == set(TIFF_EXPORT_COLUMNS)
+        assert row["Page"] == page
+        assert row["Format"] == "TIFF"
+        assert row["Filename Valid"] == "Yes"
+        assert not is_error_row(row)
+
+
+def test_extract_pdf_rows(pdf_files):
+    rows = extract_file(pdf_files[0], "pdf")
+    assert rows
+    assert [row["Page"] for row in rows] == list(range(1, len(rows) + 1))
+    assert all(row["File Type"] == "PDF" for row in rows)
+
+
+def test_unreadable_file_gives_error_row(tmp_path):
+    path = tmp_path / "9780306406157_00001.tif"
+    path.write_bytes(b"not a tiff at all")
+    rows = extract_file(str(path), "tiff")
+    assert len(rows) == 1
+    assert is_error_row(rows[0])
+    assert rows[0]["Filename"] == path.name
+    assert rows[0]["Full Path"] == str(path)
+
+
+def test_error_row_fills_every_column_with_the_status():
+    for status in ERROR_STATUSES:
+        row = error_row("/x/9780306406157.pdf", "auto", status)
+        assert row["File Type"] == "PDF"
+        assert row["DPI"] == status
+        assert set(row) == set(export_columns("auto"))
+        assert is_error_row(row)
+
+
+def test_cli_extract_writes_every_row(tmp_path, corpus, tiff_files):
+    output = tmp_path / "out.csv"
+    assert main(["extract", str(corpus / "tiff"), "-o", str(output)]) == 0
+    with open(output, newline="", encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    expected = [row for path in tiff_files for row in extract_file(path, "tiff")]
+    assert len(rows) == len(expected)
+    assert {row["Full Path"] for row in rows} == set(tiff_files)
+
+
+def test_cli_reports_missing_inputs(tmp_path):
+    assert main(["extract", str(tmp_path / "missing"), "-o", str(tmp_path / "out.csv")]) == 2
+
+
+@pytest.mark.parametrize("value", ["0", "-1"])
+def test_cli_rejects_a_max_pages_below_one(tmp_path, capsys, value):
+    with pytest.raises(SystemExit) as exit_info:
+        main(["extract", str(tmp_path), "--max-pages", value])
+    assert exit_info.value.code == 2
+    assert "--max-pages: must be at least 1" in capsys.readouterr().err
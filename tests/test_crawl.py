@@ -0,0 +1,50 @@
+import os
+from collections import Counter
+
+import pytest
+
+from extractor.crawl import iter_files
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in ("b/9780306406157_00002.tif", "b/c/9780306406157_00003.TIFF", "a.tif",
+                 "9780306406157_00001.tif", "notes.txt", "9780306406157.pdf"):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+    return tmp_path
+
+
+def relative(paths, root):
+    return [os.path.relpath(path, root) for path in paths]
+
+
+def test_walk_matches_sorted_os_walk(tree):
+    expected = []
+    for directory, subdirectories, names in os.walk(tree):
+        subdirectories.sort()
+        expected.extend(os.path.join(directory, name) for name in sorted(names)
+                        if name.lower().endswith((".tif", ".tiff")))
+    assert list(iter_files([str(tree)], "tiff")) == expected
+
+
+def test_inputs_are_yielded_once(tree):
+    inputs = [str(tree / "a.tif"), str(tree), str(tree / "*.tif"), str(tree / "missing")]
+    assert relative(iter_files(inputs, "tiff"), tree) == [
+        "a.tif", "9780306406157_00001.tif", os.path.join("b", "9780306406157_00002.tif"),
+        os.path.join("b", "c", "9780306406157_00003.TIFF")]
+
+
+def test_valid_names_only_counts_skipped_files(tree):
+    counts = Counter()
+    files = list(iter_files([str(tree)], "auto", valid_names_only=True, counts=counts))
+    assert relative(files, tree) == ["9780306406157.pdf", "9780306406157_00001.tif",
+                                     os.path.join("b", "9780306406157_00002.tif")]
+    assert counts == Counter(files=3, skipped_names=2)
+
+
+def test_symlink_loops_end(tree):
+    os.symlink(tree, tree / "b" / "loop")
+    assert len(list(iter_files([str(tree)], "tiff"))) == 4
+    assert len(list(iter_files([str(tree)], "tiff", follow_symlinks=True))) == 4
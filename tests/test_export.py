@@ -0,0 +1,81 @@
+import csv
+import json
+
+import pytest
+
+from extractor import export, extract_file
+from extractor.core import export_columns
+from extractor.export import RowWriter, export_rows
+
+
+@pytest.fixture(scope="module")
+def rows(tiff_files):
+    return [row for path in tiff_files[:10] for row in extract_file(path, "tiff")]
+
+
+def as_text(row, columns):
+    return {col: str(row.get(col, "")) for col in columns}
+
+
+def test_csv_round_trip(tmp_path, rows):
+    path = tmp_path / "out.csv"
+    export_rows(rows, str(path), "tiff")
+    with open(path, newline="", encoding="utf-8") as file:
+        reader = csv.DictReader(file)
+        assert reader.fieldnames == list(export_columns("tiff"))
+        assert list(reader) == [as_text(row, reader.fieldnames) for row in rows]
+
+
+def test_csv_append_keeps_one_header(tmp_path, rows):
+    path = str(tmp_path / "out.csv")
+    export_rows(rows[:3], path, "tiff")
+    with RowWriter(path, "tiff", append=True) as writer:
+        writer.write_rows(rows[3:])
+    with open(path, newline="", encoding="utf-8") as file:
+        assert len(list(csv.DictReader(file))) == len(rows)
+
+
+def test_csv_append_refuses_other_columns(tmp_path, rows):
+    path = str(tmp_path / "out.csv")
+    export_rows(rows, path, "tiff")
+    with pytest.raises(ValueError):
+        RowWriter(path, "pdf", append=True)
+
+
+def test_only_line_formats_can_be_appended(tmp_path):
+    with pytest.raises(ValueError):
+        RowWriter(str(tmp_path / "out.xlsx"), "tiff", append=True)
+
+
+def test_json_lines_round_trip(tmp_path, rows):
+    path = tmp_path / "out.jsonl"
+    export_rows(rows, str(path), "tiff")
+    with open(path, encoding="utf-8") as file:
+        records = [json.loads(line) for line in file]
+    assert records == rows
+    assert list(records[0]) == list(export_columns("tiff"))
+
+
+def test_excel_rows_continue_on_a_new_sheet(tmp_path, rows, monkeypatch):
+    from openpyxl import load_workbook
+
+    monkeypatch.setattr(export, "EXCEL_MAX_ROWS", 4)
+    path = tmp_path / "out.xlsx"
+    export_rows(rows[:5], str(path), "tiff")
+    workbook = load_workbook(path, read_only=True)
+    sheets = [list(sheet.values) for sheet in workbook.worksheets]
+    assert [len(sheet) for sheet in sheets] == [4, 3]
+    assert all(sheet[0] == tuple(export_columns("tiff")) for sheet in sheets)
+    assert [row[1:3] for sheet in sheets for row in sheet[1:]] == [
+        (row["Filename"], row["Page"]) for row in rows[:5]]
+
+
+def test_parquet_stores_every_column_as_text(tmp_path, rows):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    path = tmp_path / "out.parquet"
+    export_rows(rows, str(path), "tiff")
+    table = pq.read_table(path)
+    assert table.column_names == list(export_columns("tiff"))
+    assert table.to_pylist() == [as_text(row, table.column_names) for row in rows]
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from extractor import ExtractOptions, extract_file
+from extractor.parallel import extract_all, iter_extract
+
+
+def test_extract_all_matches_serial_extraction(tiff_files):
+    expected = [row for path in tiff_files for row in extract_file(path, "tiff")]
+    assert extract_all(tiff_files, "tiff", workers=1) == expected
+    assert extract_all(tiff_files, "tiff", workers=3, max_in_flight=4) == expected
+
+
+def test_ordered_results_follow_input_order(tiff_files):
+    indices = [index for index, _ in iter_extract(tiff_files, "tiff", workers=3, ordered=True)]
+    assert indices == list(range(len(tiff_files)))
+
+
+def test_unordered_results_cover_every_file(tiff_files):
+    results = dict(iter_extract(tiff_files, "tiff", workers=3))
+    assert sorted(results) == list(range(len(tiff_files)))
+    for index, rows in results.items():
+        assert rows[0]["Full Path"] == tiff_files[index]
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_in_flight_files_stay_bounded(tiff_files, ordered):
+    pulled = 0
+
+    def source():
+        nonlocal pulled
+        for path in tiff_files:
+            pulled += 1
+            yield path
+
+    yielded = 0
+    for _ in iter_extract(source(), "tiff", workers=2, max_in_flight=3, ordered=ordered):
+        assert pulled - yielded <= 3
+        yielded += 1
+    assert yielded == len(tiff_files)
+
+
+def test_cancel_stops_new_work(tiff_files):
+    cancel = threading.Event()
+    seen = 0
+    for _ in iter_extract(tiff_files, "tiff", workers=2, max_in_flight=2, cancel=cancel):
+        seen += 1
+        cancel.set()
+    assert 1 <= seen < len(tiff_files)
+
+
+def test_cancel_kills_files_that_are_still_running(tiff_files):
+    # Every read sleeps, so a file takes far longer than the test allows
+    options = ExtractOptions(io_latency=30)
+    cancel = threading.Event()
+    threading.Timer(0.5, cancel.set).start()
+    started = time.monotonic()
+    results = list(iter_extract(tiff_files, "tiff", workers=2, cancel=cancel, options=options))
+    assert results == []
+    assert time.monotonic() - started < 10
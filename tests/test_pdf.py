@@ -0,0 +1,134 @@
+import random
+
+import pytest
+
+from extractor import core
+from extractor.contentstream import IDENTITY, iter_placements
+from extractor.core import (DEFAULT_OPTIONS, RESOURCE_LIMIT_STATUS, ExtractOptions, extract_file,
+                            is_error_row, take_stats)
+from extractor.synthetic import PdfWriter
+
+STREAM = ExtractOptions(pdf_engine="stream")
+ENGINES = ["pypdf2", "stream"]
+
+
+@pytest.fixture
+def placed_pdf(tmp_path):
+    """Two pages: a 600px image drawn 200pt wide and a 300px image drawn
+    150pt wide inside a form, then a page with text only"""
+    writer = PdfWriter()
+    rng = random.Random(1)
+    big = writer.image(600, 600, rng)
+    small = writer.image(300, 300, rng)
+    form = writer.form(b"q 150 0 0 150 0 0 cm /Im1 Do Q", {"/Im1": small})
+    first = writer.page(b"q 200 0 0 200 0 0 cm /Big Do Q q 1 0 0 1 300 300 cm /Fm Do Q",
+                        {"/Big": big, "/Fm": form})
+    second = writer.page(b"BT /F1 12 Tf (no images) Tj ET", {})
+    path = tmp_path / "9780306406157.pdf"
+    writer.write(str(path), [first, second])
+    return str(path)
+
+
+def test_stream_engine_matches_pypdf2(pdf_files):
+    for file_path in pdf_files:
+        assert extract_file(file_path, "pdf", STREAM) == extract_file(file_path, "pdf"), file_path
+
+
+def test_stream_engine_respects_max_pages(pdf_files):
+    options = ExtractOptions(pdf_engine="stream", max_pages=1)
+    for file_path in pdf_files:
+        assert extract_file(file_path, "pdf", options) == extract_file(file_path, "pdf")[:1]
+
+
+def test_stream_engine_falls_back_to_pypdf2(pdf_files, monkeypatch):
+    def broken(file_path):
+        raise core.PdfFormatError("unsupported")
+
+    expected = extract_file(pdf_files[0], "pdf")
+    monkeypatch.setattr(core, "PdfDocument", broken)
+    assert extract_file(pdf_files[0], "pdf", STREAM) == expected
+
+
+def test_memory_error_is_not_retried(pdf_files, monkeypatch):
+    def exhausted(file_path):
+        raise MemoryError
+
+    monkeypatch.setattr(core, "PdfDocument", exhausted)
+    rows = extract_file(pdf_files[0], "pdf", STREAM)
+    assert len(rows) == 1
+    assert rows[0]["DPI"] == RESOURCE_LIMIT_STATUS
+
+
+def test_indirect_media_box(tmp_path):
+    # The page's MediaBox is an indirect reference; the 1200x1600 image fills
+    # a 400pt square, and the fallback DPI is computed from that box
+    writer = PdfWriter()
+    image = writer.image(1200, 1600, random.Random(1))
+    media_box = writer.add(b"[0 0 400 400]")
+    content = writer.add(writer.stream(b"q 400 0 0 400 0 0 cm /Im0 Do Q"))
+    page = writer.add(b"<< /Type /Page /Parent 2 0 R /MediaBox %d 0 R"
+                      b" /Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+                      % (media_box, image, content))
+    path = tmp_path / "9780306406157.pdf"
+    writer.write(str(path), [page])
+    for options in (DEFAULT_OPTIONS, STREAM):
+        rows = extract_file(str(path), "pdf", options)
+        assert not is_error_row(rows[0])
+        assert rows[0]["DPI"] == "216 x 288"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_shared_images_are_analysed_once_per_document(tmp_path, monkeypatch, engine):
+    # Two images placed six times across four pages
+    writer = PdfWriter()
+    rng = random.Random(1)
+    cover = writer.image(1200, 1200, rng)
+    logo = writer.image(300, 150, rng)
+    pages = [writer.page(b"q 300 0 0 300 0 0 cm /Im0 Do Q q 100 0 0 50 0 0 cm /Im1 Do Q",
+                         {"/Im0": cover, "/Im1": logo}),
+             writer.page(b"/Im0 Do", {"/Im0": cover}),
+             writer.page(b"/Im1 Do /Im0 Do", {"/Im1": logo, "/Im0": cover}),
+             writer.page(b"/Logo Do", {"/Logo": logo})]
+    path = tmp_path / "9780306406157.pdf"
+    writer.write(str(path), pages)
+    options = ExtractOptions(pdf_engine=engine, dpi_mode="placed", pdf_images="all")
+
+    take_stats()
+    rows = extract_file(str(path), "pdf", options)
+    stats = take_stats()
+    assert len(rows) == 6
+    assert (stats["pdf_image_misses"], stats["pdf_image_hits"]) == (2, 4)
+
+    monkeypatch.setattr(core, "image_cache_key", lambda x_object, name, page: None)
+    assert extract_file(str(path), "pdf", options) == rows
+    stats = take_stats()
+    assert (stats["pdf_image_misses"], stats["pdf_image_hits"]) == (6, 0)
+
+
+def test_placements_follow_the_graphics_state():
+    content = (b"q 2 0 0 2 10 10 cm (a string with /Im9 Do) Tj /Im0 Do Q "
+               b"BI /W 1 /H 1 ID \x00 Do EI /Im1 Do")
+    placements = list(iter_placements(content))
+    assert placements == [("/Im0", (2.0, 0.0, 0.0, 2.0, 10.0, 10.0)), ("/Im1", IDENTITY)]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_placed_dpi_uses_the_drawn_size(placed_pdf, engine):
+    rows = extract_file(placed_pdf, "pdf", ExtractOptions(pdf_engine=engine, dpi_mode="placed"))
+    assert [row["DPI"] for row in rows] == ["216 x 216", "Unknown"]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_all_images_lists_images_inside_forms(placed_pdf, engine):
+    options = ExtractOptions(pdf_engine=engine, dpi_mode="placed", pdf_images="all")
+    rows = extract_file(placed_pdf, "pdf", options)
+    assert [(row["Page"], row["Image"], row["DPI"]) for row in rows] == [
+        (1, "/Big", "216 x 216"), (1, "/Fm/Im1", "144 x 144"), (2, "None", "Unknown")]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_summary_reports_the_lowest_resolution_image(placed_pdf, engine):
+    options = ExtractOptions(pdf_engine=engine, dpi_mode="placed", pdf_images="summary")
+    rows = extract_file(placed_pdf, "pdf", options)
+    assert [(row["Images"], row["DPI"], row["Max DPI"]) for row in rows] == [
+        (2, "144 x 144", "216 x 216"), (0, "Unknown", "Unknown")]
@@ -0,0 +1,41 @@
+import threading
+
+from extractor import extract_file
+from extractor.prefetch import InputFile, PrefetchedPath, iter_prefetched
+
+
+def test_order_is_kept_and_rows_are_unchanged(tiff_files, pdf_files):
+    files = tiff_files[:10] + pdf_files
+    prefetched = list(iter_prefetched(files, "auto", concurrency=4, depth=3, head_size=512,
+                                      tail_size=512))
+    assert prefetched == files
+    assert all(isinstance(path, PrefetchedPath) for path in prefetched)
+    for path in prefetched:
+        assert extract_file(path, "auto") == extract_file(str(path), "auto")
+
+
+def test_missing_files_pass_through(tmp_path):
+    missing = str(tmp_path / "missing.pdf")
+    assert list(iter_prefetched([missing], "pdf")) == [missing]
+
+
+def test_reads_inside_chunks_do_not_open_the_file(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(100)))
+    file = InputFile(str(path), ((0, bytes(range(10))), (90, bytes(range(90, 100)))), 100)
+    assert file.read(4) == bytes(range(4))
+    file.seek(-5, 2)
+    assert file.read() == bytes(range(95, 100))
+    assert file.file is None
+    file.seek(50)
+    assert file.read(3) == bytes(range(50, 53))
+    assert file.file is not None
+    file.close()
+
+
+def test_stopping_early_ends_the_prefetch_thread(tiff_files):
+    before = threading.active_count()
+    iterator = iter_prefetched(tiff_files, "tiff", depth=2)
+    next(iterator)
+    iterator.close()
+    assert threading.active_count() == before
@@ -0,0 +1,114 @@
+import struct
+import zlib
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from extractor.analysis import analyze_chunks, analyze_image
+from extractor.raster import RasterFile
+from extractor.tiff import TiffFormatError
+
+SHORT, LONG = 3, 4
+
+
+def pillow_pixels(file_path):
+    with Image.open(file_path) as img:
+        if img.mode == "1":
+            return np.asarray(img, dtype=np.uint8) * 255
+        if img.mode.startswith("I;16"):
+            return (np.asarray(img).astype(np.uint32) >> 8).astype(np.uint8)
+        return np.asarray(img)
+
+
+def raster_pixels(file_path, step=1):
+    with RasterFile(file_path) as raster:
+        ifd = next(iter(raster.iter_ifds()))
+        return np.concatenate([band.copy() for band in raster.iter_bands(ifd, step)])
+
+
+def write_tiled(path, pixels, tile, deflate):
+    """Write an 8-bit gray TIFF in tile x tile tiles, which Pillow cannot write"""
+    height, width = pixels.shape
+    padded = np.zeros((-(-height // tile) * tile, -(-width // tile) * tile), dtype=np.uint8)
+    padded[:height, :width] = pixels
+    tiles = [padded[top:top + tile, left:left + tile].tobytes()
+             for top in range(0, padded.shape[0], tile)
+             for left in range(0, padded.shape[1], tile)]
+    if deflate:
+        tiles = [zlib.compress(data) for data in tiles]
+
+    data = bytearray(b"II*\x00\x00\x00\x00\x00")
+    offsets = []
+    for chunk in tiles:
+        offsets.append(len(data))
+        data += chunk
+    arrays = len(data)
+    data += struct.pack(f"<{len(tiles)}I", *offsets)
+    data += struct.pack(f"<{len(tiles)}I", *(len(chunk) for chunk in tiles))
+    entries = [(256, SHORT, 1, width), (257, SHORT, 1, height), (258, SHORT, 1, 8),
+               (259, SHORT, 1, 8 if deflate else 1), (262, SHORT, 1, 1), (277, SHORT, 1, 1),
+               (322, SHORT, 1, tile), (323, SHORT, 1, tile),
+               (324, LONG, len(tiles), arrays), (325, LONG, len(tiles), arrays + 4 * len(tiles))]
+    ifd = len(data)
+    data += struct.pack("<H", len(entries))
+    for tag, field_type, count, value in entries:
+        if field_type == SHORT:
+            packed = struct.pack("<HH", value, 0)
+        else:
+            packed = struct.pack("<I", value)
+        data += struct.pack("<HHI", tag, field_type, count) + packed
+    data += struct.pack("<I", 0)
+    data[4:8] = struct.pack("<I", ifd)
+    with open(path, "wb") as file:
+        file.write(data)
+
+
+@pytest.mark.parametrize("mode", ["1", "L", "RGB", "I;16"])
+@pytest.mark.parametrize("compression, info", [
+    ("raw", {}), ("tiff_adobe_deflate", {}), ("tiff_adobe_deflate", {317: 2})])
+def test_strips_match_pillow(tmp_path, mode, compression, info):
+    if mode == "1" and info:
+        pytest.skip("the predictor does not apply to 1-bit samples")
+    rng = np.random.default_rng(3)
+    if mode == "I;16":
+        img = Image.fromarray(rng.integers(0, 65536, (150, 130), dtype=np.uint16))
+    else:
+        shape = (150, 130, 3) if mode == "RGB" else (150, 130)
+        img = Image.fromarray(rng.integers(0, 256, shape, dtype=np.uint8)).convert(mode)
+    path = str(tmp_path / "scan.tif")
+    img.save(path, compression=compression, tiffinfo=info)
+    expected = pillow_pixels(path)
+    assert np.array_equal(raster_pixels(path), expected)
+    assert np.array_equal(raster_pixels(path, 3), expected[::3, ::3])
+
+
+@pytest.mark.parametrize("deflate", [False, True])
+def test_tiles_match_the_source_pixels(tmp_path, deflate):
+    pixels = np.random.default_rng(4).integers(0, 256, (150, 130), dtype=np.uint8)
+    path = str(tmp_path / "tiled.tif")
+    write_tiled(path, pixels, 64, deflate)
+    assert np.array_equal(raster_pixels(path), pixels)
+    assert np.array_equal(raster_pixels(path, 2), pixels[::2, ::2])
+    assert np.array_equal(pillow_pixels(path), pixels)
+
+
+def test_band_analysis_matches_pillow(tmp_path):
+    pixels = np.full((300, 200), 255, dtype=np.uint8)
+    pixels[100:110, 50:150] = 0
+    path = str(tmp_path / "page.tif")
+    Image.fromarray(pixels).save(path, compression="tiff_adobe_deflate")
+    with RasterFile(path) as raster:
+        ifd = next(iter(raster.iter_ifds()))
+        measured = analyze_chunks(raster.iter_bands(ifd))
+    with Image.open(path) as img:
+        assert measured == analyze_image(img)
+
+
+def test_other_compressions_are_left_to_pillow(tmp_path):
+    path = str(tmp_path / "scan.tif")
+    Image.new("L", (64, 64)).save(path, compression="tiff_lzw")
+    with RasterFile(path) as raster:
+        ifd = next(iter(raster.iter_ifds()))
+        with pytest.raises(TiffFormatError):
+            raster.iter_bands(ifd)
@@ -0,0 +1,102 @@
+import copy
+import json
+
+import pytest
+
+from extractor import (RuleError, RuleSet, error_row, export_columns, extract_file,
+                       load_rules)
+from extractor.rules import valid_isbn13
+from extractor.store import ResultStore
+
+SPECS = [
+    {"builtin": "isbn13-checksum"},
+    {"name": "Minimum 300 dpi", "check": {"column": "DPI", "min": 300}},
+    {"name": "No JPEG on gray pages",
+     "when": {"column": "Color Depth", "contains": "Grayscale"},
+     "check": {"column": "Compression", "not_equals": "JPEG"}},
+    {"name": "Known compression", "check": {"column": "Compression", "in": ["LZW", "JPEG"]},
+     "reason": "Unexpected compression"},
+]
+
+
+@pytest.fixture(scope="module")
+def file_rows(tiff_files):
+    rows = [extract_file(path, "tiff") for path in tiff_files]
+    rows.append([error_row("/missing/9780306406157_00001.tif", "tiff")])
+    return rows
+
+
+def build_store(file_rows):
+    store = ResultStore(export_columns("tiff"))
+    for rows in file_rows:
+        store.add_rows(rows)
+    return store
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("9780306406157", True),
+    ("9780306406157_00001.tif", True),
+    ("9780306406158", False),
+    ("1234567890123", False),
+    ("978030640615", False),
+])
+def test_valid_isbn13(value, expected):
+    assert valid_isbn13(value) is expected
+
+
+def test_rules_pass_fail_and_skip_rows():
+    rules = RuleSet(SPECS)
+    rows = rules.apply([
+        {"Filename": "9780306406157_00001.tif", "DPI": "300 x 300", "Compression": "LZW",
+         "Color Depth": "8-bit Grayscale"},
+        {"Filename": "9780306406158_00001.tif", "DPI": "150 x 300", "Compression": "JPEG",
+         "Color Depth": "8-bit Grayscale"},
+        {"Filename": "9780306406157_00001.tif", "DPI": "600 x 600", "Compression": "JPEG",
+         "Color Depth": "24-bit Color"},
+    ])
+    assert [row["Rules"] for row in rows] == ["Pass", "Fail", "Pass"]
+    assert rows[1]["Rule Failures"] == ("Filename does not start with a valid ISBN-13; "
+                                        "Minimum 300 dpi; No JPEG on gray pages")
+
+
+def test_evaluate_matches_apply(file_rows):
+    rules = RuleSet(SPECS)
+    applied = rules.apply(copy.deepcopy([row for rows in file_rows for row in rows]))
+    evaluated = rules.evaluate(build_store(file_rows))
+    assert evaluated["Rules"] == [row["Rules"] for row in applied]
+    assert evaluated["Rule Failures"] == [row["Rule Failures"] for row in applied]
+    assert evaluated["Rules"][-1] == "Error"
+
+
+def test_no_rules_pass_every_row(file_rows):
+    evaluated = RuleSet([]).evaluate(build_store(file_rows))
+    rows = sum(len(rows) for rows in file_rows)
+    assert evaluated["Rules"] == ["Pass"] * (rows - 1) + ["Error"]
+    assert evaluated["Rule Failures"] == [""] * (rows - 1) + ["Error"]
+    assert RuleSet([]).evaluate(ResultStore(export_columns("tiff"))) == {
+        "Rules": [], "Rule Failures": []}
+
+
+@pytest.mark.parametrize("specs", [
+    [{"check": {"column": "DPI", "min": 300}}],
+    [{"name": "x"}],
+    [{"name": "x", "check": {"column": "DPI"}}],
+    [{"name": "x", "check": {"column": "DPI", "min": 1, "max": 2}}],
+    [{"name": "x", "check": {"column": "DPI", "matches": "("}}],
+    [{"builtin": "no-such-rule"}],
+    [{"name": "x", "check": {"column": "DPI", "min": 1}}] * 2,
+])
+def test_bad_rules_are_refused(specs):
+    with pytest.raises(RuleError):
+        RuleSet(specs)
+
+
+def test_load_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"rules": SPECS}))
+    rules = load_rules(str(path))
+    assert len(rules) == len(SPECS)
+    assert rules.missing_columns(export_columns("tiff")) == []
+    path.write_text("{not json")
+    with pytest.raises(RuleError):
+        load_rules(str(path))
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from extractor import TIMEOUT_STATUS, ExtractOptions, error_row, extract_all
+from extractor.shard import (Checkpoint, ShardError, describe_run, iter_manifest, iter_records,
+                             merge_shards, missing_shards, open_run, run_shard, shard_name,
+                             write_manifest)
+
+
+class Collector:
+    """Stands in for a RowWriter"""
+
+    def __init__(self):
+        self.rows = []
+
+    def write_rows(self, rows):
+        self.rows.extend(rows)
+
+
+@pytest.fixture
+def run(tmp_path, tiff_files):
+    manifest = str(tmp_path / "manifest.txt")
+    write_manifest(tiff_files, manifest)
+    run_dir = str(tmp_path / "run")
+    open_run(run_dir, describe_run(manifest, 3, "tiff"))
+    return manifest, run_dir
+
+
+def merged(run_dir):
+    writer = Collector()
+    merge_shards([run_dir], writer)
+    return writer.rows
+
+
+def test_shards_split_the_manifest_and_merge_in_order(run, tiff_files):
+    manifest, run_dir = run
+    assert [path for _, path in iter_manifest(manifest)] == tiff_files
+    assert missing_shards([run_dir], 3) == [0, 1, 2]
+    files = 0
+    for shard in range(3):
+        files += run_shard(manifest, run_dir, shard, 3, "tiff")["files"]
+    assert files == len(tiff_files)
+    assert missing_shards([run_dir], 3) == []
+    assert merged(run_dir) == extract_all(tiff_files, "tiff")
+
+
+def test_a_different_run_is_refused(run):
+    manifest, run_dir = run
+    with pytest.raises(ShardError):
+        open_run(run_dir, describe_run(manifest, 3, "tiff", ExtractOptions(max_pages=1)))
+    with pytest.raises(ShardError):
+        run_shard(manifest, run_dir, 3, 3, "tiff")
+
+
+def test_resume_after_a_torn_line(run, tiff_files):
+    manifest, run_dir = run
+    path = os.path.join(run_dir, shard_name(0, 3) + ".jsonl")
+    run_shard(manifest, run_dir, 0, 3, "tiff")
+    with open(path, "rb") as file:
+        lines = file.readlines()
+    with open(path, "wb") as file:
+        file.writelines(lines[:4])
+        file.write(lines[4][:20])
+
+    checkpoint = Checkpoint(path)
+    checkpoint.close()
+    assert checkpoint.done == {0, 3, 6, 9}
+    assert os.path.getsize(path) == sum(len(line) for line in lines[:4])
+
+    counts = run_shard(manifest, run_dir, 0, 3, "tiff")
+    assert counts["resumed"] == 4
+    assert counts["files"] == len(lines) - 4
+    for shard in (1, 2):
+        run_shard(manifest, run_dir, shard, 3, "tiff")
+    assert merged(run_dir) == extract_all(tiff_files, "tiff")
+
+
+def test_timeouts_are_retried_on_resume(run, tiff_files):
+    manifest, run_dir = run
+    path = os.path.join(run_dir, shard_name(0, 3) + ".jsonl")
+    checkpoint = Checkpoint(path)
+    checkpoint.record(0, tiff_files[0], [error_row(tiff_files[0], "tiff", TIMEOUT_STATUS)],
+                      retry=True)
+    checkpoint.record(3, tiff_files[3], extract_all([tiff_files[3]], "tiff"))
+    checkpoint.close()
+
+    counts = run_shard(manifest, run_dir, 0, 3, "tiff")
+    assert (counts["resumed"], counts["retried"]) == (1, 1)
+    assert counts[TIMEOUT_STATUS] == 0
+    records = list(iter_records(path))
+    assert [index for index, _, _ in records] == list(range(0, len(tiff_files), 3))
+    assert records[0][2] == extract_all([tiff_files[0]], "tiff")
+    checkpoint = Checkpoint(path)
+    checkpoint.close()
+    assert checkpoint.retry == set()
@@ -0,0 +1,45 @@
+import shutil
+
+import pytest
+
+from extractor import MIXED_EXPORT_COLUMNS, detect_file_type, extract_file
+from extractor.sniff import sniff_file_type
+
+
+@pytest.mark.parametrize("head, expected", [
+    (b"II*\x00\x08\x00\x00\x00", "tiff"),
+    (b"MM\x00*\x00\x00\x00\x08", "tiff"),
+    (b"II+\x00\x08\x00\x00\x00", "tiff"),
+    (b"%PDF-1.7\n", "pdf"),
+    (b"\xef\xbb\xbf junk before the header %PDF-1.4", "pdf"),
+    (b"PK\x03\x04", None),
+    (b"", None),
+])
+def test_sniff_file_type(head, expected):
+    assert sniff_file_type(head) == expected
+
+
+def test_misnamed_files_are_read_by_their_content(tmp_path, tiff_files, pdf_files):
+    tiff_as_pdf = tmp_path / "9780306406157.pdf"
+    pdf_as_tiff = tmp_path / "9780306406157_00001.tif"
+    shutil.copyfile(tiff_files[0], tiff_as_pdf)
+    shutil.copyfile(pdf_files[0], pdf_as_tiff)
+    assert detect_file_type(str(tiff_as_pdf)) == "tiff"
+    assert detect_file_type(str(pdf_as_tiff)) == "pdf"
+    for path, file_type in ((tiff_as_pdf, "TIFF"), (pdf_as_tiff, "PDF")):
+        rows = extract_file(str(path), "auto")
+        assert rows[0]["File Type"] == file_type
+        # The name is judged by its extension, as the crawler's filter does
+        assert {row["Filename Valid"] for row in rows} == {"Yes"}
+
+
+def test_mixed_rows_share_one_set_of_columns(tiff_files, pdf_files):
+    for file_path in (tiff_files[0], pdf_files[0]):
+        for row in extract_file(file_path, "auto"):
+            assert set(row) <= set(MIXED_EXPORT_COLUMNS)
+
+
+def test_unknown_content_falls_back_to_the_extension(tmp_path):
+    path = tmp_path / "9780306406157.pdf"
+    path.write_bytes(b"neither signature")
+    assert detect_file_type(str(path)) == "pdf"
@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from extractor.benchmark import HEAVY_MODULES
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("module", ["extractor", "extractor.cli", "metadata_extractor"])
+def test_import_loads_no_heavy_modules(module):
+    probe = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; "
+                               f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"],
+        cwd=PACKAGE_ROOT, check=True, capture_output=True, text=True)
+    assert probe.stdout.split() == []
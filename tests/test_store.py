@@ -0,0 +1,41 @@
+from extractor import error_row, export_columns, extract_file
+from extractor.store import ResultStore
+
+
+def build_store(tiff_files):
+    columns = export_columns("tiff")
+    rows = [extract_file(path, "tiff") for path in tiff_files]
+    rows.append([error_row("/missing/9780306406157_00001.tif", "tiff")])
+    store = ResultStore(columns)
+    for file_rows in rows:
+        store.add_rows(file_rows)
+    return store, [row for file_rows in rows for row in file_rows]
+
+
+def test_rows_read_back_unchanged(tiff_files):
+    store, rows = build_store(tiff_files)
+    assert len(store) == len(rows)
+    assert list(store.iter_rows()) == rows
+    assert store[len(rows) - 1] == rows[-1]
+
+
+def test_failed_files_can_be_left_out(tiff_files):
+    store, rows = build_store(tiff_files)
+    assert store.error_rows == 1
+    assert list(store.iter_rows(include_errors=False)) == rows[:-1]
+    assert store.error_mask().tolist() == [False] * (len(rows) - 1) + [True]
+
+
+def test_masks_and_sort_keys_cover_every_row(tiff_files):
+    store, rows = build_store(tiff_files)
+    mask = store.column_mask("Compression", lambda value: value == "LZW")
+    assert mask.tolist() == [row["Compression"] == "LZW" for row in rows]
+    assert store.column_mask("Not a column", bool).tolist() == [False] * len(rows)
+    assert store.sort_keys("Filename", str.lower) == [row["Filename"].lower() for row in rows]
+
+
+def test_to_pandas(tiff_files):
+    store, rows = build_store(tiff_files)
+    frame = store.to_pandas(include_errors=False)
+    assert list(frame.columns) == list(export_columns("tiff"))
+    assert frame.astype(object).to_dict("records") == rows[:-1]
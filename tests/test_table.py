@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pytest
+
+from metadata_extractor import VirtualTable, sort_key
+
+from extractor.store import ResultStore
+
+COLUMNS = ["Filename", "Page", "Color Depth", "Filename Valid"]
+
+
+@pytest.fixture
+def table():
+    tk = pytest.importorskip("tkinter")
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("Tk is not available")
+    root.withdraw()
+    table = VirtualTable(root, COLUMNS)
+    # Size the table for four visible lines as a <Configure> event would
+    table.on_resize(SimpleNamespace(height=5 * table.row_height + 4))
+    yield table
+    root.destroy()
+
+
+def make_store(pages):
+    store = ResultStore(COLUMNS)
+    for name, count in pages:
+        store.add_rows([{"Filename": name, "Page": page, "Color Depth": "8-bit",
+                         "Filename Valid": "Yes"} for page in range(1, count + 1)])
+    return store
+
+
+def shown(table):
+    table.tree.update_idletasks()
+    lines = [table.tree.item(item, "values") for item in table.tree.get_children()]
+    return [tuple(str(value) for value in values[:2]) for values in lines if values]
+
+
+def test_numbers_sort_numerically_before_text():
+    values = ["b", 10, "Error", 2, 1.5, "a"]
+    assert sorted(values, key=sort_key) == [1.5, 2, 10, "Error", "a", "b"]
+
+
+def test_table_order_comes_from_the_store():
+    store = ResultStore(["Filename", "Page"])
+    for name, pages in (("b.pdf", 3), ("a.pdf", 11)):
+        store.add_rows([{"Filename": name, "Page": page} for page in range(1, pages + 1)])
+    keys = store.sort_keys("Page", sort_key)
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    pages = [store.value(index, "Page") for index in order]
+    assert pages == sorted(pages)
+    assert pages[-1] == 11
+
+
+def test_only_the_visible_window_is_materialized(table):
+    table.set_rows(make_store([("a.pdf", 100)]))
+    assert table.visible == 4
+    assert len(table.tree.get_children()) == 4
+    assert shown(table) == [("a.pdf", str(page)) for page in range(1, 5)]
+    table.scroll_to(50)
+    assert shown(table) == [("a.pdf", str(page)) for page in range(51, 55)]
+    table.scroll_to(1000)
+    assert table.offset == 96
+    assert shown(table) == [("a.pdf", str(page)) for page in range(97, 101)]
+
+
+def test_sorting_reorders_the_window_and_toggles_direction(table):
+    table.set_rows(make_store([("b.pdf", 3), ("a.pdf", 11)]))
+    table.sort_by("Page")
+    assert [page for _, page in shown(table)] == ["1", "1", "2", "2"]
+    table.sort_by("Page")
+    assert table.sort_reverse
+    assert shown(table)[0] == ("a.pdf", "11")
+    assert str(table.tree.heading("Page", "text")) == "Page \u25bc"
+
+
+def test_rows_added_after_a_sort_follow_the_sorted_block(table):
+    store = make_store([("b.pdf", 2)])
+    table.set_rows(store)
+    table.sort_by("Page")
+    table.sort_by("Page")
+    store.add_rows([{"Filename": "a.pdf", "Page": 9, "Color Depth": "8-bit",
+                     "Filename Valid": "Yes"}])
+    table.rows_added(1)
+    assert list(table.order) == [1, 0, 2]
+    assert shown(table) == [("b.pdf", "2"), ("b.pdf", "1"), ("a.pdf", "9")]
+
+
+def test_clearing_drops_the_rows_and_the_sort(table):
+    table.set_rows(make_store([("a.pdf", 20)]))
+    table.sort_by("Filename")
+    table.scroll_to(10)
+    table.set_rows(make_store([]))
+    assert table.order is None and table.sort_column is None and table.offset == 0
+    assert shown(table) == []
+    assert len(table.tree.get_children()) == 4
+    assert str(table.tree.heading("Filename", "text")) == "Filename"
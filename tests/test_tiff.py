@@ -0,0 +1,44 @@
+import pytest
+from PIL import Image
+
+from extractor.core import ExtractOptions, extract_file, get_tiff_info_pillow
+from extractor.tiff import TiffFormatError, iter_tiff_ifds, summarize_ifd
+
+
+def pillow_pages(file_path):
+    with Image.open(file_path) as img:
+        pages = []
+        for page in range(getattr(img, "n_frames", 1)):
+            img.seek(page)
+            pages.append(get_tiff_info_pillow(img)[1:])
+    return pages
+
+
+def test_header_reader_matches_pillow(tiff_files):
+    for file_path in tiff_files:
+        pages = [summarize_ifd(ifd) for ifd in iter_tiff_ifds(file_path)]
+        assert pages == pillow_pages(file_path), file_path
+
+
+def test_non_tiff_is_rejected(tmp_path):
+    path = tmp_path / "scan.tif"
+    path.write_bytes(b"%PDF-1.4\n")
+    with pytest.raises(TiffFormatError):
+        list(iter_tiff_ifds(str(path)))
+
+
+def test_a_page_limit_below_one_reads_no_pages(tiff_files):
+    assert list(iter_tiff_ifds(tiff_files[0], max_pages=1))
+    for max_pages in (0, -1):
+        assert list(iter_tiff_ifds(tiff_files[0], max_pages=max_pages)) == []
+
+
+def test_multi_page_tiffs_get_one_row_per_page(tiff_files):
+    multi_page = [path for path in tiff_files if len(pillow_pages(path)) > 1]
+    assert multi_page
+    for file_path in multi_page:
+        pages = len(pillow_pages(file_path))
+        rows = extract_file(file_path, "tiff")
+        assert [row["Page"] for row in rows] == list(range(1, pages + 1))
+        sampled = extract_file(file_path, "tiff", ExtractOptions(max_pages=1))
+        assert sampled == rows[:1]
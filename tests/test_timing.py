@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from extractor import timing
+from extractor.core import ExtractOptions
+from extractor.parallel import extract_all, iter_extract
+from extractor.timing import Profile, nearest_rank, stage
+
+
+@pytest.fixture(autouse=True)
+def restore_timing(monkeypatch):
+    # Extraction switches profiling on in this process for workers=1
+    monkeypatch.setattr(timing, "enabled", False)
+    timing.take_spans()
+
+
+def test_stages_are_free_when_disabled():
+    with stage("file", "/x.tif"):
+        pass
+    assert timing.take_spans() == []
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_profile_collects_every_file(tiff_files, workers):
+    profile = Profile(keep_spans=True, slowest=3)
+    options = ExtractOptions(profile=True)
+    for _ in iter_extract(tiff_files, "tiff", workers, options=options, profile=profile):
+        pass
+    summary = profile.summary()
+    assert summary["file"]["count"] == len(tiff_files)
+    assert "tiff.ifd" in summary
+    assert len(profile.slowest()) == 3
+    assert {path for _, path in profile.slowest()} <= set(tiff_files)
+
+
+def test_profiling_leaves_rows_unchanged(tiff_files):
+    assert (extract_all(tiff_files, "tiff", options=ExtractOptions(profile=True))
+            == extract_all(tiff_files, "tiff"))
+
+
+def test_trace_is_chrome_trace_json(tmp_path, tiff_files):
+    profile = Profile(keep_spans=True)
+    options = ExtractOptions(profile=True)
+    for _ in iter_extract(tiff_files[:2], "tiff", options=options, profile=profile):
+        pass
+    path = tmp_path / "trace.json"
+    profile.write_trace(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+    assert events and all(event["ph"] == "X" for event in events)
+    assert {event["args"]["file"] for event in events} == set(tiff_files[:2])
+
+
+def test_nearest_rank():
+    ordered = [float(value) for value in range(1, 101)]
+    assert [nearest_rank(ordered, p) for p in (50, 95, 99, 100)] == [50.0, 95.0, 99.0, 100.0]
+    assert nearest_rank([7.0], 50) == 7.0
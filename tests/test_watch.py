@@ -0,0 +1,145 @@
+import csv
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+from extractor.export import RowWriter
+from extractor.watch import JOURNAL_SUFFIX, Debouncer, HotFolder, PollingWatcher
+
+
+def wait_for(condition, limit=20.0):
+    deadline = time.monotonic() + limit
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_debouncer_waits_for_files_to_settle(tmp_path):
+    path = tmp_path / "9780306406157_00001.tif"
+    path.write_bytes(b"II*\x00")
+    debouncer = Debouncer(settle=1.0)
+    debouncer.touch(str(path), now=0.0)
+    assert debouncer.ready(0.5) == []
+
+    # Still being written: it waits another settle period
+    path.write_bytes(b"II*\x00 more")
+    assert debouncer.ready(1.0) == []
+    assert len(debouncer) == 1
+    stat = os.stat(path)
+    assert debouncer.ready(2.0) == [(str(path), (stat.st_size, stat.st_mtime_ns))]
+    assert len(debouncer) == 0
+
+    debouncer.touch(str(path), now=3.0)
+    path.unlink()
+    assert debouncer.ready(4.0) == []
+    assert len(debouncer) == 0
+
+
+def test_polling_watcher_reports_arrivals_and_removals(tmp_path):
+    (tmp_path / "old.tif").write_bytes(b"")
+    watcher = PollingWatcher([str(tmp_path)], (".tif",), interval=0)
+    assert watcher.start() == [str(tmp_path / "old.tif")]
+
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "new.tif").write_bytes(b"")
+    (tmp_path / "notes.txt").write_bytes(b"")
+    (tmp_path / "old.tif").unlink()
+    arrived, gone = watcher.read()
+    assert arrived == [str(tmp_path / "sub" / "new.tif")]
+    assert gone == [str(tmp_path / "old.tif")]
+
+
+def run_hot_folder(inbox, output, expected_files, **kwargs):
+    """Run a hot folder until it has extracted expected_files, then stop it"""
+    with RowWriter(str(output), "tiff", append=True) as writer:
+        hot_folder = HotFolder([str(inbox)], writer, settle=0.05, poll_interval=0.05,
+                               force_polling=True, journal_path=str(output) + JOURNAL_SUFFIX,
+                               **kwargs)
+        thread = threading.Thread(target=hot_folder.run)
+        thread.start()
+        try:
+            wait_for(lambda: hot_folder.counts["files"] >= expected_files
+                     and hot_folder.status()["queue_depth"] == 0)
+        finally:
+            hot_folder.stop()
+            thread.join()
+    return hot_folder
+
+
+def output_paths(output):
+    with open(output, newline="", encoding="utf-8") as file:
+        return [row["Full Path"] for row in csv.DictReader(file)]
+
+
+@pytest.fixture
+def inbox(tmp_path, tiff_files):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    for file_path in tiff_files[:3]:
+        shutil.copy(file_path, inbox)
+    return inbox
+
+
+def test_restart_skips_files_already_extracted(tmp_path, inbox, tiff_files):
+    output = tmp_path / "audit.csv"
+    first = run_hot_folder(inbox, output, 3)
+    assert first.counts["files"] == 3
+    rows = output_paths(output)
+
+    shutil.copy(tiff_files[3], inbox)
+    second = run_hot_folder(inbox, output, 1)
+    assert second.counts["files"] == 1
+    assert second.counts["skipped_unchanged"] == 3
+    added = str(inbox / os.path.basename(tiff_files[3]))
+    paths = output_paths(output)
+    assert paths[:len(rows)] == rows
+    assert set(paths[len(rows):]) == {added}
+
+
+def test_journal_drops_files_that_have_gone(tmp_path, inbox):
+    output = tmp_path / "audit.csv"
+    run_hot_folder(inbox, output, 3)
+    removed = sorted(inbox.iterdir())[0]
+    removed.unlink()
+    with open(str(output) + JOURNAL_SUFFIX, "a", encoding="utf-8") as file:
+        file.write('{"path": "torn')
+    second = run_hot_folder(inbox, output, 0)
+    assert set(second.processed) == {str(path) for path in inbox.iterdir()}
+    with open(str(output) + JOURNAL_SUFFIX, encoding="utf-8") as file:
+        assert len(file.readlines()) == 2
+
+
+class FailingSink(RowWriter):
+    """A sink whose flushes fail, as on a full disk"""
+
+    failing = True
+
+    def flush(self):
+        if self.failing:
+            raise OSError("No space left on device")
+        super().flush()
+
+
+def test_journal_never_gets_ahead_of_the_sink(tmp_path, inbox):
+    output = tmp_path / "audit.csv"
+    journal_path = str(output) + JOURNAL_SUFFIX
+    with FailingSink(str(output), "tiff", append=True) as writer:
+        hot_folder = HotFolder([str(inbox)], writer, settle=0.05, poll_interval=0.05,
+                               force_polling=True, journal_path=journal_path)
+        with pytest.raises(OSError):
+            hot_folder.run()
+        assert hot_folder.counts["files"] >= 1
+        # Whatever the journal buffered reaches the disk when the process exits
+        hot_folder.journal.close()
+        writer.failing = False
+    with open(journal_path, encoding="utf-8") as file:
+        assert file.read() == ""
+
+    # Nothing reached the journal, so a restart extracts every file again
+    second = run_hot_folder(inbox, output, 3)
+    assert second.counts["skipped_unchanged"] == 0
+    with open(journal_path, encoding="utf-8") as file:
+        assert len(file.readlines()) == 3
@@ -0,0 +1,47 @@
+import os
+import time
+
+import pytest
+
+from extractor.workers import TaskTimeout, WorkerDied, WorkerPool
+
+
+def wait_for(condition, limit=10.0):
+    deadline = time.monotonic() + limit
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_results_and_exceptions_are_returned():
+    with WorkerPool(2) as pool:
+        assert pool.submit(pow, 2, 10).result() == 1024
+        with pytest.raises(ZeroDivisionError):
+            pool.submit(divmod, 1, 0).result()
+
+
+def test_slow_task_times_out_and_the_pool_carries_on():
+    with WorkerPool(1, timeout=0.5) as pool:
+        slow = pool.submit(time.sleep, 30)
+        with pytest.raises(TaskTimeout):
+            slow.result(timeout=10)
+        assert pool.submit(pow, 3, 2).result(timeout=10) == 9
+
+
+def test_recycled_workers_are_joined_as_they_exit():
+    with WorkerPool(1, max_tasks_per_worker=1) as pool:
+        pids = {pool.submit(os.getpid).result(timeout=10) for _ in range(5)}
+        assert len(pids) == 5
+        wait_for(lambda: not pool.retired)
+
+
+def test_terminate_kills_running_tasks_and_cancels_queued_ones():
+    pool = WorkerPool(1)
+    running = pool.submit(time.sleep, 30)
+    queued = pool.submit(time.sleep, 30)
+    started = time.monotonic()
+    pool.terminate()
+    assert time.monotonic() - started < 10
+    assert queued.cancelled()
+    with pytest.raises(WorkerDied):
+        running.result(timeout=0)